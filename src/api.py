@@ -38,7 +38,6 @@ from typing import (
 import os
 import re
 import logging
-import threading
 from datetime import datetime, timedelta
 import base64
 import io
@@ -93,6 +92,7 @@ from skraflmechanics import (
 )
 from skrafluser import MAX_NICKNAME_LENGTH, User
 from skraflgame import BestMoveList, Game
+from robotpool import RobotError, game_lock
 from skraflplayer import AutoPlayer
 from skrafldb import (
     ChatModel,
@@ -278,11 +278,6 @@ MAX_BEST_MOVES = 20
 
 EXPLO_LOGO_URL = "https://explo-live.appspot.com/static/icon-explo-192.png"
 
-# To try to finish requests as soon as possible and avoid GAE DeadlineExceeded
-# exceptions, run the AutoPlayer move generators serially and exclusively
-# within an instance
-autoplayer_lock = threading.Lock()
-
 # Register the Flask blueprint for the APIs
 api = api_blueprint = Blueprint("api", __name__)
 
@@ -664,8 +659,10 @@ def _process_move(
 
     opponent: Optional[str] = None
 
-    # Serialize access to the following code section
-    with autoplayer_lock:
+    # Serialize access to the following code section for this game.
+    # Robot moves are generated in a bounded pool of worker processes
+    # (see robotpool.py), so other games are not held up meanwhile.
+    with game_lock(game_id):
 
         # Move is OK: register it and update the state
         game.register_move(m)
@@ -682,7 +679,12 @@ def _process_move(
 
             if opponent is None:
                 # Generate an autoplayer move in response
-                game.autoplayer_move()
+                try:
+                    game.autoplayer_move()
+                except RobotError as e:
+                    # The game is not stored, so the player can retry the move
+                    logging.warning(f"Robot move failed in game {game_id}: {e}")
+                    return jsonify(result=Error.SERVER_ERROR)
                 is_over = game.is_over()  # State may change during autoplayer_move()
             elif m.needs_response_move:
                 # Challenge move: generate a response move
@@ -1636,7 +1638,7 @@ def wordcheck() -> ResponseType:
 
     # Check the words against the dictionary
     wdb = Wordbase.dawg_for_locale(locale)
-    valid = [(w, w in wdb) for w in words]
+    valid = list(zip(words, wdb.find_many(words)))
     ok = all(v[1] for v in valid)
     return jsonify(word=word, ok=ok, valid=valid)
 
@@ -2362,9 +2364,11 @@ def bestmoves() -> ResponseType:
     if rq_move_number <= move_number:
         # How many best moves are being requested?
         num_moves = rq.get_int("num_moves", DEFAULT_BEST_MOVES)
-        # Serialize access to the following section
-        with autoplayer_lock:
+        try:
             best_moves = game.best_moves(state, min(num_moves, MAX_BEST_MOVES))
+        except RobotError as e:
+            logging.warning(f"Best moves failed in game {uuid}: {e}")
+            return jsonify(result=Error.SERVER_ERROR)
 
     uid = user.id()
     if uid is not None and game.has_player(uid):
@@ -64,6 +64,115 @@ running_local: bool = os.environ.get("SERVER_SOFTWARE", "").startswith("Developm
 host: str = os.environ.get("SERVER_HOST", "127.0.0.1")
 port: str = os.environ.get("SERVER_PORT", "8080")
 
+# Should the packed DAWG vocabularies be memory-mapped instead of being read
+# into private byte buffers? Mapped files are shared between all worker
+# processes on an instance via the operating system's page cache.
+# Set DAWG_MMAP to FALSE to disable.
+DAWG_MMAP: bool = os.environ.get("DAWG_MMAP", "TRUE").upper() not in ("FALSE", "0")
+
+# Should vocabularies be loaded lazily, on first use, instead of all
+# being loaded at startup? Set DAWG_LAZY to TRUE to enable.
+DAWG_LAZY: bool = os.environ.get("DAWG_LAZY", "FALSE").upper() in ("TRUE", "1")
+
+# If nonzero, robot vocabularies that have not been used for this many
+# seconds are released from memory (and reloaded on next use)
+DAWG_IDLE_EVICT_SECONDS: int = int(os.environ.get("DAWG_IDLE_EVICT_SECONDS", "0"))
+
+# Should the packed DAWG vocabularies be decoded at load time into
+# in-memory node tables, with a bit mask of outgoing letters per node?
+# This speeds up navigation at the cost of private (per-process) memory.
+# Set DAWG_COMPILE to TRUE to enable.
+DAWG_COMPILE: bool = os.environ.get("DAWG_COMPILE", "FALSE").upper() in ("TRUE", "1")
+
+# Should DAWG navigation use the iterative engine, with an explicit stack,
+# instead of the recursive one? Set DAWG_ITERATIVE to TRUE to enable.
+DAWG_ITERATIVE: bool = os.environ.get("DAWG_ITERATIVE", "FALSE").upper() in (
+    "TRUE",
+    "1",
+)
+
+# Should robots generate moves with a GADDAG, if one has been built
+# for the vocabulary (see run_english_gaddags() in utils/dawgbuilder.py)?
+# Set DAWG_GADDAG to TRUE to enable.
+DAWG_GADDAG: bool = os.environ.get("DAWG_GADDAG", "FALSE").upper() in ("TRUE", "1")
+
+# How many levels of each main vocabulary graph, counted from the root,
+# should be decoded and pinned in memory when an instance is warmed up?
+# Pinned nodes are never evicted from the decoded node cache.
+# Set DAWG_WARMUP_LEVELS to 0 to disable.
+DAWG_WARMUP_LEVELS: int = int(os.environ.get("DAWG_WARMUP_LEVELS", "4"))
+
+
+def _per_vocabulary(spec: str) -> Dict[str, int]:
+    """Parse a specification such as "2048,ordalisti=8192" into a dict
+    of values by vocabulary, where the key "" holds the default value"""
+    result: Dict[str, int] = dict()
+    for item in spec.split(","):
+        vocab, _, value = item.strip().rpartition("=")
+        result[vocab] = int(value)
+    return result
+
+
+# Budget, in kilobytes, for the cache of decoded graph nodes that each DAWG
+# dictionary keeps. The budget can be set per vocabulary, according to its
+# traffic, as in DAWG_NODE_CACHE_KB=8192,ordalisti=16384,osps37=2048,
+# where the first number is the budget for vocabularies that are not listed.
+DAWG_NODE_CACHE_KB: Dict[str, int] = _per_vocabulary(
+    os.environ.get("DAWG_NODE_CACHE_KB", "8192")
+)
+
+# Budget, in kilobytes, for the cache of left part tables, i.e. the partial
+# words that can be formed from a rack, that each process keeps for robot
+# move generation (see left_part_table() in skraflplayer.py). A table takes
+# 20-150 KB for a rack without blanks, and up to about 1 MB with one blank.
+# Set LEFT_PART_CACHE_KB to 0 to disable the cache.
+LEFT_PART_CACHE_KB: int = int(os.environ.get("LEFT_PART_CACHE_KB", "4096"))
+
+# Should DAWG navigations be timed and counted, per vocabulary and navigator
+# class, for the /metrics/dawg endpoint? Set DAWG_METRICS to FALSE to disable.
+DAWG_METRICS: bool = os.environ.get("DAWG_METRICS", "TRUE").upper() not in (
+    "FALSE",
+    "0",
+)
+
+# Number of worker processes, within each server process, that generate
+# robot moves and best move lists (see robotpool.py). If ROBOT_WORKERS is 0,
+# they are generated in the request thread instead, one at a time.
+# Memory budget: every server (gunicorn) process starts its own pool, plus
+# a forkserver process, so an instance runs (number of server processes) x
+# (ROBOT_WORKERS + 1) additional processes, e.g. 4 x 3 = 12 with -w 4.
+# Each of them takes about 25 MB of private memory once it has loaded the
+# robot modules (the vocabularies are shared if DAWG_MMAP is set), and its
+# caches grow by up to DAWG_NODE_CACHE_KB for each vocabulary used, plus
+# LEFT_PART_CACHE_KB and the cross-check caches. The pool is therefore
+# disabled by default. Enable it only on instances that have the memory,
+# with few server processes.
+ROBOT_WORKERS: int = int(os.environ.get("ROBOT_WORKERS", "0"))
+
+# Maximum time, in seconds, that a request waits for a robot move
+# or a best move list, including any time spent in the queue
+ROBOT_MOVE_TIMEOUT: float = float(os.environ.get("ROBOT_MOVE_TIMEOUT", "30"))
+
+# Should a best move list be generated by all robot workers in parallel,
+# each taking a share of the rows and columns of the board? This lowers the
+# latency of heavy positions, such as with blanks in the rack, on instances
+# with idle cores. Set ROBOT_SPLIT_AXES to TRUE to enable.
+ROBOT_SPLIT_AXES: bool = os.environ.get("ROBOT_SPLIT_AXES", "FALSE").upper() in (
+    "TRUE",
+    "1",
+)
+
+# Number of best move lists that each server process keeps, keyed by the
+# contents of the board, the rack, the vocabulary, the tile set and the
+# board type, so that positions revisited in game reviews are served without
+# generating moves again. Set BEST_MOVES_CACHE_SIZE to 0 to disable.
+BEST_MOVES_CACHE_SIZE: int = int(os.environ.get("BEST_MOVES_CACHE_SIZE", "256"))
+
+# Time, in seconds, that best move lists are also kept in Redis, where they
+# are shared by all server instances. Set BEST_MOVES_REDIS_SECONDS to 0
+# to disable.
+BEST_MOVES_REDIS_SECONDS: int = int(os.environ.get("BEST_MOVES_REDIS_SECONDS", "0"))
+
 # App Engine (and Firebase) project id
 PROJECT_ID = os.environ.get("PROJECT_ID", "")
 assert PROJECT_ID, "PROJECT_ID environment variable not set"
@@ -22,11 +22,22 @@
         Returns True if the word is found in the dictionary, or False if not.
         The __contains__ operator is supported, so "'myword' in dawgdict" also works.
 
+    DawgDictionary.find_many(words)
+        Returns a list of booleans indicating whether each of the given words
+        is found in the dictionary. The words are looked up in a single sorted
+        pass, sharing the traversal of common prefixes.
+
     DawgDictionary.find_matches(pattern)
         Returns a list of words that match the pattern. The pattern can contain
         wildcards ('?'). For example, result = dawgdict.find_matches("ex???") returns
         a list of all 5-letter words starting with "ex".
 
+    DawgDictionary.find_pattern(pattern, minlen, maxlen)
+        Returns a list of words that match a richer pattern, with letter classes
+        ('[aeiou]', '[^aeiou]') and repetitions ('*'), and length bounds.
+        For example, result = dawgdict.find_pattern("st?*", 4, 7) returns a list
+        of all words of 4 to 7 letters starting with "st". See CompiledPattern.
+
     DawgDictionary.find_permutations(rack)
         Returns a list of all permutations of the given rack, i.e. valid words
         consisting of one or more letters from the rack in various orders.
@@ -42,6 +53,17 @@
         results. The navigation object should implement a number of interface functions,
         as documented in comments for the navigate() function.
 
+    If the graph is loaded with compile_graph=True, it is additionally decoded
+    into a CompiledGraph, i.e. flat tables of nodes and edges with a bit mask
+    of the outgoing first letters of each node. Navigation then uses these tables
+    instead of decoding the packed bytes, and skips edges whose first letter
+    is excluded by the navigator's edge_mask().
+
+    Navigation is normally recursive, with a Python call per node and edge
+    along each path. If the dictionary's iterative attribute is set (see
+    DAWG_ITERATIVE in config.py), an IterativeNavigation is used instead,
+    which keeps an explicit stack of frames and works with the same navigators.
+
     DawgDictionary.FindNavigator(word)
         A navigation class to find words by exact match. Used by DawgDictionary.find()
 
@@ -51,6 +73,27 @@
     DawgDictionary.MatchNavigator(rack, minlen)
         A navigation class to find words matching a pattern. Used by DawgDictionary.find_matches()
 
+    DawgDictionary.PatternNavigator(pattern, minlen, maxlen, sort)
+        A navigation class to find words matching a CompiledPattern.
+        Used by DawgDictionary.find_pattern()
+
+    The .bin.dawg files end with a header (see DawgHeader) that is validated
+    on loading, and that supplies metadata such as the word count and the
+    two-letter word lists without exploring the graph.
+
+    If an anagram index (see AnagramIndex) has been built for a vocabulary,
+    find_permutations() looks the rack's letter combinations up in it
+    instead of exploring the graph.
+
+    PackedDawgDictionary.word_index(word) returns the position of a word in
+    the sorted vocabulary, which allows robot vocabularies to be stored as bit
+    sets over their main vocabulary (see VocabularySubset) instead of as
+    separate graphs.
+
+    PackedGaddag is a variant of PackedDawgDictionary for GADDAGs, which are
+    used for robot move generation in skraflplayer.py if available.
+    See Wordbase.gaddag().
+
     See also comments in dawgbuilder.py
 
     Test code for this module is found in dawgtester.py
@@ -59,16 +102,44 @@
 
 from __future__ import annotations
 
-from typing import Dict, Optional, Tuple, Iterator, List
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    NamedTuple,
+    TypedDict,
+    Optional,
+    Tuple,
+    Iterator,
+    List,
+    Union,
+)
 
 import os
+import sys
+import mmap
 import threading
 import logging
 import time
 import struct
+import json
+import zlib
 import abc
 from functools import lru_cache
-
+from heapq import heappush, heapreplace
+from collections import Counter
+from itertools import combinations_with_replacement
+
+from config import (
+    DAWG_MMAP,
+    DAWG_LAZY,
+    DAWG_IDLE_EVICT_SECONDS,
+    DAWG_COMPILE,
+    DAWG_ITERATIVE,
+    DAWG_WARMUP_LEVELS,
+    DAWG_METRICS,
+    DAWG_NODE_CACHE_KB,
+)
 from languages import (
     Alphabet,
     IcelandicAlphabet,
@@ -85,49 +156,879 @@ from languages import (
 IterTuple = Tuple[str, int]
 PrefixNodes = Tuple[IterTuple, ...]
 TwoLetterListTuple = Tuple[List[str], List[str]]
+# A packed DAWG is either read into a byte buffer or memory-mapped
+DawgBuffer = Union[bytes, mmap.mmap]
+# A position in the packed graph: (byte offset, remaining prefix letters, final).
+# If remaining is zero, the offset is that of a node (or -1 if there is no node).
+GraphPosition = Tuple[int, int, bool]
+# The position of the root node
+ROOT_POSITION: GraphPosition = (0, 0, False)
+# An edge in a compiled graph: (prefix, next node number, bit of first letter)
+CompiledEdge = Tuple[str, int, int]
+CompiledEdges = Tuple[CompiledEdge, ...]
+# A frame on the stack of an iterative navigation:
+# (iterator over the remaining edges of a node, matched string, edge mask)
+NavigationFrame = Tuple[Iterator[Any], str, int]
 
 
 # Base project directory path
 BASE_PATH = os.path.join(os.path.dirname(__file__), "..")
 
+# Default budget for the cache of decoded nodes of each dictionary, in bytes
+NODE_CACHE_BUDGET = DAWG_NODE_CACHE_KB.get("", 8192) * 1024
+
+# Sizes of the objects in a decoded node (see node_size())
+_EDGE_TUPLE_SIZE = sys.getsizeof((0, 0))
+_OFFSET_SIZE = sys.getsizeof(1 << 20)
+
+# Maximum number of cross-check patterns cached per dictionary
+CROSSCHECK_CACHE_SIZE = 16 * 1024
+
+# Maximum number of decoded graph positions cached per GADDAG
+GADDAG_CACHE_SIZE = 64 * 1024
+
+# Maximum number of state sets in a compiled word pattern
+MAX_PATTERN_STATES = 4 * 1024
+
+# Version of the header that follows the packed graph in .bin.dawg files
+# (see dawgbuilder.py), and the marker at the very end of such files
+DAWG_HEADER_VERSION = 1
+DAWG_HEADER_MAGIC = b"DAWGHDR\x00"
+
+
+class DawgHeader(TypedDict):
+
+    """ Metadata about a packed graph, from its .bin.dawg file """
+
+    version: int
+    # The letters, in the order of their codes
+    alphabet: str
+    gaddag: bool
+    # Size of the packed graph in bytes, and its CRC-32 checksum
+    size: int
+    crc32: int
+    nodes: int
+    edges: int
+    words: int
+    # The two-letter words, sorted by first letter and by second letter
+    two_letter: List[List[str]]
+
+
+def read_header(b: DawgBuffer, verify: bool = True) -> Optional[DawgHeader]:
+    """Read the header at the end of a .bin.dawg file and, if verify
+    is True, the checksum of the graph. Returns None if the file has no
+    header, i.e. it was built by an older version of dawgbuilder.py.
+    Raises ValueError if the file is truncated or corrupt."""
+    magic = len(b) - len(DAWG_HEADER_MAGIC)
+    if magic < 4 or b[magic:] != DAWG_HEADER_MAGIC:
+        return None
+    (length,) = struct.unpack_from("<L", b, magic - 4)
+    start = magic - 4 - length
+    if start < 0:
+        raise ValueError("Truncated DAWG header")
+    try:
+        header: DawgHeader = json.loads(b[start : magic - 4].decode("utf-8"))
+        version, size, crc32 = header["version"], header["size"], header["crc32"]
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError("Malformed DAWG header") from e
+    if version > DAWG_HEADER_VERSION:
+        raise ValueError("Unsupported DAWG header version {0}".format(version))
+    if not verify:
+        return header
+    if size != start:
+        raise ValueError("DAWG graph size does not match its header")
+    if zlib.crc32(memoryview(b)[:start]) != crc32:
+        raise ValueError("DAWG checksum does not match its header")
+    return header
+
+
+def read_file_header(fname: str) -> Optional[DawgHeader]:
+    """Read the header of a .bin.dawg file without reading the graph
+    itself, which is thus not verified. Returns None if the file has
+    no header. Raises ValueError if the header is corrupt."""
+    with open(fname, mode="rb") as fin:
+        fin.seek(0, os.SEEK_END)
+        end = fin.tell()
+        trailer = 4 + len(DAWG_HEADER_MAGIC)
+        if end < trailer:
+            return None
+        fin.seek(end - trailer)
+        tail = fin.read(trailer)
+        if tail[4:] != DAWG_HEADER_MAGIC:
+            return None
+        (length,) = struct.unpack_from("<L", tail)
+        if length > end - trailer:
+            raise ValueError("Truncated DAWG header")
+        fin.seek(end - trailer - length)
+        return read_header(fin.read(length) + tail, verify=False)
+
+
+class WarmupReport(TypedDict):
+
+    """The outcome of Wordbase.warmup()"""
+
+    # True if all main vocabularies were available
+    ok: bool
+    seconds: float
+    # Number of nodes decoded and pinned, and their approximate size in bytes
+    nodes: int
+    bytes: int
+
+
+class NavigatorMetrics(TypedDict):
+
+    """Totals for the navigations of a dictionary by one navigator class"""
+
+    navigations: int
+    nodes: int
+    seconds: float
+
+
+class SlowNavigation(TypedDict):
+
+    """One of the slowest navigations of a dictionary"""
+
+    navigator: str
+    # The navigator's input, such as a rack or a pattern (see Navigator.describe())
+    input: str
+    nodes: int
+    seconds: float
+
+
+class DictionaryMetrics(TypedDict):
+
+    """Navigation metrics for a dictionary, as reported by Wordbase.metrics()"""
+
+    navigators: Dict[str, NavigatorMetrics]
+    # Number of nodes visited that had to be decoded, i.e. were neither
+    # pinned nor found in the dictionary's NodeCache
+    decoded: int
+    pinned: int
+    # Number of nodes in the NodeCache, their approximate size and the budget
+    cache_entries: int
+    cache_bytes: int
+    cache_budget: int
+    slowest: List[SlowNavigation]
+
+
+class NavigationStats:
+
+    """Counters for the navigations of a dictionary. They are updated
+    without locking, so they are approximate if navigations run
+    concurrently in several threads."""
+
+    # How many of the slowest navigations to keep
+    SLOWEST = 10
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        """ Zero all counters """
+        # Navigator class -> [navigations, nodes, seconds]
+        self._counts: Dict[type, List[Any]] = dict()
+        self.decoded = 0
+        # A min-heap of (seconds, nodes, navigator class name, input)
+        self._slowest: List[Tuple[float, int, str, str]] = []
+        # Navigations that take longer than this are candidates for _slowest
+        self._threshold = 0.0
+
+    @property
+    def navigations(self) -> int:
+        """ Return the total number of navigations """
+        return sum(c[0] for c in self._counts.values())
+
+    def record(self, nav: Navigator, label: str, nodes: int, seconds: float) -> None:
+        """ Record a completed navigation """
+        cls = type(nav)
+        c = self._counts.get(cls)
+        if c is None:
+            c = self._counts[cls] = [0, 0, 0.0]
+        c[0] += 1
+        c[1] += nodes
+        c[2] += seconds
+        if seconds > self._threshold:
+            with self._lock:
+                slowest = self._slowest
+                item = (seconds, nodes, cls.__name__, label)
+                if len(slowest) < self.SLOWEST:
+                    heappush(slowest, item)
+                    if len(slowest) < self.SLOWEST:
+                        return
+                elif seconds > slowest[0][0]:
+                    heapreplace(slowest, item)
+                self._threshold = slowest[0][0]
+
+    def metrics(self, pinned: int, cache: NodeCache) -> DictionaryMetrics:
+        """ Return a snapshot of the counters """
+        with self._lock:
+            slowest = sorted(self._slowest, reverse=True)
+        return DictionaryMetrics(
+            navigators={
+                cls.__name__: NavigatorMetrics(
+                    navigations=c[0], nodes=c[1], seconds=c[2]
+                )
+                for cls, c in list(self._counts.items())
+            },
+            decoded=self.decoded,
+            pinned=pinned,
+            cache_entries=cache.entries,
+            cache_bytes=cache.size,
+            cache_budget=cache.budget,
+            slowest=[
+                SlowNavigation(navigator=name, input=label, nodes=nodes, seconds=t)
+                for t, nodes, name, label in slowest
+            ],
+        )
+
+
+def merge_metrics(a: DictionaryMetrics, b: DictionaryMetrics) -> DictionaryMetrics:
+    """ Combine the navigation metrics of a dictionary from two processes.
+        The counters are added up, while the pinned nodes and the NodeCache
+        figures are those of the process where they are highest. """
+    navigators = dict(a["navigators"])
+    for name, m in b["navigators"].items():
+        n = navigators.get(name)
+        navigators[name] = m if n is None else NavigatorMetrics(
+            navigations=n["navigations"] + m["navigations"],
+            nodes=n["nodes"] + m["nodes"],
+            seconds=n["seconds"] + m["seconds"],
+        )
+    return DictionaryMetrics(
+        navigators=navigators,
+        decoded=a["decoded"] + b["decoded"],
+        pinned=max(a["pinned"], b["pinned"]),
+        cache_entries=max(a["cache_entries"], b["cache_entries"]),
+        cache_bytes=max(a["cache_bytes"], b["cache_bytes"]),
+        cache_budget=max(a["cache_budget"], b["cache_budget"]),
+        slowest=sorted(
+            a["slowest"] + b["slowest"], key=lambda s: s["seconds"], reverse=True
+        )[0 : NavigationStats.SLOWEST],
+    )
+
+
+def node_size(node: PrefixNodes) -> int:
+    """ Return the approximate memory footprint of a decoded node, in bytes.
+        Single-letter prefixes are shared and therefore not counted. """
+    size = sys.getsizeof(node)
+    for prefix, nextnode in node:
+        size += _EDGE_TUPLE_SIZE
+        if nextnode:
+            size += _OFFSET_SIZE
+        if len(prefix) > 1:
+            size += sys.getsizeof(prefix)
+    return size
+
+
+class NodeCache:
+
+    """A cache of the decoded nodes of a packed graph, by offset, whose
+    approximate size in bytes is kept within a budget. Nodes are held in
+    two generations: new entries go into the young generation, and when
+    that has used half of the budget, it becomes the old generation,
+    replacing (and thereby evicting) the previous old generation. A node
+    that is found in the old generation is moved into the young one, so
+    frequently used nodes survive. This approximates LRU eviction without
+    any bookkeeping on the hits in the young generation.
+
+    Each operation on the cache is a single dict operation or attribute
+    assignment, so no lock is needed, neither with threads nor with
+    eventlet. Concurrent updates may at worst cause a node to be decoded
+    twice, or the byte counts to drift slightly until the next rotation."""
+
+    def __init__(self, pd: PackedDawgDictionary, budget: int) -> None:
+        self._pd = pd
+        self.budget = budget
+        self.clear()
+
+    def clear(self) -> None:
+        """ Remove all nodes from the cache """
+        self._young: Dict[int, PrefixNodes] = dict()
+        self._old: Dict[int, PrefixNodes] = dict()
+        self._young_bytes = 0
+        self._old_bytes = 0
+
+    @property
+    def entries(self) -> int:
+        """ Return the number of cached nodes """
+        return len(self._young) + len(self._old)
+
+    @property
+    def size(self) -> int:
+        """ Return the approximate size of the cached nodes, in bytes """
+        return self._young_bytes + self._old_bytes
+
+    def get(self, offset: int) -> PrefixNodes:
+        """ Return the decoded node at the given offset """
+        node = self._young.get(offset)
+        if node is not None:
+            return node
+        node = self._old.pop(offset, None)
+        if node is None:
+            self._pd.stats.decoded += 1
+            node = tuple(Navigation._iter_from_node(self._pd, offset))
+            size = node_size(node)
+        else:
+            size = node_size(node)
+            self._old_bytes -= size
+        if self._young_bytes + size > self.budget // 2:
+            # The young generation is full: it becomes the old one
+            self._old, self._old_bytes = self._young, self._young_bytes
+            self._young, self._young_bytes = dict(), 0
+        self._young[offset] = node
+        self._young_bytes += size
+        return node
+
 
 class PackedDawgDictionary:
 
     """Encapsulates a DAWG dictionary that is initialized from a packed
-    binary file on disk and navigated as a byte buffer."""
+    binary file on disk and navigated as a byte buffer. The buffer
+    can optionally be a read-only memory map of the file, in which
+    case its pages are shared between all processes that map it."""
+
+    # Is this graph a GADDAG?
+    is_gaddag = False
 
     def __init__(self, alphabet: Alphabet) -> None:
-        # The packed byte buffer
-        self.b: Optional[bytes] = None
+        # The packed byte buffer, or a read-only memory map of the file
+        self.b: Optional[DawgBuffer] = None
         # Lock to ensure that only one thread loads the dictionary
         self._lock = threading.Lock()
         self.alphabet = alphabet
         self.coding = alphabet.coding
+        # Map letters to their integer codes in the packed graph
+        self.encoding: Dict[str, int] = {c: i for i, c in enumerate(alphabet.order)}
         # Cached list of two letter words in this DAWG,
         # sorted by first letter and second letter
         self._two_letter: Tuple[List[str], List[str]] = ([], [])
+        # The file that the graph was loaded from, allowing it
+        # to be reloaded after having been unloaded
+        self._fname: Optional[str] = None
+        self._use_mmap = False
+        self._compile = False
+        # The metadata from the file header, if the file has one
+        self.header: Optional[DawgHeader] = None
+        # The decoded node tables, if the graph has been compiled
+        self.graph: Optional[CompiledGraph] = None
+        # Use the non-recursive navigation engine?
+        self.iterative = DAWG_ITERATIVE
+        # Index of words by anagram signature, if one has been built
+        self.anagrams: Optional[AnagramIndex] = None
+        # For each node, the cumulative number of words reachable through
+        # its outgoing edges, computed on first use by word_index()
+        self._ranks: Optional[Dict[int, Tuple[int, ...]]] = None
+        # Decoded nodes that have been pinned in memory by warm(), by offset.
+        # They are looked up before the cache of decoded nodes
+        # (see Navigation._tuple_from_node()).
+        self.pinned: Dict[int, PrefixNodes] = dict()
+        # Cache of decoded nodes. Wordbase sets its budget per vocabulary.
+        self.node_cache = NodeCache(self, NODE_CACHE_BUDGET)
+        # Time of last use (time.monotonic()), for idle eviction
+        self.last_used = 0.0
+        # Navigation counters, for metrics
+        self.stats = NavigationStats()
+        # Bounded LRU cache of cross-check patterns and their letter bit masks
+        self.crosscheck_bits = lru_cache(maxsize=CROSSCHECK_CACHE_SIZE)(
+            self._crosscheck_bits
+        )
 
-    def load(self, fname: str) -> None:
-        """ Load a packed DAWG from a binary file """
+    def load(
+        self, fname: str, use_mmap: bool = False, compile_graph: bool = False
+    ) -> None:
+        """ Load a packed DAWG from a binary file, optionally
+            by memory-mapping it instead of reading it into memory,
+            and optionally decoding it into a CompiledGraph """
         with self._lock:
             # Ensure that we don't have multiple threads trying to load simultaneously
             if self.b is not None:
                 # Already loaded
                 return
-            # Quickly gulp the file contents into the byte buffer
+            self._fname = fname
+            self._use_mmap = use_mmap
+            self._compile = compile_graph
             with open(fname, mode="rb") as fin:
-                self.b = fin.read()
+                b: DawgBuffer
+                if use_mmap:
+                    # Map the file read-only. The mapping stays valid after
+                    # the file is closed, and the OS page cache holds a single
+                    # copy of the graph for all worker processes on the instance.
+                    b = mmap.mmap(fin.fileno(), 0, access=mmap.ACCESS_READ)
+                else:
+                    # Quickly gulp the file contents into the byte buffer
+                    b = fin.read()
+            # Validate the file before using it
+            header = read_header(b)
+            if header is not None:
+                if header["gaddag"] != self.is_gaddag or not header[
+                    "alphabet"
+                ].startswith(self.alphabet.order):
+                    raise ValueError(
+                        "DAWG file {0} does not match the expected alphabet".format(
+                            fname
+                        )
+                    )
+            self.header = header
+            self.b = b
+            if compile_graph:
+                self.graph = CompiledGraph(self)
+
+    @property
+    def is_mapped(self) -> bool:
+        """ Return True if the DAWG buffer is a memory map """
+        return isinstance(self.b, mmap.mmap)
+
+    @property
+    def is_loaded(self) -> bool:
+        """ Return True if the graph is present in memory """
+        return self.b is not None
+
+    def unload(self) -> None:
+        """ Release the graph buffer. It is reloaded from the same
+            file on next use. Navigations that are already in progress
+            hold their own reference to the buffer and are unaffected. """
+        with self._lock:
+            self.b = None
+            self.graph = None
+            self._ranks = None
+            self.pinned = dict()
+            self.node_cache.clear()
+
+    def reload(self) -> None:
+        """ Reload the graph if it has been unloaded """
+        if self.b is None and self._fname is not None:
+            self.load(self._fname, self._use_mmap, self._compile)
+
+    def warm(self, levels: int) -> int:
+        """ Decode the nodes that are within the given number of levels
+            from the root, and pin them in memory. Returns the number of
+            pinned nodes. A compiled graph is already fully decoded,
+            so nothing is pinned in that case. """
+        if self.b is None or self.graph is not None or levels <= 0:
+            return 0
+        pinned: Dict[int, PrefixNodes] = dict()
+        level = [0]
+        for _ in range(levels):
+            below: List[int] = []
+            for offset in level:
+                if offset in pinned:
+                    continue
+                node = tuple(Navigation._iter_from_node(self, offset))
+                pinned[offset] = node
+                below.extend(nextnode for _, nextnode in node if nextnode)
+            level = below
+        self.pinned = pinned
+        return len(pinned)
+
+    def pinned_size(self) -> int:
+        """ Return the approximate memory footprint of the pinned nodes,
+            in bytes """
+        return sys.getsizeof(self.pinned) + sum(
+            node_size(node) for node in self.pinned.values()
+        )
 
     def find(self, word: str) -> bool:
-        """ Look for a word in the graph, returning True if it is found or False if not """
-        nav = FindNavigator(word)
-        self.navigate(nav)
-        return nav.is_found()
+        """ Look for a word in the graph, returning True if it is found or False if not.
+            This is a specialized version of navigating with a FindNavigator,
+            walking the packed bytes directly and comparing integer letter codes,
+            without creating navigation objects or building matched strings. """
+        b = self.b
+        if b is None:
+            self.reload()
+            b = self.b
+            if b is None:
+                return False
+        lenw = len(word)
+        if lenw == 0:
+            return False
+        enc = self.encoding
+        code = enc.get(word[0])
+        if code is None:
+            return False
+        i = 0
+        offset = 0  # The root node
+        while True:
+            # Look for an outgoing edge whose first letter matches the code
+            num_edges = b[offset] & 0x7F
+            offset += 1
+            for _ in range(num_edges):
+                len_byte = b[offset]
+                offset += 1
+                if len_byte & 0x40:
+                    # Single-letter prefix, with the letter in the header byte
+                    if (len_byte & 0x3F) != code:
+                        offset += 0 if len_byte & 0x80 else 4
+                        continue
+                    i += 1
+                    last = len_byte
+                else:
+                    # Multi-letter prefix
+                    lenp = len_byte & 0x3F
+                    if (b[offset] & 0x7F) != code:
+                        offset += lenp
+                        if not (b[offset - 1] & 0x80):
+                            offset += 4
+                        continue
+                    # The first letter matches: the rest of the prefix must as well
+                    last = b[offset]
+                    offset += 1
+                    i += 1
+                    for _ in range(lenp - 1):
+                        if i == lenw:
+                            # The word ends within the prefix: check the final bit
+                            # of its last letter
+                            return bool(last & 0x80)
+                        code = enc.get(word[i])
+                        last = b[offset]
+                        if code is None or (last & 0x7F) != code:
+                            return False
+                        offset += 1
+                        i += 1
+                # We're at the end of the prefix
+                if last & 0x80:
+                    # No next node: the word ends here
+                    return i == lenw
+                # Move on to the next node
+                (offset,) = _UINT32.unpack_from(b, offset)
+                if i == lenw:
+                    # The word ends here if the next node is final
+                    return bool(b[offset] & 0x80)
+                code = enc.get(word[i])
+                if code is None:
+                    return False
+                break
+            else:
+                # No matching edge
+                return False
 
     def __contains__(self, word: str) -> bool:
         """ Enable simple lookup syntax: "word" in dawgdict """
         return self.find(word)
 
+    def _rank_node(
+        self, b: DawgBuffer, offset: int, ranks: Dict[int, Tuple[int, ...]]
+    ) -> int:
+        """ Tabulate, for a node and (recursively) the nodes below it, the
+            cumulative number of words reachable through each outgoing edge.
+            Returns the total number of words reachable from the node. """
+        cum = ranks.get(offset)
+        if cum is not None:
+            return cum[-1]
+        num_edges = b[offset] & 0x7F
+        offset_edges = offset + 1
+        total = 0
+        counts = [0]
+        for _ in range(num_edges):
+            len_byte = b[offset_edges]
+            offset_edges += 1
+            if len_byte & 0x40:
+                last = len_byte
+            else:
+                lenp = len_byte & 0x3F
+                # Count the words that end within the prefix
+                for j in range(offset_edges, offset_edges + lenp - 1):
+                    if b[j] & 0x80:
+                        total += 1
+                offset_edges += lenp
+                last = b[offset_edges - 1]
+            if last & 0x80:
+                # A word ends at the last letter, and there is no next node
+                total += 1
+            else:
+                (nextnode,) = _UINT32.unpack_from(b, offset_edges)
+                offset_edges += 4
+                if b[nextnode] & 0x80:
+                    total += 1
+                total += self._rank_node(b, nextnode, ranks)
+            counts.append(total)
+        ranks[offset] = tuple(counts)
+        return total
+
+    def _rank_table(self, b: DawgBuffer) -> Dict[int, Tuple[int, ...]]:
+        """ Return the table of cumulative word counts per node """
+        ranks = self._ranks
+        if ranks is None:
+            ranks = dict()
+            self._rank_node(b, 0, ranks)
+            self._ranks = ranks
+        return ranks
+
+    def word_count(self) -> int:
+        """ Return the number of words in the graph """
+        if self.header is not None:
+            return self.header["words"]
+        if self.b is None:
+            self.reload()
+        b = self.b
+        if b is None:
+            return 0
+        return self._rank_table(b)[0][-1]
+
+    def word_index(self, word: str) -> Optional[int]:
+        """ Return the index of a word in the graph, i.e. the number of
+            words that precede it in sorted order, or None if the word
+            is not found. The graph is thus used as a minimal perfect hash
+            of its words, which allows subsets of the vocabulary to be
+            stored as bit sets (see VocabularySubset). The walk is the
+            same as in find(), adding up the words that are passed by. """
+        b = self.b
+        if b is None:
+            self.reload()
+            b = self.b
+            if b is None:
+                return None
+        lenw = len(word)
+        if lenw == 0:
+            return None
+        ranks = self._rank_table(b)
+        enc = self.encoding
+        code = enc.get(word[0])
+        if code is None:
+            return None
+        i = 0
+        index = 0
+        offset = 0  # The root node
+        while True:
+            cum = ranks[offset]
+            num_edges = b[offset] & 0x7F
+            offset += 1
+            for edge in range(num_edges):
+                len_byte = b[offset]
+                offset += 1
+                if len_byte & 0x40:
+                    # Single-letter prefix
+                    if (len_byte & 0x3F) != code:
+                        offset += 0 if len_byte & 0x80 else 4
+                        continue
+                    # Add the words along the edges that we are passing by
+                    index += cum[edge]
+                    i += 1
+                    last = len_byte
+                else:
+                    # Multi-letter prefix
+                    lenp = len_byte & 0x3F
+                    if (b[offset] & 0x7F) != code:
+                        offset += lenp
+                        if not (b[offset - 1] & 0x80):
+                            offset += 4
+                        continue
+                    index += cum[edge]
+                    last = b[offset]
+                    offset += 1
+                    i += 1
+                    for _ in range(lenp - 1):
+                        if i == lenw:
+                            return index if last & 0x80 else None
+                        if last & 0x80:
+                            # A shorter word ends here, and precedes ours
+                            index += 1
+                        code = enc.get(word[i])
+                        last = b[offset]
+                        if code is None or (last & 0x7F) != code:
+                            return None
+                        offset += 1
+                        i += 1
+                # We're at the end of the prefix
+                if last & 0x80:
+                    # No next node: the word ends here
+                    return index if i == lenw else None
+                (offset,) = _UINT32.unpack_from(b, offset)
+                final = b[offset] & 0x80
+                if i == lenw:
+                    return index if final else None
+                if final:
+                    index += 1
+                code = enc.get(word[i])
+                if code is None:
+                    return None
+                break
+            else:
+                # No matching edge
+                return None
+
+    def _step(
+        self, b: DawgBuffer, offset: int, rem: int, code: int
+    ) -> Optional[GraphPosition]:
+        """ Move one letter forward from a position in the graph, returning
+            the new position, or None if the letter cannot follow """
+        if rem == 0:
+            if offset < 0:
+                # No next node: nowhere to go
+                return None
+            # At a node: look for an outgoing edge starting with the letter
+            num_edges = b[offset] & 0x7F
+            offset += 1
+            for _ in range(num_edges):
+                len_byte = b[offset]
+                offset += 1
+                if len_byte & 0x40:
+                    # Single-letter prefix
+                    if (len_byte & 0x3F) == code:
+                        if len_byte & 0x80:
+                            return (-1, 0, True)
+                        (nextnode,) = _UINT32.unpack_from(b, offset)
+                        return (nextnode, 0, bool(b[nextnode] & 0x80))
+                    offset += 0 if len_byte & 0x80 else 4
+                else:
+                    lenp = len_byte & 0x3F
+                    if (b[offset] & 0x7F) == code:
+                        # Enter the multi-letter prefix
+                        rem = lenp
+                        break
+                    offset += lenp
+                    if not (b[offset - 1] & 0x80):
+                        offset += 4
+            else:
+                return None
+        # Within a multi-letter prefix
+        c = b[offset]
+        if (c & 0x7F) != code:
+            return None
+        if rem > 1:
+            return (offset + 1, rem - 1, bool(c & 0x80))
+        # Last letter of the prefix
+        if c & 0x80:
+            return (-1, 0, True)
+        (nextnode,) = _UINT32.unpack_from(b, offset + 1)
+        return (nextnode, 0, bool(b[nextnode] & 0x80))
+
+    def _successors(
+        self, b: DawgBuffer, pos: GraphPosition
+    ) -> Iterator[Tuple[int, GraphPosition]]:
+        """ Generate the letter codes that can follow a position in
+            the graph, together with the resulting positions """
+        offset, rem, _ = pos
+        if rem == 0:
+            if offset < 0:
+                return
+            num_edges = b[offset] & 0x7F
+            offset += 1
+            for _ in range(num_edges):
+                len_byte = b[offset]
+                offset += 1
+                if len_byte & 0x40:
+                    # Single-letter prefix
+                    if len_byte & 0x80:
+                        yield len_byte & 0x3F, (-1, 0, True)
+                    else:
+                        (nextnode,) = _UINT32.unpack_from(b, offset)
+                        offset += 4
+                        final = bool(b[nextnode] & 0x80)
+                        yield len_byte & 0x3F, (nextnode, 0, final)
+                else:
+                    # Multi-letter prefix: we stop after its first letter
+                    lenp = len_byte & 0x3F
+                    c = b[offset]
+                    yield c & 0x7F, (offset + 1, lenp - 1, bool(c & 0x80))
+                    offset += lenp
+                    if not (b[offset - 1] & 0x80):
+                        offset += 4
+            return
+        # Within a multi-letter prefix, only one letter can follow
+        c = b[offset]
+        if rem > 1:
+            yield c & 0x7F, (offset + 1, rem - 1, bool(c & 0x80))
+        elif c & 0x80:
+            yield c & 0x7F, (-1, 0, True)
+        else:
+            (nextnode,) = _UINT32.unpack_from(b, offset + 1)
+            yield c & 0x7F, (nextnode, 0, bool(b[nextnode] & 0x80))
+
+    def _crosscheck_bits(self, pattern: str) -> int:
+        """ Return a bit pattern of the letters that can replace the single
+            '?' wildcard in the pattern to form a valid word. This is the
+            uncached implementation of crosscheck_bits(). """
+        b = self.b
+        if b is None:
+            self.reload()
+            b = self.b
+            if b is None:
+                return 0
+        above, below = pattern.split("?")
+        enc = self.encoding
+        step = self._step
+        pos: Optional[GraphPosition] = ROOT_POSITION
+        for ch in above:
+            code = enc.get(ch)
+            if code is None:
+                return 0
+            assert pos is not None
+            pos = step(b, pos[0], pos[1], code)
+            if pos is None:
+                return 0
+        assert pos is not None
+        below_codes: List[int] = []
+        for ch in below:
+            code = enc.get(ch)
+            if code is None:
+                return 0
+            below_codes.append(code)
+        bits = 0
+        for code, p in self._successors(b, pos):
+            # See whether the letters below can follow
+            q: Optional[GraphPosition] = p
+            for c in below_codes:
+                assert q is not None
+                q = step(b, q[0], q[1], c)
+                if q is None:
+                    break
+            if q is not None and q[2]:
+                bits |= 1 << code
+        return bits
+
+    def crosscheck_stats(self) -> Dict[str, float]:
+        """ Return statistics for the cross-check pattern cache """
+        info = self.crosscheck_bits.cache_info()
+        lookups = info.hits + info.misses
+        return dict(
+            hits=info.hits,
+            misses=info.misses,
+            size=info.currsize,
+            hit_rate=info.hits / lookups if lookups else 0.0,
+        )
+
+    def find_many(self, words: Iterable[str]) -> List[bool]:
+        """ Look up a number of words in one pass, returning a list of
+            booleans in the same order as the words. The words are visited
+            in sorted order, so that the graph traversal for a common
+            prefix is shared between consecutive words. """
+        wlist = list(words)
+        result = [False] * len(wlist)
+        b = self.b
+        if b is None:
+            self.reload()
+            b = self.b
+            if b is None:
+                return result
+        enc = self.encoding
+        # path[k] is the graph position after k letters of the previous word
+        path: List[GraphPosition] = [ROOT_POSITION]
+        last = ""
+        for ix in sorted(range(len(wlist)), key=wlist.__getitem__):
+            word = wlist[ix]
+            # Find the length of the prefix shared with the previous word
+            k = 0
+            lim = min(len(word), len(last), len(path) - 1)
+            while k < lim and word[k] == last[k]:
+                k += 1
+            del path[k + 1 :]
+            pos: Optional[GraphPosition] = path[k]
+            lenw = len(word)
+            while k < lenw and pos is not None:
+                code = enc.get(word[k])
+                if code is None:
+                    break
+                pos = self._step(b, pos[0], pos[1], code)
+                if pos is not None:
+                    path.append(pos)
+                    k += 1
+            if k == lenw and lenw > 0:
+                # The whole word was traversed: is it final?
+                result[ix] = path[k][2]
+            last = word
+        return result
+
     def __hash__(self) -> int:
         """Return a hash value for this dictionary"""
         return id(self)
@@ -145,6 +1046,18 @@ class PackedDawgDictionary:
         self.navigate(nav)
         return nav.result()
 
+    def find_pattern(
+        self, pattern: str, minlen: int = 0, maxlen: int = 0, sort: bool = True
+    ) -> List[str]:
+        """Returns a list of words matching a pattern that can contain
+        letter classes and repetitions (see CompiledPattern), and that are
+        at least minlen and (if maxlen is nonzero) at most maxlen letters long.
+        Raises ValueError if the pattern is malformed.
+        """
+        nav = PatternNavigator(pattern, minlen, maxlen, sort)
+        self.navigate(nav)
+        return nav.result()
+
     def find_permutations(self, rack: str, minlen: int = 0) -> List[str]:
         """Returns a list of legal permutations of a rack of letters.
         The list is sorted in descending order by permutation length.
@@ -152,6 +1065,13 @@ class PackedDawgDictionary:
         Question marks should be used carefully as they can
         yield very large result sets.
         """
+        if self.anagrams is not None:
+            # Look the rack's letter combinations up in the anagram index
+            # instead of exploring the graph
+            result = self.anagrams.sub_anagrams(rack, minlen)
+            sortkey = current_alphabet().sortkey
+            result.sort(key=lambda x: (-len(x), sortkey(x)))
+            return result
         nav = PermutationNavigator(rack, minlen)
         self.navigate(nav)
         return nav.result()
@@ -175,24 +1095,87 @@ class PackedDawgDictionary:
             if there is no need to visit other edges
         def done()
             called when the navigation is completed
+
+        Optionally, the navigation object can also implement:
+
+        def edge_mask()
+            returns a bit mask of the letters that push_edge() might accept
+            as the first letter of an edge at the current point; used to
+            skip edges (and entire nodes) without calling push_edge()
+            when navigating a compiled graph
         """
+        if self.b is None:
+            # The graph may have been unloaded because it was idle
+            self.reload()
         if self.b is None:
             # No graph: no navigation
             nav.done()
+        elif DAWG_METRICS:
+            label = nav.describe()
+            navigation = self._navigation(nav)
+            t0 = time.perf_counter()
+            navigation.go()
+            self.stats.record(
+                nav, label, navigation.nodes, time.perf_counter() - t0
+            )
         else:
-            Navigation(nav, self).go()
+            self._navigation(nav).go()
 
     def resume_navigation(
         self, nav: Navigator, prefix: str, nextnode: int, leftpart: str
     ) -> None:
         """Continue a previous navigation of the DAWG, using saved
         state information"""
+        if self.b is None:
+            self.reload()
+        assert self.b is not None
+        # Note that if the graph is compiled, nextnode is a node number
+        if not DAWG_METRICS:
+            self._navigation(nav).resume(prefix, nextnode, leftpart)
+            return
+        label = nav.describe()
+        navigation = self._navigation(nav)
+        t0 = time.perf_counter()
+        navigation.resume(prefix, nextnode, leftpart)
+        self.stats.record(nav, label, navigation.nodes, time.perf_counter() - t0)
+
+    def next_letters(self, prefix: str, nextnode: int) -> int:
+        """Return a bit mask of the letters that can follow a saved
+        navigation state, i.e. the remaining prefix of an edge and
+        the node that it leads to, as passed to resume_navigation()"""
+        if prefix:
+            # Within an edge: only its next letter can follow
+            return 1 << self.encoding[prefix[0]]
+        if nextnode == 0:
+            # At the end of the edge, with no next node
+            return 0
+        if self.b is None:
+            self.reload()
         assert self.b is not None
-        Navigation(nav, self).resume(prefix, nextnode, leftpart)
+        if self.graph is not None:
+            # In a compiled graph, nextnode is a node number
+            return self.graph.masks[nextnode]
+        enc = self.encoding
+        mask = 0
+        for p, _ in self.pinned.get(nextnode) or self.node_cache.get(nextnode):
+            mask |= 1 << enc[p[0]]
+        return mask
+
+    def _navigation(self, nav: Navigator) -> Navigation:
+        """ Create a navigation of the appropriate kind for this graph """
+        if self.iterative:
+            return IterativeNavigation(nav, self)
+        if self.graph is not None:
+            return CompiledNavigation(nav, self)
+        return Navigation(nav, self)
 
     def two_letter_words(self) -> TwoLetterListTuple:
         """Return the two letter words in this DAWG,
         sorted by first letter and by second letter"""
+        if not self._two_letter[0] and self.header is not None:
+            # Use the lists from the file header
+            tw0, tw1 = self.header["two_letter"]
+            self._two_letter = (tw0, tw1)
         if not self._two_letter[0]:
             # Cache has not yet been populated: calculate the lists
             sk = self.alphabet.sortkey
@@ -204,6 +1187,168 @@ class PackedDawgDictionary:
         return self._two_letter
 
 
+class PackedGaddag(PackedDawgDictionary):
+
+    """A GADDAG (see dawgbuilder.py) in the packed binary format.
+    Letters are coded as in the corresponding DAWG, and the separator
+    between reversed prefixes and suffixes is coded as the letter
+    following the alphabet. A GADDAG is not explored with navigators;
+    instead, move generators trace it letter by letter, using step()
+    and successors() on positions starting with ROOT_POSITION, after
+    ensuring that the graph is loaded by calling buffer()."""
+
+    is_gaddag = True
+
+    def __init__(self, alphabet: Alphabet) -> None:
+        super().__init__(alphabet)
+        self.separator = len(alphabet.order)
+        # Bounded LRU cache of decoded positions, i.e. the positions
+        # that can follow each position, by letter code
+        self._following = lru_cache(maxsize=GADDAG_CACHE_SIZE)(self._decode)
+
+    def _decode(self, offset: int, rem: int) -> Dict[int, GraphPosition]:
+        """ Return a dict of the positions that can follow the given
+            position, keyed by letter code """
+        b = self.b
+        assert b is not None
+        return dict(self._successors(b, (offset, rem, False)))
+
+    # pylint: disable=unused-argument
+    def load(
+        self, fname: str, use_mmap: bool = False, compile_graph: bool = False
+    ) -> None:
+        """ Load the GADDAG. It is never compiled, since the
+            compiled tables have no place for the separator. """
+        super().load(fname, use_mmap, False)
+
+    def buffer(self) -> Optional[DawgBuffer]:
+        """ Return the packed buffer, reloading it if necessary """
+        if self.b is None:
+            self.reload()
+        return self.b
+
+    def step(self, pos: GraphPosition, code: int) -> Optional[GraphPosition]:
+        """ Move one letter (or the separator) forward from a position,
+            returning the new position or None if the letter cannot follow """
+        offset, rem, _ = pos
+        if offset < 0 and rem == 0:
+            return None
+        return self._following(offset, rem).get(code)
+
+    def successors(self, pos: GraphPosition) -> Iterable[Tuple[int, GraphPosition]]:
+        """ Return the letter codes (including the separator) that
+            can follow a position, together with the resulting positions """
+        offset, rem, _ = pos
+        if offset < 0 and rem == 0:
+            return ()
+        return self._following(offset, rem).items()
+
+
+class AnagramIndex:
+
+    """An index of the words of a vocabulary by their anagram signature,
+    i.e. their letters sorted by code point, as written by dawgbuilder.py
+    to a <vocabulary>.anagrams file. The file is read on first use.
+    Finding all words that can be formed from a rack is then a matter
+    of looking up the signatures of the rack's sub-multisets, instead
+    of exploring the DAWG."""
+
+    def __init__(self, fname: str, alphabet: Alphabet) -> None:
+        self._fname = fname
+        self._alphabet = alphabet
+        self._lock = threading.Lock()
+        # The words of the vocabulary, in sorted order; a word's ID is its index
+        self.words: List[str] = []
+        # Map of signature to the IDs of the words having that signature
+        self._index: Dict[str, Tuple[int, ...]] = dict()
+
+    def _load(self) -> None:
+        """ Read the index file, if it has not already been read """
+        with self._lock:
+            if self._index:
+                return
+            with open(self._fname, mode="r", encoding="utf-8") as fin:
+                header = fin.readline().split()
+                assert header[0:2] == ["anagrams", "1"], "Unknown anagram index format"
+                nwords, nsigs = int(header[2]), int(header[3])
+                words = [fin.readline().rstrip("\n") for _ in range(nwords)]
+                index: Dict[str, Tuple[int, ...]] = dict()
+                for _ in range(nsigs):
+                    signature, *ids = fin.readline().split()
+                    index[signature] = tuple(map(int, ids))
+            self.words = words
+            self._index = index
+
+    def anagrams(self, letters: str) -> List[str]:
+        """ Return the words that consist of exactly the given letters """
+        if not self._index:
+            self._load()
+        words = self.words
+        return [words[i] for i in self._index.get("".join(sorted(letters)), ())]
+
+    def sub_anagrams(self, rack: str, minlen: int = 0) -> List[str]:
+        """ Return the words that can be formed from the letters of a rack,
+            which may contain question marks '?' as wildcards, in no
+            particular order """
+        if not self._index:
+            self._load()
+        blanks = rack.count("?")
+        counts = Counter(rack.replace("?", ""))
+        # All sub-multisets of the (non-wildcard) rack letters
+        subsets = [""]
+        for letter, count in counts.items():
+            subsets = [s + letter * n for s in subsets for n in range(count + 1)]
+        # All multisets of letters that the wildcards can stand for
+        fills = [
+            "".join(c)
+            for k in range(blanks + 1)
+            for c in combinations_with_replacement(self._alphabet.order, k)
+        ]
+        signatures = set(
+            "".join(sorted(s + f))
+            for s in subsets
+            for f in fills
+            if len(s) + len(f) >= max(minlen, 1)
+        )
+        index = self._index
+        words = self.words
+        return [
+            words[i] for signature in signatures for i in index.get(signature, ())
+        ]
+
+
+class VocabularySubset:
+
+    """A subset of the words of a main vocabulary, such as a robot
+    vocabulary, stored as a bit set over the word indices of the main
+    vocabulary's graph (see PackedDawgDictionary.word_index()).
+    The set is read from a <vocabulary>.bits file written by
+    dawgbuilder.py, consisting of a header with the number of words
+    in the main vocabulary and in the subset (two little-endian
+    uint32s), followed by the bits, least significant bit first."""
+
+    def __init__(self, main: PackedDawgDictionary, fname: str) -> None:
+        self.main = main
+        with open(fname, mode="rb") as fin:
+            self.total, self.count = _SUBSET_HEADER.unpack(
+                fin.read(_SUBSET_HEADER.size)
+            )
+            self._bits = fin.read()
+        if len(self._bits) * 8 < self.total:
+            raise ValueError("Truncated vocabulary subset file {0}".format(fname))
+
+    def __contains__(self, word: str) -> bool:
+        """ Return True if the word is in the subset """
+        ix = self.main.word_index(word)
+        if ix is None or ix >= self.total:
+            return False
+        return bool(self._bits[ix >> 3] & (1 << (ix & 7)))
+
+
+# A set of words that a robot can be constrained to
+WordSet = Union[PackedDawgDictionary, VocabularySubset]
+
+
 class Wordbase:
 
     """ Container for singleton instances of the supported dictionaries """
@@ -233,23 +1378,120 @@ class Wordbase:
         ("nsf2023.mid", NorwegianAlphabet),
     ]
 
+    # Vocabularies that are only used by robots, to constrain
+    # their choice of moves, mapped to the main vocabularies that
+    # they are subsets of. If a <vocabulary>.bits file exists, a robot
+    # vocabulary is represented as a bit set over its main vocabulary
+    # (see VocabularySubset); otherwise it is loaded as a separate DAWG,
+    # which is a candidate for idle eviction.
+    ROBOT_VOCABS: Dict[str, str] = {
+        "amlodi": "ordalisti",
+        "midlungur": "ordalisti",
+        "otcwl2014.aml": "otcwl2014",
+        "otcwl2014.mid": "otcwl2014",
+        "sowpods.aml": "sowpods",
+        "sowpods.mid": "sowpods",
+        "osps37.aml": "osps37",
+        "osps37.mid": "osps37",
+        "nsf2023.aml": "nsf2023",
+        "nsf2023.mid": "nsf2023",
+    }
+
+    # Minimum interval between sweeps for idle robot vocabularies, in seconds
+    SWEEP_INTERVAL = 60.0
+
     _dawg: Dict[str, PackedDawgDictionary] = dict()
 
+    # Robot vocabularies that are represented as bit sets
+    _subset: Dict[str, VocabularySubset] = dict()
+
+    # GADDAGs, by vocabulary, or None if a vocabulary has no GADDAG
+    _gaddag: Dict[str, Optional[PackedGaddag]] = dict()
+
     _lock = threading.Lock()
 
+    _last_sweep = 0.0
+
     @staticmethod
     def initialize() -> None:
-        """ Load all known dictionaries into memory """
+        """ Set up all known dictionaries. Unless lazy loading is
+            enabled, they are also loaded into memory at this point. """
         with Wordbase._lock:
             if not Wordbase._dawg:
                 for dawg, alphabet in Wordbase.DAWGS:
+                    if Wordbase._load_subset(dawg):
+                        # A robot vocabulary that does not need its own graph
+                        continue
+                    pd = PackedDawgDictionary(alphabet)
+                    pd.node_cache.budget = Wordbase._node_cache_budget(dawg)
+                    if DAWG_LAZY:
+                        # The graph is loaded on first use, in Wordbase._get()
+                        Wordbase._dawg[dawg] = pd
+                        continue
                     try:
-                        Wordbase._dawg[dawg] = Wordbase._load_resource(dawg, alphabet)
+                        Wordbase._dawg[dawg] = Wordbase._load_resource(dawg, pd)
                     except FileNotFoundError:
                         logging.error("Unable to load DAWG {0}".format(dawg))
+                    except ValueError as e:
+                        logging.error("Invalid DAWG {0}: {1}".format(dawg, e))
+
+    @staticmethod
+    def _node_cache_budget(vocab: str) -> int:
+        """ Return the budget for the node cache of a vocabulary, in bytes """
+        return DAWG_NODE_CACHE_KB.get(vocab, NODE_CACHE_BUDGET // 1024) * 1024
 
     @staticmethod
-    def _load_resource(resource: str, alphabet: Alphabet) -> PackedDawgDictionary:
+    def _load_subset(vocab: str) -> bool:
+        """ Load a robot vocabulary as a bit set over its main vocabulary,
+            if a subset file exists for it. Returns True if successful. """
+        main_vocab = Wordbase.ROBOT_VOCABS.get(vocab, "")
+        main = Wordbase._dawg.get(main_vocab)
+        if main is None:
+            return False
+        fname = os.path.abspath(
+            os.path.join(BASE_PATH, "resources", vocab + ".bits")
+        )
+        if not os.path.exists(fname):
+            return False
+        subset = VocabularySubset(main, fname)
+        if subset.total != Wordbase._word_count(main_vocab, main):
+            logging.error(
+                "Vocabulary subset {0} does not match its main vocabulary".format(
+                    vocab
+                )
+            )
+            return False
+        Wordbase._subset[vocab] = subset
+        logging.info(
+            "Loaded vocabulary {0} as a subset of {1} words".format(
+                vocab, subset.count
+            )
+        )
+        return True
+
+    @staticmethod
+    def _word_count(vocab: str, dawg: PackedDawgDictionary) -> int:
+        """ Return the number of words in a vocabulary. If its graph
+            is not loaded, the count is read from the header of its
+            file, so that lazy loading is not defeated. """
+        if not dawg.is_loaded:
+            bname = os.path.abspath(
+                os.path.join(BASE_PATH, "resources", vocab + ".bin.dawg")
+            )
+            try:
+                header = read_file_header(bname)
+                if header is not None:
+                    return header["words"]
+                # A file without a header must be loaded to count its words
+                Wordbase._load_resource(vocab, dawg)
+            except (FileNotFoundError, ValueError):
+                return -1
+        return dawg.word_count()
+
+    @staticmethod
+    def _load_resource(
+        resource: str, dawg: PackedDawgDictionary
+    ) -> PackedDawgDictionary:
         """ Load a dictionary from a binary DAWG file """
 
         bname = os.path.abspath(
@@ -261,29 +1503,126 @@ class Wordbase:
                 os.environ.get("INSTANCE_ID", ""), bname
             )
         )
+        aname = os.path.abspath(
+            os.path.join(BASE_PATH, "resources", resource + ".anagrams")
+        )
+        if os.path.exists(aname):
+            # The anagram index is read on first use
+            dawg.anagrams = AnagramIndex(aname, dawg.alphabet)
         t0 = time.time()
-        dawg = PackedDawgDictionary(alphabet)
-        dawg.load(bname)
+        dawg.load(bname, use_mmap=DAWG_MMAP, compile_graph=DAWG_COMPILE)
         t1 = time.time()
-        logging.info("Loaded complete graph in {0:.2f} seconds".format(t1 - t0))
+        logging.info(
+            "{0} complete graph in {1:.2f} seconds{2}".format(
+                "Mapped" if dawg.is_mapped else "Loaded",
+                t1 - t0,
+                "" if dawg.graph is None else ", {0} nodes compiled".format(
+                    len(dawg.graph.edges)
+                ),
+            )
+        )
+        if dawg.header is None:
+            logging.warning(
+                "DAWG file {0} has no header and was not validated".format(bname)
+            )
+        return dawg
+
+    @staticmethod
+    def _get(vocab: str) -> Optional[PackedDawgDictionary]:
+        """ Return the DAWG object for a vocabulary, loading it
+            first if necessary, or None if it is not available """
+        dawg = Wordbase._dawg.get(vocab)
+        if dawg is None:
+            return None
+        if dawg.b is None:
+            # Lazy loading: the dictionary's own lock ensures
+            # that the graph is only loaded once
+            try:
+                Wordbase._load_resource(vocab, dawg)
+            except FileNotFoundError:
+                logging.error("Unable to load DAWG {0}".format(vocab))
+                Wordbase._dawg.pop(vocab, None)
+                return None
+            except ValueError as e:
+                logging.error("Invalid DAWG {0}: {1}".format(vocab, e))
+                Wordbase._dawg.pop(vocab, None)
+                return None
+        if DAWG_IDLE_EVICT_SECONDS > 0:
+            now = time.monotonic()
+            dawg.last_used = now
+            if now - Wordbase._last_sweep >= Wordbase.SWEEP_INTERVAL:
+                Wordbase._evict_idle(now)
+        return dawg
+
+    @staticmethod
+    def _evict_idle(now: float) -> None:
+        """ Unload robot vocabularies that have been idle for too long """
+        Wordbase._last_sweep = now
+        for vocab in Wordbase.ROBOT_VOCABS:
+            dawg = Wordbase._dawg.get(vocab)
+            if (
+                dawg is not None
+                and dawg.is_loaded
+                and now - dawg.last_used >= DAWG_IDLE_EVICT_SECONDS
+            ):
+                logging.info("Unloading idle DAWG {0}".format(vocab))
+                dawg.unload()
+
+    @staticmethod
+    def _require(vocab: str) -> PackedDawgDictionary:
+        """ Return the DAWG object for a vocabulary, raising
+            KeyError if it is not available """
+        dawg = Wordbase._get(vocab)
+        if dawg is None:
+            raise KeyError(vocab)
         return dawg
 
     @staticmethod
     def dawg() -> PackedDawgDictionary:
         """ Return the main dictionary DAWG object, associated with the
             current thread, i.e. the current user's (or game's) locale """
-        return Wordbase._dawg[current_vocabulary()]
+        return Wordbase._require(current_vocabulary())
 
     @staticmethod
     def dawg_for_locale(locale: str) -> PackedDawgDictionary:
         """ Return the DAWG object associated with the given locale """
         vocab = vocabulary_for_locale(locale)
-        return Wordbase._dawg[vocab]
+        return Wordbase._require(vocab)
 
     @staticmethod
     def dawg_for_vocab(vocab: str) -> Optional[PackedDawgDictionary]:
         """ Return the DAWG object associated with the given vocabulary """
-        return Wordbase._dawg.get(vocab)
+        return Wordbase._get(vocab)
+
+    @staticmethod
+    def robot_vocab(vocab: str) -> Optional[WordSet]:
+        """ Return the set of words associated with a robot vocabulary,
+            either a bit set over its main vocabulary or a separate DAWG """
+        return Wordbase._subset.get(vocab) or Wordbase._get(vocab)
+
+    @staticmethod
+    def gaddag() -> Optional[PackedGaddag]:
+        """ Return the GADDAG for the current vocabulary, loading it on
+            first use, or None if no GADDAG has been built for it """
+        vocab = current_vocabulary()
+        if vocab in Wordbase._gaddag:
+            return Wordbase._gaddag[vocab]
+        with Wordbase._lock:
+            if vocab not in Wordbase._gaddag:
+                gaddag: Optional[PackedGaddag] = None
+                dawg = Wordbase._dawg.get(vocab)
+                if dawg is not None:
+                    try:
+                        gaddag = PackedGaddag(dawg.alphabet)
+                        Wordbase._load_resource(vocab + ".gaddag", gaddag)
+                    except FileNotFoundError:
+                        logging.info("No GADDAG available for {0}".format(vocab))
+                        gaddag = None
+                    except ValueError as e:
+                        logging.error("Invalid GADDAG for {0}: {1}".format(vocab, e))
+                        gaddag = None
+                Wordbase._gaddag[vocab] = gaddag
+        return Wordbase._gaddag[vocab]
 
     @staticmethod
     def two_letter_words(
@@ -291,16 +1630,62 @@ class Wordbase:
     ) -> Tuple[List[str], List[str]]:
         """ Return the two letter word list associated with the
             current vocabulary """
-        dawg = Wordbase._dawg.get(vocabulary or current_vocabulary())
+        dawg = Wordbase._get(vocabulary or current_vocabulary())
         return ([], []) if dawg is None else dawg.two_letter_words()
 
     @staticmethod
-    def warmup() -> bool:
-        """ Called from GAE instance initialization; add warmup code here if needed """
-        return True
-
+    def metrics(reset: bool = False) -> Dict[str, DictionaryMetrics]:
+        """ Return navigation metrics for each dictionary that has been
+            navigated in this process, optionally zeroing the counters
+            afterwards """
+        result = {
+            vocab: dawg.stats.metrics(len(dawg.pinned), dawg.node_cache)
+            for vocab, dawg in Wordbase._dawg.items()
+            if dawg.stats.navigations
+        }
+        if reset:
+            for dawg in Wordbase._dawg.values():
+                dawg.stats.reset()
+        return result
 
-Wordbase.initialize()
+    @staticmethod
+    def warmup() -> WarmupReport:
+        """ Called from GAE instance initialization. Loads the main
+            vocabularies, if they are not loaded already, and decodes and
+            pins the top DAWG_WARMUP_LEVELS levels of their graphs, so that
+            the first robot moves on the instance do not pay for decoding
+            the most frequently visited nodes. If DAWG_LAZY is set, only
+            the vocabularies that have already been loaded are warmed up,
+            as the others may never be used on the instance. """
+        t0 = time.time()
+        ok = True
+        nodes = 0
+        size = 0
+        for vocab, dawg in list(Wordbase._dawg.items()):
+            if vocab in Wordbase.ROBOT_VOCABS:
+                continue
+            if DAWG_LAZY and not dawg.is_loaded:
+                continue
+            dawg = Wordbase._get(vocab)
+            if dawg is None:
+                ok = False
+                continue
+            nodes += dawg.warm(DAWG_WARMUP_LEVELS)
+            size += dawg.pinned_size()
+        return WarmupReport(ok=ok, seconds=time.time() - t0, nodes=nodes, bytes=size)
+
+
+@lru_cache(maxsize=4096)
+def rack_mask(alphabet: Alphabet, rack: str) -> int:
+    """Return a bit mask of the letters in a rack, or a mask
+    with all bits set if the rack contains a wildcard ('?')"""
+    if "?" in rack:
+        return -1
+    lbit = alphabet.letter_bit
+    mask = 0
+    for c in rack:
+        mask |= lbit.get(c, 0)
+    return mask
 
 
 class Navigator(abc.ABC):
@@ -346,11 +1731,24 @@ class Navigator(abc.ABC):
         # An implementation is not mandatory
         return False
 
+    def edge_mask(self) -> int:
+        """Returns a bit mask of the letters that push_edge() might
+        accept as the first letter of an edge at the current point"""
+        # An implementation is not mandatory: by default, all bits are set
+        return -1
+
     def done(self) -> None:
         """ Called when the whole navigation is done """
         # An implementation is not mandatory
         pass
 
+    def describe(self) -> str:
+        """Returns the input of the navigation, such as a rack or a
+        pattern, for navigation metrics. This is called before the
+        navigation starts, so it should be cheap."""
+        # An implementation is not mandatory
+        return ""
+
 
 class FindNavigator(Navigator):
 
@@ -364,6 +1762,10 @@ class FindNavigator(Navigator):
         self._index = 0
         self._found = False
 
+    def describe(self) -> str:
+        """ Returns the word being looked for """
+        return self._word
+
     def push_edge(self, firstchar: str) -> bool:
         """ Returns True if the edge should be entered or False if not """
         # Enter the edge if it fits where we are in the word
@@ -407,6 +1809,11 @@ class PermutationNavigator(Navigator):
         self._stack: List[str] = []
         self._result: List[str] = []
         self._minlen = minlen
+        self._alphabet = current_alphabet()
+
+    def describe(self) -> str:
+        """ Returns the rack being permuted """
+        return self._rack
 
     def push_edge(self, firstchar: str) -> bool:
         """ Returns True if the edge should be entered or False if not """
@@ -449,6 +1856,10 @@ class PermutationNavigator(Navigator):
         # We need to visit all outgoing edges, so return True
         return True
 
+    def edge_mask(self) -> int:
+        """ Only edges starting with a letter in the rack can be entered """
+        return rack_mask(self._alphabet, self._rack)
+
     def done(self) -> None:
         """ Called when the whole navigation is done """
         sortkey = current_alphabet().sortkey
@@ -475,6 +1886,11 @@ class MatchNavigator(Navigator):
         self._stack: List[Tuple[int, str, bool]] = []
         self._result: List[str] = []
         self._sort = sort
+        self._letter_bit = current_alphabet().letter_bit
+
+    def describe(self) -> str:
+        """ Returns the pattern being matched """
+        return self._pattern
 
     def push_edge(self, firstchar: str) -> bool:
         """ Returns True if the edge should be entered or False if not """
@@ -514,6 +1930,226 @@ class MatchNavigator(Navigator):
         # We need to continue visiting edges only if this is a wildcard position
         return self._wildcard
 
+    def edge_mask(self) -> int:
+        """ Only edges starting with the pattern character can be entered """
+        return -1 if self._wildcard else self._letter_bit.get(self._chmatch, 0)
+
+    def done(self) -> None:
+        """ Called when the whole navigation is done """
+        if self._sort:
+            sortkey = current_alphabet().sortkey
+            self._result.sort(key=sortkey)
+
+    def result(self) -> List[str]:
+        """ Return the list of results accumulated during the navigation """
+        return self._result
+
+
+class CompiledPattern:
+
+    """A word pattern, compiled into a nondeterministic automaton
+    over letters. The pattern syntax is as follows:
+
+        a       the letter a
+        ?       any letter
+        [abc]   one of the letters a, b or c
+        [^abc]  any letter except a, b and c
+        x*      zero or more repetitions of the preceding element x
+
+    For example, "st?*" matches all words that start with "st", and
+    "??[aeiou]*r" matches words whose letters from the third one onwards
+    are vowels, except for a final "r".
+
+    The states of the automaton are the positions between pattern
+    elements, and a set of states is represented as an integer with one
+    bit per state. The sets of states that are reachable from the start
+    are constructed up front as PatternStates, linked by letter, so that
+    a navigation only needs dict lookups to follow the pattern."""
+
+    def __init__(self, alphabet: Alphabet, pattern: str) -> None:
+        self.pattern = pattern
+        lbit = alphabet.letter_bit
+        all_bits = alphabet.all_bits_set()
+        masks: List[int] = []
+        stars: List[bool] = []
+        i = 0
+        lenp = len(pattern)
+        while i < lenp:
+            c = pattern[i]
+            i += 1
+            if c == "?":
+                mask = all_bits
+            elif c == "[":
+                end = pattern.find("]", i)
+                if end < 0:
+                    raise ValueError("Unterminated letter class in pattern")
+                letters = pattern[i:end]
+                negate = letters.startswith("^")
+                if negate:
+                    letters = letters[1:]
+                mask = 0
+                for letter in letters:
+                    if letter not in lbit:
+                        raise ValueError(
+                            "Unknown letter '{0}' in pattern".format(letter)
+                        )
+                    mask |= lbit[letter]
+                if negate:
+                    mask ^= all_bits
+                if not mask:
+                    raise ValueError("Empty letter class in pattern")
+                i = end + 1
+            elif c in lbit:
+                mask = lbit[c]
+            else:
+                raise ValueError("Unexpected character '{0}' in pattern".format(c))
+            star = i < lenp and pattern[i] == "*"
+            if star:
+                i += 1
+            masks.append(mask)
+            stars.append(star)
+        self._masks = masks
+        self._stars = stars
+        self._letter_bit = lbit
+        # The minimum number of letters needed to get from each state
+        # to the accepting state, which follows the last element
+        self._rest = [
+            sum(1 for star in stars[ix:] if not star) for ix in range(len(masks) + 1)
+        ]
+        # Construct the sets of states that are reachable from the start
+        self._states: Dict[int, PatternState] = dict()
+        self.start = self._state(self._closure(1))
+        pending = [self.start]
+        while pending:
+            ps = pending.pop()
+            for letter, states in self._following(ps.states).items():
+                nps = self._states.get(states)
+                if nps is None:
+                    if len(self._states) >= MAX_PATTERN_STATES:
+                        raise ValueError("Pattern is too complex")
+                    nps = self._state(states)
+                    pending.append(nps)
+                ps.following[letter] = nps
+
+    def _closure(self, states: int) -> int:
+        """ Add the states that can be reached by skipping repeated elements """
+        for ix, star in enumerate(self._stars):
+            if star and states & (1 << ix):
+                states |= 1 << (ix + 1)
+        return states
+
+    def _following(self, states: int) -> Dict[str, int]:
+        """ Return the sets of states that follow each letter
+            that can be matched from a set of states """
+        following: Dict[str, int] = dict()
+        for letter, bit in self._letter_bit.items():
+            result = 0
+            for ix, mask in enumerate(self._masks):
+                if states & (1 << ix) and mask & bit:
+                    result |= 1 << (ix if self._stars[ix] else ix + 1)
+            if result:
+                following[letter] = self._closure(result)
+        return following
+
+    def _state(self, states: int) -> PatternState:
+        """ Create a PatternState for a set of states, with its
+            transitions to be filled in by the caller """
+        mask = 0
+        for ix, m in enumerate(self._masks):
+            if states & (1 << ix):
+                mask |= m
+        accept = bool(states & (1 << len(self._masks)))
+        rest = min(rest for ix, rest in enumerate(self._rest) if states & (1 << ix))
+        ps = PatternState(states, dict(), mask, max(1, rest), accept)
+        self._states[states] = ps
+        return ps
+
+
+class PatternState(NamedTuple):
+
+    """A set of states of a CompiledPattern"""
+
+    # The set of states, as a bit mask
+    states: int
+    # The sets of states that follow each letter that can be matched
+    following: Dict[str, PatternState]
+    # A bit mask of the letters that can be matched
+    mask: int
+    # The minimum number of letters needed to reach the accepting state,
+    # from the next letter onwards, i.e. at least one
+    rest: int
+    # Is the accepting state in the set?
+    accept: bool
+
+
+@lru_cache(maxsize=256)
+def compile_pattern(alphabet: Alphabet, pattern: str) -> CompiledPattern:
+    """ Return a cached CompiledPattern for a pattern """
+    return CompiledPattern(alphabet, pattern)
+
+
+class PatternNavigator(Navigator):
+
+    """A navigation class to be used with DawgDictionary.navigate()
+    to find all words matching a CompiledPattern, within length bounds.
+    Edges are only entered if their first letter can be matched
+    from the current set of pattern states.
+    """
+
+    def __init__(
+        self, pattern: str, minlen: int = 0, maxlen: int = 0, sort: bool = True
+    ) -> None:
+        super().__init__()
+        self._pattern = compile_pattern(current_alphabet(), pattern)
+        self._minlen = minlen
+        # Zero means no upper bound on the word length
+        self._maxlen = maxlen
+        self._state = self._pattern.start
+        self._len = 0
+        self._stack: List[Tuple[PatternState, int]] = []
+        self._result: List[str] = []
+        self._sort = sort
+
+    def describe(self) -> str:
+        """ Returns the pattern being matched """
+        return self._pattern.pattern
+
+    def push_edge(self, firstchar: str) -> bool:
+        """ Returns True if the edge should be entered or False if not """
+        if firstchar not in self._state.following:
+            return False
+        self._stack.append((self._state, self._len))
+        return True
+
+    def accepting(self) -> bool:
+        """ Returns False if the navigator does not want more characters """
+        maxlen = self._maxlen
+        return not maxlen or self._len + self._state.rest <= maxlen
+
+    def accepts(self, newchar: str) -> bool:
+        """ Returns True if the navigator will accept the new character """
+        state = self._state.following.get(newchar)
+        if state is None:
+            return False
+        self._state = state
+        self._len += 1
+        return True
+
+    def accept(self, matched: str, final: bool) -> None:
+        """ Called to inform the navigator of a match and whether it is a final word """
+        if final and self._state.accept and self._len >= self._minlen:
+            self._result.append(matched)
+
+    def pop_edge(self) -> bool:
+        """ Called when leaving an edge that has been navigated """
+        self._state, self._len = self._stack.pop()
+        # If only one letter can be matched here, no other edge can match it
+        return len(self._state.following) > 1
+
+    def edge_mask(self) -> int:
+        """ Only edges starting with a letter that can be matched can be entered """
+        return self._state.mask
+
     def done(self) -> None:
         """ Called when the whole navigation is done """
         if self._sort:
@@ -528,6 +2164,9 @@ class MatchNavigator(Navigator):
 # The structure used to decode an edge offset from bytes
 _UINT32 = struct.Struct("<L")
 
+# The header of a vocabulary subset file: (words in main vocabulary, words in subset)
+_SUBSET_HEADER = struct.Struct("<LL")
+
 
 class Navigation:
 
@@ -544,6 +2183,8 @@ class Navigation:
         # note it and call it with additional state information instead of
         # plain accept()
         self._resumable = nav.is_resumable
+        # Number of nodes visited, for metrics
+        self.nodes = 0
 
     @staticmethod
     def _iter_from_node(pd: PackedDawgDictionary, offset: int) -> Iterator[IterTuple]:
@@ -574,17 +2215,21 @@ class Navigation:
             yield prefix, nextnode
 
     @staticmethod
-    @lru_cache(maxsize=8 * 1024)  # 8K entries seems to be plenty
     def _tuple_from_node(pd: PackedDawgDictionary, offset: int) -> PrefixNodes:
-        """Return a cached tuple of prefixes and next node offsets along an edge"""
-        return tuple(Navigation._iter_from_node(pd, offset))
+        """Return a tuple of prefixes and next node offsets along an edge,
+        either a pinned one or one from the dictionary's node cache"""
+        return pd.pinned.get(offset) or pd.node_cache.get(offset)
 
     def _navigate_from_node(self, offset: int, matched: str) -> None:
         """ Starting from a given node, navigate outgoing edges """
         # Go through the edges of this node and follow the ones
         # okayed by the navigator
         nav = self._nav
-        for prefix, nextnode in Navigation._tuple_from_node(self._pd, offset):
+        pd = self._pd
+        self.nodes += 1
+        # This is an inlined Navigation._tuple_from_node()
+        edges = pd.pinned.get(offset) or pd.node_cache.get(offset)
+        for prefix, nextnode in edges:
             if nav.push_edge(prefix[0]):
                 # This edge is a candidate: navigate through it
                 self._navigate_from_edge(prefix, nextnode, matched)
@@ -648,14 +2293,188 @@ class Navigation:
         """ Resume navigation from a previously saved state """
         self._navigate_from_edge(prefix, nextnode, matched)
 
-"""
-# Debug instrumentation:
-# Create a thread that runs every 30 seconds and logs the
-# cache statistics for the Navigation._tuple_from_node() method
-def _log_cache_stats() -> None:
-    while True:
-        time.sleep(30)
-        logging.info(Navigation._tuple_from_node.cache_info())
-
-threading.Thread(target=_log_cache_stats, daemon=True).start()
-"""
+
+class CompiledGraph:
+
+    """A packed DAWG decoded into flat tables indexed by node number.
+    The root node is number 0, which also serves as the 'no next node'
+    marker since no edge leads back to the root. For each node, the
+    tables contain its outgoing edges, a bit mask of the first letters
+    of those edges, and a flag byte whose 0x80 bit denotes finality."""
+
+    def __init__(self, pd: PackedDawgDictionary) -> None:
+        b = pd.b
+        assert b is not None
+        enc = pd.encoding
+        # Map node offsets in the packed buffer to node numbers
+        index: Dict[int, int] = {0: 0}
+        offsets = [0]
+        self.edges: List[CompiledEdges] = []
+        self.masks: List[int] = []
+        self.flags = bytearray()
+        # Visit the nodes in breadth-first order, numbering
+        # them as they are first encountered
+        i = 0
+        while i < len(offsets):
+            offset = offsets[i]
+            i += 1
+            mask = 0
+            edges: List[CompiledEdge] = []
+            for prefix, nextnode in Navigation._iter_from_node(pd, offset):
+                bit = 1 << enc[prefix[0]]
+                mask |= bit
+                if nextnode:
+                    ix = index.get(nextnode)
+                    if ix is None:
+                        ix = index[nextnode] = len(offsets)
+                        offsets.append(nextnode)
+                    nextnode = ix
+                edges.append((prefix, nextnode, bit))
+            self.edges.append(tuple(edges))
+            self.masks.append(mask)
+            self.flags.append(b[offset] & 0x80)
+
+
+class CompiledNavigation(Navigation):
+
+    """A navigation through a compiled graph, where node references
+    are node numbers instead of offsets into the packed buffer"""
+
+    def __init__(self, nav: Navigator, pd: PackedDawgDictionary) -> None:
+        super().__init__(nav, pd)
+        graph = pd.graph
+        assert graph is not None
+        self._edges = graph.edges
+        self._masks = graph.masks
+        # The node flags take the place of the packed buffer
+        # when checking whether a node is final
+        self._b = graph.flags
+
+    def _navigate_from_node(self, offset: int, matched: str) -> None:
+        """ Starting from a given node, navigate outgoing edges """
+        nav = self._nav
+        self.nodes += 1
+        # Ask the navigator which first letters it might accept here;
+        # this does not change while we iterate over the edges, since
+        # pop_edge() restores the navigator's state after each edge
+        mask = nav.edge_mask()
+        if not (self._masks[offset] & mask):
+            # None of the outgoing edges can be entered
+            return
+        for prefix, nextnode, bit in self._edges[offset]:
+            if bit & mask and nav.push_edge(prefix[0]):
+                # This edge is a candidate: navigate through it
+                self._navigate_from_edge(prefix, nextnode, matched)
+                if not nav.pop_edge():
+                    # Short-circuit and finish the loop if pop_edge() returns False
+                    break
+
+
+class IterativeNavigation(Navigation):
+
+    """A navigation that keeps an explicit stack of frames instead of
+    recursing from node to edge to node, thereby avoiding the overhead
+    of Python calls at every level of the graph. Each frame holds the
+    remaining edges of a node (as an iterator), the string matched
+    so far, and the navigator's edge mask at the node.
+    Both packed and compiled graphs are supported. Resuming a navigation
+    follows the saved edge as usual and then continues iteratively."""
+
+    def __init__(self, nav: Navigator, pd: PackedDawgDictionary) -> None:
+        super().__init__(nav, pd)
+        self._graph = pd.graph
+        if self._graph is not None:
+            # Node references are node numbers: check finality in the node flags
+            self._b = self._graph.flags
+
+    def _navigate_from_node(self, offset: int, matched: str) -> None:
+        """Starting from a given node, navigate outgoing edges and
+        the nodes below them, until the stack is exhausted"""
+        nav = self._nav
+        # Bind the navigator's methods once, since they are
+        # called many times within this single function call
+        push_edge = nav.push_edge
+        pop_edge = nav.pop_edge
+        accepting = nav.accepting
+        accepts = nav.accepts
+        accept = nav.accept
+        accept_resumable = nav.accept_resumable
+        edge_mask = nav.edge_mask
+        resumable = self._resumable
+        b = self._b
+        graph = self._graph
+        pd = self._pd
+        pinned = pd.pinned
+        node_cache = pd.node_cache
+        stack: List[NavigationFrame] = []
+        node = offset
+        enter = True
+        nodes = 0
+        while True:
+            if enter:
+                # Entering a node: set up an iterator over its edges
+                nodes += 1
+                if graph is None:
+                    # Edges of a packed graph have no letter bits: visit all of them
+                    mask = -1
+                    edges = iter(pinned.get(node) or node_cache.get(node))
+                else:
+                    mask = edge_mask()
+                    # If no outgoing edge can be entered, the node is skipped
+                    edges = iter(graph.edges[node] if graph.masks[node] & mask else ())
+                enter = False
+            for edge in edges:
+                if mask != -1 and not (edge[2] & mask):
+                    continue
+                prefix = edge[0]
+                if not push_edge(prefix[0]):
+                    continue
+                # Go along the edge as long as the navigator is accepting
+                # (this is the same logic as in Navigation._navigate_from_edge())
+                nextnode = edge[1]
+                lenp = len(prefix)
+                m = matched
+                j = 0
+                while j < lenp and accepting():
+                    if not accepts(prefix[j]):
+                        break
+                    m += prefix[j]
+                    j += 1
+                    final = False
+                    if j < lenp:
+                        if prefix[j] == "|":
+                            final = True
+                            j += 1
+                    elif nextnode == 0 or b[nextnode] & 0x80:
+                        final = True
+                    if resumable:
+                        accept_resumable(prefix[j:], nextnode, m)
+                    else:
+                        accept(m, final)
+                else:
+                    if j == lenp and nextnode != 0 and accepting():
+                        # Descend into the next node, saving our place in this one;
+                        # the edge is popped when the next node is done
+                        stack.append((edges, matched, mask))
+                        node = nextnode
+                        matched = m
+                        enter = True
+                        break
+                if not pop_edge():
+                    # Short-circuit and finish the loop if pop_edge() returns False
+                    break
+            if enter:
+                continue
+            # This node is done: return to its parent, if any
+            if not stack:
+                self.nodes += nodes
+                return
+            edges, matched, mask = stack.pop()
+            if not pop_edge():
+                # No need to visit further edges of the parent node
+                edges = iter(())
+
+
+# Load the dictionaries (this must follow the definitions of the
+# classes used while loading, such as CompiledGraph)
+Wordbase.initialize()
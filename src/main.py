@@ -43,7 +43,7 @@ import logging
 from datetime import timedelta
 from logging.config import dictConfig
 
-from flask import Flask
+from flask import Flask, jsonify
 from flask.wrappers import Response
 from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
@@ -72,6 +72,7 @@ from basics import (
 )
 from firebase import init_firebase_app, connect_blueprint
 from dawgdictionary import Wordbase
+import robotpool
 from api import api_blueprint
 from web import STATIC_FOLDER, web_blueprint
 from skraflstats import stats_blueprint
@@ -250,11 +251,17 @@ def start() -> ResponseType:
 @app.route("/_ah/warmup")
 def warmup() -> ResponseType:
     """App Engine is starting a fresh instance - warm it up
-    by loading all vocabularies"""
-    ok = Wordbase.warmup()
+    by loading the vocabularies (unless DAWG_LAZY is set), pinning their
+    most used graph nodes and starting the robot worker processes, if any"""
+    report = Wordbase.warmup()
+    robotpool.start()
     instance = os.environ.get("GAE_INSTANCE", "N/A")
-    logging.info(f"Warmup, instance {instance}, ok is {ok}")
-    return "", 200
+    logging.info(
+        f"Warmup, instance {instance}, ok is {report['ok']}, "
+        f"took {report['seconds']:.3f} seconds, "
+        f"{report['nodes']} DAWG nodes pinned using {report['bytes'] // 1024} KB"
+    )
+    return jsonify(report), 200
 
 
 @app.route("/_ah/stop")
@@ -0,0 +1,656 @@
+"""
+
+    Robot move service
+
+    Copyright (C) 2024 Miðeind ehf.
+    Original author: Vilhjálmur Þorsteinsson
+
+    The Creative Commons Attribution-NonCommercial 4.0
+    International Public License (CC-BY-NC 4.0) applies to this software.
+    For further information, see https://github.com/mideind/Netskrafl
+
+
+    This module generates robot (AutoPlayer) moves, as well as lists
+    of best moves for game review, in a bounded pool of worker processes.
+    A slow move generation, such as for a rack with two blank tiles,
+    thus does not hold up robot moves in other games, and move generation
+    can use all processor cores of the instance.
+
+    Requests that modify a game are serialized per game by game_lock(),
+    instead of across the whole process.
+
+    The game state is pickled and sent to a worker, which returns the
+    generated move in a plain encoded form (see _encode_move()). The move
+    is decoded in the calling thread, where the game's locale is set.
+
+    If ROBOT_WORKERS is 0, which is the default, moves are generated in
+    the calling thread, one at a time within the process. Every server
+    process has its own pool, so see config.py for the memory that the
+    worker processes take before enabling it.
+
+    If a worker process dies, e.g. from running out of memory, the move
+    generations that were running in its pool are retried once on a fresh
+    pool, within the original time limit, and RobotError is raised if that
+    fails too. They are never rerun in the calling thread, as the input
+    that killed a worker would then take down the server process.
+
+    The workers are forked from a server process that has imported
+    robotwarmup.py, and thereby loaded and warmed up the vocabularies,
+    so that each worker inherits the pinned graph nodes. With each result,
+    a worker returns the changes in its DAWG navigation counters and left
+    part cache statistics (see _in_worker()), which are added to those of
+    the server process in metrics().
+
+    If ROBOT_SPLIT_AXES is set, a best move list is generated by all the
+    workers in parallel, each taking an interleaved share of the rows and
+    columns of the board (see _generate_best_moves_on_axes()). The lists
+    are then merged in the same order as if they had been generated
+    by a single worker.
+
+    Best move lists are cached by position (see _position_key()), since
+    players stepping back and forth through a finished game revisit the
+    same positions. The cache is kept in the process, with up to
+    BEST_MOVES_CACHE_SIZE entries, and optionally in Redis, for
+    BEST_MOVES_REDIS_SECONDS, where it is shared by all server instances.
+
+"""
+
+from __future__ import annotations
+
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+    TypedDict,
+    TypeVar,
+)
+
+import atexit
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from config import (
+    ROBOT_WORKERS,
+    ROBOT_MOVE_TIMEOUT,
+    ROBOT_SPLIT_AXES,
+    BEST_MOVES_CACHE_SIZE,
+    BEST_MOVES_REDIS_SECONDS,
+)
+from cache import memcache
+from dawgdictionary import DictionaryMetrics, Wordbase, merge_metrics
+from languages import set_locale, vocabulary_for_locale
+from skraflmechanics import (
+    State,
+    Board,
+    MoveBase,
+    Move,
+    Cover,
+    ExchangeMove,
+    PassMove,
+    SummaryTuple,
+    MoveSummaryTuple,
+)
+from skraflplayer import AutoPlayer, left_part_stats
+
+
+# Type definitions
+EncodedMove = Tuple[Any, ...]
+BestMoveList = List[MoveSummaryTuple]
+# A cached best move list: (number of moves requested, move summaries)
+CachedBestMoves = Tuple[int, List[SummaryTuple]]
+# A move found along a subset of the axes of the board, with the keys
+# needed to merge it with moves along other axes:
+# (score, number of tiles covered, row, column, horizontal, move summary)
+AxisMoveSummary = Tuple[int, int, int, int, bool, SummaryTuple]
+# Navigation metrics by vocabulary, as returned by Wordbase.metrics()
+VocabularyMetrics = Dict[str, DictionaryMetrics]
+# Left part table cache statistics, as returned by left_part_stats()
+LeftPartStats = Dict[str, float]
+# The result of a function run by _in_worker(), along with the changes
+# in the worker's navigation metrics and left part cache statistics
+WorkerResult = Tuple[Any, VocabularyMetrics, LeftPartStats]
+
+_T = TypeVar("_T")
+
+# Number of locks used to serialize requests per game
+_NUM_GAME_LOCKS = 64
+
+# Left part cache statistics that are counters, as opposed to the
+# current state of the cache
+_LEFT_PART_COUNTERS = ("hits", "misses")
+
+
+class RobotMetrics(TypedDict):
+
+    """ Counters for the robot move service of a server process """
+
+    workers: int
+    # Number of move generations submitted but not yet finished
+    queued: int
+    max_queued: int
+    # Finished move generations, including ones whose callers timed out
+    completed: int
+    timeouts: int
+    failures: int
+    # Time from submission to result, for completed move generations
+    seconds: float
+    max_seconds: float
+    # Best move lists served from the cache, and ones that were generated
+    cache_hits: int
+    cache_misses: int
+    # DAWG navigation metrics and left part cache statistics of the server
+    # process and its worker processes combined
+    vocabularies: VocabularyMetrics
+    left_parts: LeftPartStats
+
+
+class RobotError(Exception):
+
+    """ A move could not be generated """
+
+
+class RobotTimeout(RobotError):
+
+    """ A move could not be generated within ROBOT_MOVE_TIMEOUT seconds """
+
+
+# Requests that modify a game are serialized by one of a fixed set
+# of locks, selected by the game id
+_game_locks = [threading.Lock() for _ in range(_NUM_GAME_LOCKS)]
+
+# Lock for generating moves in the calling thread, if ROBOT_WORKERS is 0
+_inline_lock = threading.Lock()
+
+# Lock protecting the executor, the metrics and the best move cache
+_lock = threading.Lock()
+_executor: Optional[ProcessPoolExecutor] = None
+# Submitted move generations that have not finished, with their pools
+_pending: Dict[Future[Any], ProcessPoolExecutor] = dict()
+# Best move lists by position, the most recently used last
+_best_moves_cache: OrderedDict[str, CachedBestMoves] = OrderedDict()
+_metrics = RobotMetrics(
+    workers=ROBOT_WORKERS,
+    queued=0,
+    max_queued=0,
+    completed=0,
+    timeouts=0,
+    failures=0,
+    seconds=0.0,
+    max_seconds=0.0,
+    cache_hits=0,
+    cache_misses=0,
+    vocabularies=dict(),
+    left_parts=dict(),
+)
+# Navigation metrics and left part cache statistics reported by the
+# worker processes since the counters were last reset
+_worker_vocabularies: VocabularyMetrics = dict()
+_worker_left_parts: LeftPartStats = dict()
+
+
+def game_lock(game_id: str) -> threading.Lock:
+    """Return the lock that serializes requests that modify the given game"""
+    return _game_locks[hash(game_id) % _NUM_GAME_LOCKS]
+
+
+def _encode_move(move: MoveBase) -> EncodedMove:
+    """Encode a move generated by an AutoPlayer as a tuple of plain values,
+    which can be passed between processes"""
+    if isinstance(move, Move):
+        return (
+            "move",
+            move.word(),
+            move.row,
+            move.col,
+            move.horizontal,
+            [tuple(c) for c in move.covers()],
+            move.tiles(),
+        )
+    if isinstance(move, ExchangeMove):
+        return ("exch", move.tiles())
+    assert isinstance(move, PassMove)
+    return ("pass",)
+
+
+def _decode_move(encoded: EncodedMove) -> MoveBase:
+    """Decode a move from the form returned by _encode_move()"""
+    if encoded[0] == "exch":
+        return ExchangeMove(encoded[1])
+    if encoded[0] == "pass":
+        return PassMove()
+    _, word, row, col, horizontal, covers, tiles = encoded
+    move = Move(word, row, col, horizontal)
+    for c in covers:
+        move.add_validated_cover(Cover(*c))
+    move.set_tiles(tiles)
+    return move
+
+
+def _generate_move(state: State, robot_level: int) -> EncodedMove:
+    """Generate a robot move in the given state. Runs in a worker process."""
+    set_locale(state.locale)
+    apl = AutoPlayer.create(state, robot_level)
+    return _encode_move(apl.generate_move())
+
+
+def _generate_best_moves(state: State, n: int) -> List[SummaryTuple]:
+    """Generate summaries of the n best moves in the given state.
+    Runs in a worker process."""
+    set_locale(state.locale)
+    # Create an AutoPlayer instance that always finds the top-scoring moves
+    apl = AutoPlayer(0, state)
+    return [m.summary(state) for m, _ in apl.generate_best_moves(n)]
+
+
+def _generate_best_moves_on_axes(
+    state: State, n: int, axes: Tuple[int, ...]
+) -> List[AxisMoveSummary]:
+    """Generate the n best moves along the given axes of the board
+    (see AutoPlayer._axes()), in descending order, with their merge
+    keys. Runs in a worker process."""
+    set_locale(state.locale)
+    apl = AutoPlayer(0, state)
+    result: List[AxisMoveSummary] = []
+    for m, score in apl.generate_best_moves(n, axes):
+        assert isinstance(m, Move)
+        result.append(
+            (score, m.num_covers(), m.row, m.col, m.horizontal, m.summary(state))
+        )
+    return result
+
+
+def _in_worker(func: Callable[..., Any], *args: Any) -> WorkerResult:
+    """Run a move generation function in a worker process, returning its
+    result along with the changes in the navigation counters of the worker
+    since its previous result. Counters from a generation that raised an
+    exception are thus returned with the next result instead."""
+    result = func(*args)
+    return result, Wordbase.metrics(reset=True), left_part_stats(reset=True)
+
+
+def _merge_left_parts(a: LeftPartStats, b: LeftPartStats) -> LeftPartStats:
+    """Combine left part cache statistics from two processes. The counters
+    are added up, while the state of the cache is that of the process where
+    it is the largest."""
+    if not a or not b:
+        return dict(a or b)
+    result = {key: max(a[key], b[key]) for key in a}
+    for key in _LEFT_PART_COUNTERS:
+        result[key] = a[key] + b[key]
+    lookups = result["hits"] + result["misses"]
+    result["hit_rate"] = result["hits"] / lookups if lookups else 0.0
+    return result
+
+
+def _merge_vocabularies(
+    a: VocabularyMetrics, b: VocabularyMetrics
+) -> VocabularyMetrics:
+    """Combine navigation metrics by vocabulary from two processes"""
+    result = dict(a)
+    for vocab, m in b.items():
+        result[vocab] = m if vocab not in result else merge_metrics(result[vocab], m)
+    return result
+
+
+def _worker_reported(
+    vocabularies: VocabularyMetrics, left_parts: LeftPartStats
+) -> None:
+    """Add the navigation metrics returned with a result from a worker
+    process to those reported by the workers before"""
+    global _worker_vocabularies, _worker_left_parts
+    with _lock:
+        _worker_vocabularies = _merge_vocabularies(_worker_vocabularies, vocabularies)
+        _worker_left_parts = _merge_left_parts(_worker_left_parts, left_parts)
+
+
+def _split_best_moves(state: State, n: int) -> List[SummaryTuple]:
+    """Generate summaries of the n best moves in the given state,
+    with each worker process taking a share of the axes of the board"""
+    num_axes = 2 * Board.SIZE
+    # Deal the axes out in turn, to spread the busy ones
+    # in the middle of the board between the workers
+    calls = [
+        (state, n, tuple(range(i, num_axes, ROBOT_WORKERS)))
+        for i in range(ROBOT_WORKERS)
+    ]
+    parts = _run_all(_generate_best_moves_on_axes, calls)
+    # AutoPlayer sorts moves by descending score, then by ascending number
+    # of tiles covered, row and column, horizontal moves first, and then by
+    # descending word. Moves that tie up to the word are on the same axis,
+    # and thus in the same part, which is already in the right order.
+    merged = sorted(
+        (
+            (-score, covers, row, col, not horizontal, ix, summary)
+            for part in parts
+            for ix, (score, covers, row, col, horizontal, summary) in enumerate(part)
+        ),
+        key=lambda m: m[0:6],
+    )
+    return [m[6] for m in (merged if n <= 0 else merged[0:n])]
+
+
+def _position_key(state: State) -> str:
+    """Return a key identifying the position of the player to move in
+    the given state, for the best move cache. The best moves depend
+    only on the board, the rack, the vocabulary and the tile scores."""
+    board = state.board()
+    assert state.tileset is not None
+    return "{0:016x}:{1}:{2}:{3}:{4}".format(
+        board.contents_hash(),
+        "".join(sorted(state.player_rack().contents())),
+        vocabulary_for_locale(state.locale),
+        state.tileset.__name__,
+        board.board_type,
+    )
+
+
+def _cache_best_moves(key: str, entry: CachedBestMoves) -> None:
+    """Store a best move list in the process cache"""
+    if BEST_MOVES_CACHE_SIZE <= 0:
+        return
+    with _lock:
+        _best_moves_cache[key] = entry
+        _best_moves_cache.move_to_end(key)
+        if len(_best_moves_cache) > BEST_MOVES_CACHE_SIZE:
+            _best_moves_cache.popitem(last=False)
+
+
+def _cached_best_moves(key: str, n: int) -> Optional[List[SummaryTuple]]:
+    """Return the n best moves for a position from the cache,
+    or None if they are not there"""
+    entry: Optional[CachedBestMoves] = None
+    if BEST_MOVES_CACHE_SIZE > 0:
+        with _lock:
+            entry = _best_moves_cache.get(key)
+            if entry is not None:
+                _best_moves_cache.move_to_end(key)
+    if entry is None and BEST_MOVES_REDIS_SECONDS > 0:
+        shared = memcache.get(key, namespace="bestmoves")
+        if shared is not None:
+            # Lists come back from JSON instead of tuples
+            num, summaries = shared
+            entry = (num, [tuple(s) for s in summaries])
+            _cache_best_moves(key, entry)
+    if entry is None:
+        return None
+    num, summaries = entry
+    # A list is complete if all moves were requested (num <= 0),
+    # or if there were fewer moves than requested
+    complete = num <= 0 or len(summaries) < num
+    if n <= 0:
+        # All moves are requested now
+        return summaries if complete else None
+    if num < n and not complete:
+        # Fewer moves were requested than now, and there may be more
+        return None
+    return summaries[:n]
+
+
+def _add_python_path(path: str) -> None:
+    """Add a directory to the PYTHONPATH of processes started from now on"""
+    paths = [p for p in os.environ.get("PYTHONPATH", "").split(os.pathsep) if p]
+    if path not in paths:
+        os.environ["PYTHONPATH"] = os.pathsep.join([path] + paths)
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    """Return the process pool, creating it if necessary"""
+    global _executor
+    with _lock:
+        if _executor is None:
+            # Fork the workers from a server process that has already
+            # imported this module, loaded the vocabularies and pinned
+            # their top nodes (see robotwarmup.py), instead of starting
+            # each one from scratch
+            if "forkserver" in multiprocessing.get_all_start_methods():
+                context = multiprocessing.get_context("forkserver")
+                context.set_forkserver_preload(["robotwarmup"])
+                # The forkserver does not get the sys.path of this process,
+                # such as from gunicorn --pythonpath, and silently skips
+                # preloading modules that it cannot import
+                _add_python_path(os.path.dirname(os.path.abspath(__file__)))
+            else:
+                context = multiprocessing.get_context("spawn")
+            _executor = ProcessPoolExecutor(
+                max_workers=ROBOT_WORKERS, mp_context=context
+            )
+        return _executor
+
+
+def _shutdown_executor(executor: ProcessPoolExecutor) -> None:
+    """Shut down a process pool without waiting, cancelling the move
+    generations that have not started. (The cancel_futures parameter
+    of shutdown() does this, but it requires Python 3.9.)"""
+    with _lock:
+        futures = [f for f, e in _pending.items() if e is executor]
+    for future in futures:
+        future.cancel()
+    executor.shutdown(wait=False)
+
+
+def _discard_executor(executor: ProcessPoolExecutor, kill: bool = False) -> None:
+    """Discard a process pool, so that a fresh one is created.
+    If kill is True, the worker processes of the pool are terminated,
+    abandoning any move generations that are running in them."""
+    global _executor
+    with _lock:
+        if _executor is executor:
+            _executor = None
+    # The pool has no public interface to its processes
+    processes = list((getattr(executor, "_processes", None) or {}).values())
+    _shutdown_executor(executor)
+    if kill:
+        for process in processes:
+            process.terminate()
+
+
+@atexit.register
+def _shutdown() -> None:
+    """Shut down the process pool when the server process exits"""
+    if _executor is not None:
+        _shutdown_executor(_executor)
+
+
+def _finished(
+    t0: float, future: Optional[Future[Any]] = None, failed: bool = False
+) -> None:
+    """Update the metrics when a move generation has finished, or if
+    failed is True, when it has failed without a future to tell so"""
+    with _lock:
+        _metrics["queued"] -= 1
+        if failed:
+            _metrics["failures"] += 1
+            return
+        if future is not None:
+            _pending.pop(future, None)
+            if future.cancelled():
+                return
+            if future.exception() is not None:
+                _metrics["failures"] += 1
+                return
+        elapsed = time.monotonic() - t0
+        _metrics["completed"] += 1
+        _metrics["seconds"] += elapsed
+        _metrics["max_seconds"] = max(_metrics["max_seconds"], elapsed)
+
+
+def _started() -> float:
+    """Update the metrics when a move generation is submitted,
+    returning the time of submission"""
+    with _lock:
+        _metrics["queued"] += 1
+        _metrics["max_queued"] = max(_metrics["max_queued"], _metrics["queued"])
+    return time.monotonic()
+
+
+def _submit(
+    func: Callable[..., _T], *args: Any
+) -> Tuple[ProcessPoolExecutor, Future[_T]]:
+    """Submit a move generation function to the process pool,
+    returning the pool and the future of the result"""
+    t0 = _started()
+    try:
+        executor = _get_executor()
+        try:
+            future = executor.submit(func, *args)
+        except RuntimeError:
+            # A worker process died (BrokenProcessPool), or another thread
+            # shut the pool down: start over with a fresh pool
+            _discard_executor(executor)
+            executor = _get_executor()
+            future = executor.submit(func, *args)
+    except BaseException:
+        # The generation was not submitted, so there is no future
+        # whose callback would update the metrics
+        _finished(t0, failed=True)
+        raise
+    with _lock:
+        _pending[future] = executor
+    future.add_done_callback(lambda f: _finished(t0, f))
+    return executor, future
+
+
+def _timed_out(
+    submitted: List[Tuple[ProcessPoolExecutor, Future[Any]]]
+) -> RobotTimeout:
+    """Give up on move generations that did not finish in time"""
+    # If a generation has not started yet, there is no point in starting it
+    stuck = {e for e, f in submitted if not f.cancel() and not f.done()}
+    # A generation that is running would keep its worker busy until it
+    # finishes, and enough of those would hold up all later moves. Its
+    # pool is thus replaced and its processes terminated. Other generations
+    # running in that pool fail with BrokenProcessPool and are retried
+    # on a fresh pool (see _run_all()).
+    for executor in stuck:
+        _discard_executor(executor, kill=True)
+    with _lock:
+        _metrics["timeouts"] += 1
+    return RobotTimeout(
+        f"Move generation not finished in {ROBOT_MOVE_TIMEOUT} seconds"
+    )
+
+
+def _run(func: Callable[..., _T], *args: Any) -> _T:
+    """Run a move generation function, either in the process pool
+    or in the calling thread, and return its result"""
+    if ROBOT_WORKERS <= 0:
+        t0 = _started()
+        try:
+            with _inline_lock:
+                result = func(*args)
+        except BaseException:
+            _finished(t0, failed=True)
+            raise
+        _finished(t0)
+        return result
+    return _run_all(func, [args])[0]
+
+
+def _run_all(func: Callable[..., _T], calls: List[Tuple[Any, ...]]) -> List[_T]:
+    """Run a move generation function in the process pool once for each
+    tuple of arguments, in parallel, and return the results in order.
+    Calls whose worker process died are retried once on a fresh pool,
+    within the same time limit."""
+    deadline = time.monotonic() + ROBOT_MOVE_TIMEOUT
+    results: Dict[int, _T] = dict()
+    todo = list(range(len(calls)))
+    for attempt in range(2):
+        submitted = [(ix, _submit(_in_worker, func, *calls[ix])) for ix in todo]
+        todo = []
+        for ix, (executor, future) in submitted:
+            try:
+                results[ix], vocabularies, left_parts = future.result(
+                    timeout=max(deadline - time.monotonic(), 0.0)
+                )
+                _worker_reported(vocabularies, left_parts)
+            except FutureTimeoutError:
+                raise _timed_out([ef for _, ef in submitted])
+            except BrokenProcessPool:
+                # Discard the pool of this future, which is broken
+                _discard_executor(executor)
+                todo.append(ix)
+        if not todo:
+            return [results[ix] for ix in range(len(calls))]
+        logging.warning(
+            "Robot worker process died{0}".format(
+                "; retrying on a fresh pool" if attempt == 0 else " again"
+            )
+        )
+    raise RobotError("Robot worker process died while generating a move")
+
+
+def robot_move(state: State, robot_level: int) -> MoveBase:
+    """Generate a move for a robot of the given level in the given state.
+    Raises RobotTimeout if the move is not ready in time, or RobotError
+    if it could not be generated for another reason."""
+    return _decode_move(_run(_generate_move, state, robot_level))
+
+
+def _best_move_summaries(state: State, n: int) -> List[SummaryTuple]:
+    """Generate summaries of the n best moves in the given state,
+    splitting the work between the worker processes if so configured"""
+    if ROBOT_SPLIT_AXES and ROBOT_WORKERS > 1 and not state.board().is_empty():
+        return _split_best_moves(state, n)
+    return _run(_generate_best_moves, state, n)
+
+
+def best_moves(state: State, n: int) -> BestMoveList:
+    """Return a list of the n best moves in the given state, as
+    (player index, move summary) tuples, from the cache if possible.
+    Raises RobotTimeout if the list is not ready in time, or RobotError
+    if it could not be generated for another reason."""
+    player_index = state.player_to_move()
+    if BEST_MOVES_CACHE_SIZE <= 0 and BEST_MOVES_REDIS_SECONDS <= 0:
+        summaries = _best_move_summaries(state, n)
+        return [(player_index, s) for s in summaries]
+    key = _position_key(state)
+    cached = _cached_best_moves(key, n)
+    with _lock:
+        _metrics["cache_misses" if cached is None else "cache_hits"] += 1
+    if cached is None:
+        cached = _best_move_summaries(state, n)
+        entry = (n, cached)
+        _cache_best_moves(key, entry)
+        if BEST_MOVES_REDIS_SECONDS > 0:
+            memcache.set(
+                key, entry, time=BEST_MOVES_REDIS_SECONDS, namespace="bestmoves"
+            )
+    return [(player_index, s) for s in cached]
+
+
+def start() -> None:
+    """Start the worker processes, if any, so that they have loaded and
+    warmed up the vocabularies before the first robot move. Called from
+    GAE instance initialization."""
+    if ROBOT_WORKERS <= 0:
+        return
+    executor = _get_executor()
+    for _ in range(ROBOT_WORKERS):
+        executor.submit(os.getpid)
+
+
+def metrics(reset: bool = False) -> RobotMetrics:
+    """Return a copy of the robot move service metrics, including the
+    navigation metrics of the worker processes as reported so far. If reset
+    is True, the navigation counters are zeroed afterwards."""
+    global _worker_vocabularies, _worker_left_parts
+    vocabularies = Wordbase.metrics(reset=reset)
+    left_parts = left_part_stats(reset)
+    with _lock:
+        result = RobotMetrics(**_metrics)
+        result["vocabularies"] = _merge_vocabularies(vocabularies, _worker_vocabularies)
+        result["left_parts"] = _merge_left_parts(left_parts, _worker_left_parts)
+        if reset:
+            _worker_vocabularies = dict()
+            _worker_left_parts = dict()
+    return result
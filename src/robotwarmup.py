@@ -0,0 +1,28 @@
+"""
+
+    Robot worker warm-up
+
+    Copyright (C) 2024 Miðeind ehf.
+    Original author: Vilhjálmur Þorsteinsson
+
+    The Creative Commons Attribution-NonCommercial 4.0
+    International Public License (CC-BY-NC 4.0) applies to this software.
+    For further information, see https://github.com/mideind/Netskrafl
+
+
+    This module is imported by the forkserver process from which the
+    robot worker processes are forked (see robotpool._get_executor()).
+    It imports the robot move service, which loads the vocabularies
+    unless DAWG_LAZY is set, and then decodes and pins the top levels
+    of their graphs, just as /_ah/warmup does in the server process.
+    The workers thus inherit the pinned nodes instead of each decoding
+    them while generating their first moves.
+
+"""
+
+# The functions that the workers run
+import robotpool  # noqa: F401
+from dawgdictionary import Wordbase
+
+
+Wordbase.warmup()
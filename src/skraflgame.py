@@ -77,6 +77,7 @@ from skraflmechanics import (
     SummaryTuple,
 )
 from skraflplayer import AutoPlayer
+from robotpool import robot_move, best_moves as robot_best_moves
 from skrafluser import User
 from skraflelo import compute_elo_for_game
 
@@ -919,11 +920,11 @@ class Game:
 
     def autoplayer_move(self) -> None:
         """Generate an AutoPlayer move and register it"""
-        # Create an appropriate AutoPlayer subclass instance
-        # depending on the robot level in question
+        # An appropriate AutoPlayer subclass instance, depending on the
+        # robot level in question, generates the move in a worker process
+        # (see robotpool.py)
         assert self.state is not None
-        apl = AutoPlayer.create(self.state, self.robot_level)
-        move = apl.generate_move()
+        move = robot_move(self.state, self.robot_level)
         self.register_move(move)
         self.last_move = move  # Store a response move
 
@@ -940,10 +941,8 @@ class Game:
             # The game is probably not finished:
             # querying for best moves is prohibited
             return []
-        player_index = state.player_to_move()
-        # Create an AutoPlayer instance that always finds the top-scoring moves
-        apl = AutoPlayer(0, state)
-        return [(player_index, m.summary(state)) for m, _ in apl.generate_best_moves(n)]
+        # The moves are generated in a worker process (see robotpool.py)
+        return robot_best_moves(state, n)
 
     def enum_tiles(
         self, state: Optional[State] = None
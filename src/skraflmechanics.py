@@ -22,13 +22,27 @@
 
 from __future__ import annotations
 
-from typing import Callable, List, NamedTuple, Tuple, Iterator, Union, Optional, Type
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    List,
+    NamedTuple,
+    Set,
+    Tuple,
+    Iterator,
+    Union,
+    Optional,
+    Type,
+)
 
 import abc
+import hashlib
+from functools import lru_cache
 from random import SystemRandom
 
 from config import DEFAULT_LOCALE
-from dawgdictionary import Wordbase
+from dawgdictionary import Wordbase, PackedDawgDictionary
 from languages import (
     TileSet,
     Alphabet,
@@ -143,6 +157,19 @@ _WORDSCORE = {key: _xlt(val) for key, val in _WSC.items()}
 _LETTERSCORE = {key: _xlt(val) for key, val in _LSC.items()}
 
 
+@lru_cache(maxsize=None)
+def _zobrist_key(index: int, ch: str) -> int:
+    """ Return the 64-bit Zobrist key of a letter or a tile on a square
+        (see Board.contents_hash()). The keys are derived from the square
+        and the character, instead of being drawn at random, so that they
+        are the same in all processes and on all server instances. """
+    if ch == " ":
+        # Empty squares do not contribute to the hash
+        return 0
+    digest = hashlib.blake2b(f"{index}:{ch}".encode("utf-8"), digest_size=8)
+    return int.from_bytes(digest.digest(), "little")
+
+
 class Board:
 
     """ Represents the characteristics and the contents
@@ -155,6 +182,21 @@ class Board:
     # The rows are identified by letter
     ROWIDS = "ABCDEFGHIJKLMNO"
 
+    # Bit pattern with one bit for each square in a row or column
+    FULL_LINE = (1 << SIZE) - 1
+
+    @staticmethod
+    def run_extent(bits: int, ix: int) -> Tuple[int, int]:
+        """Return the first and last index of the contiguous run of
+        set bits in a row or column bit pattern that includes the
+        given index, taking the square at the index to be covered"""
+        # The empty squares before the index: the run starts after the last one
+        first = (~bits & ((1 << ix) - 1)).bit_length()
+        # Count the covered squares after the index, i.e. the trailing ones
+        after = bits >> (ix + 1)
+        last = ix + (~after & (after + 1)).bit_length() - 1
+        return first, last
+
     @staticmethod
     def short_coordinate(horiz: bool, row: int, col: int) -> str:
         """RC if horizontal move, or CR if vertical.
@@ -173,11 +215,19 @@ class Board:
         # noinspection PyProtectedMember
         self._letters: List[str]
         self._tiles: List[str]
+        # Occupancy bit patterns of the rows and the columns: bit n is
+        # set if square n within the row (column) is covered
+        self._row_bits: List[int]
+        self._col_bits: List[int]
         if copy is None:
             # Store letters on the board in list of strings
             self._letters = [" " * Board.SIZE for _ in range(Board.SIZE)]
             # Store tiles on the board in list of strings
             self._tiles = [" " * Board.SIZE for _ in range(Board.SIZE)]
+            self._row_bits = [0] * Board.SIZE
+            self._col_bits = [0] * Board.SIZE
+            # Zobrist hash of the letters and tiles (see contents_hash())
+            self._hash = 0
             # The two counts below should always stay in sync
             self._numletters = 0
             self._numtiles = 0
@@ -186,12 +236,44 @@ class Board:
             # Copy constructor: initialize from another Board
             self._letters = copy._letters[:]
             self._tiles = copy._tiles[:]
+            self._row_bits = copy._row_bits[:]
+            self._col_bits = copy._col_bits[:]
+            self._hash = copy._hash
             self._numletters = copy._numletters
             self._numtiles = copy._numtiles
             self._board_type = copy._board_type or "standard"
         self._wordscore = _WORDSCORE[self._board_type]
         self._letterscore = _LETTERSCORE[self._board_type]
         self._start_square: Optional[Tuple[int, int]] = None
+        # Anchor squares by row, as bit patterns (see anchors())
+        self._anchors: Optional[List[int]] = None
+        # Rack-independent cross-check bit patterns for every square,
+        # indexed by row * SIZE + col, for horizontal and vertical moves
+        # respectively (see crosschecks()). They are calculated on first
+        # use and then kept up to date incrementally as letters are set.
+        # The value -1 means that any letter can be placed on the square.
+        self._cc_dawg: Optional[PackedDawgDictionary] = None
+        self._cc_horizontal: List[int] = []
+        self._cc_vertical: List[int] = []
+        # Squares whose cross-checks need to be recalculated
+        self._cc_dirty: Set[int] = set()
+        if copy is not None and copy._cc_dawg is not None:
+            self._cc_dawg = copy._cc_dawg
+            self._cc_horizontal = copy._cc_horizontal[:]
+            self._cc_vertical = copy._cc_vertical[:]
+            self._cc_dirty = set(copy._cc_dirty)
+
+    def __getstate__(self) -> Dict[str, Any]:
+        """ Return the state of the board for pickling, leaving out the
+            cross-checks, which refer to a dictionary and are recalculated
+            on demand """
+        state = self.__dict__.copy()
+        state["_anchors"] = None
+        state["_cc_dawg"] = None
+        state["_cc_horizontal"] = []
+        state["_cc_vertical"] = []
+        state["_cc_dirty"] = set()
+        return state
 
     @property
     def start_square(self) -> Tuple[int, int]:
@@ -210,6 +292,13 @@ class Board:
         """ Return the board type, i.e. 'standard' or 'explo' """
         return self._board_type
 
+    def contents_hash(self) -> int:
+        """ Return a 64-bit Zobrist hash of the letters and tiles on the
+            board, which is kept up to date as they are set. Boards with
+            the same contents have the same hash, regardless of the order
+            in which the contents were set, or the process. """
+        return self._hash
+
     def is_empty(self) -> bool:
         """ Is the board empty, i.e. contains no tiles? """
         # One of those checks should actually be enough
@@ -217,19 +306,49 @@ class Board:
 
     def is_covered(self, row: int, col: int) -> bool:
         """ Is the specified square already covered (taken)? """
-        return self._letters[row][col] != " "
+        return bool((self._row_bits[row] >> col) & 1)
 
     def has_adjacent(self, row: int, col: int) -> bool:
         """ Check whether there are any tiles on the board adjacent to this square """
-        if row > 0 and self.is_covered(row - 1, col):
-            return True
-        if row < Board.SIZE - 1 and self.is_covered(row + 1, col):
-            return True
-        if col > 0 and self.is_covered(row, col - 1):
-            return True
-        if col < Board.SIZE - 1 and self.is_covered(row, col + 1):
-            return True
-        return False
+        # The row itself, shifted by one in each direction, and the column
+        # shifted likewise, cover the four neighbours of the square
+        return bool(
+            (((self._row_bits[row] << 1) | (self._row_bits[row] >> 1)) >> col) & 1
+            or (((self._col_bits[col] << 1) | (self._col_bits[col] >> 1)) >> row) & 1
+        )
+
+    def line_bits(self, index: int, horizontal: bool) -> int:
+        """ Return the occupancy bit pattern of a row (if horizontal)
+            or a column (if vertical) """
+        return self._row_bits[index] if horizontal else self._col_bits[index]
+
+    def extent(self, row: int, col: int, horizontal: bool) -> Tuple[int, int]:
+        """ Return the first and last column (if horizontal) or row
+            (if vertical) of the word that a tile on the given square would
+            be a part of, together with the adjacent tiles on the board """
+        if horizontal:
+            return Board.run_extent(self._row_bits[row], col)
+        return Board.run_extent(self._col_bits[col], row)
+
+    def anchors(self) -> List[int]:
+        """ Return a list of bit patterns, one per row, of the anchor
+            squares of the board, i.e. the empty squares that are adjacent
+            to a covered square """
+        if self._anchors is None:
+            rb = self._row_bits
+            last = Board.SIZE - 1
+            self._anchors = [
+                (
+                    (bits << 1)
+                    | (bits >> 1)
+                    | (rb[row - 1] if row > 0 else 0)
+                    | (rb[row + 1] if row < last else 0)
+                )
+                & ~bits
+                & Board.FULL_LINE
+                for row, bits in enumerate(rb)
+            ]
+        return self._anchors
 
     def letter_at(self, row: int, col: int) -> str:
         """ Return the letter at the specified co-ordinate """
@@ -255,6 +374,18 @@ class Board:
             self._numletters -= 1
         r = self._letters[row]
         self._letters[row] = r[0:col] + letter + r[col + 1 :]
+        ix = row * Board.SIZE + col
+        self._hash ^= _zobrist_key(ix, prev) ^ _zobrist_key(ix, letter)
+        # Update the occupancy bit patterns
+        if letter == " ":
+            self._row_bits[row] &= ~(1 << col)
+            self._col_bits[col] &= ~(1 << row)
+        else:
+            self._row_bits[row] |= 1 << col
+            self._col_bits[col] |= 1 << row
+        self._anchors = None
+        if self._cc_dawg is not None:
+            self._invalidate_crosschecks(row, col)
 
     def set_tile(self, row: int, col: int, tile: str) -> None:
         """ Set the tile at the specified co-ordinate """
@@ -272,6 +403,78 @@ class Board:
             self._numtiles -= 1
         r = self._tiles[row]
         self._tiles[row] = r[0:col] + tile + r[col + 1 :]
+        # Tiles have their own keys, following those of the letters
+        ix = (Board.SIZE + row) * Board.SIZE + col
+        self._hash ^= _zobrist_key(ix, prev) ^ _zobrist_key(ix, tile)
+
+    def _invalidate_crosschecks(self, row: int, col: int) -> None:
+        """ Mark the cross-checks that are affected by a change of the
+            letter at the given square as needing recalculation. These are
+            the square itself and the nearest empty squares beyond the
+            contiguous covered squares in each of the four directions. """
+        size = Board.SIZE
+        dirty = self._cc_dirty
+        dirty.add(row * size + col)
+        first, last = Board.run_extent(self._row_bits[row], col)
+        if first > 0:
+            dirty.add(row * size + first - 1)
+        if last < size - 1:
+            dirty.add(row * size + last + 1)
+        first, last = Board.run_extent(self._col_bits[col], row)
+        if first > 0:
+            dirty.add((first - 1) * size + col)
+        if last < size - 1:
+            dirty.add((last + 1) * size + col)
+
+    def _crosscheck(
+        self, dawg: PackedDawgDictionary, row: int, col: int, horizontal: bool
+    ) -> int:
+        """ Calculate the cross-check bit pattern of a square, for moves
+            in the given direction, i.e. the set of letters that form valid
+            cross words with the letters above and below it (for horizontal
+            moves) or to its left and right (for vertical moves) """
+        if self.is_covered(row, col):
+            return -1
+        if horizontal:
+            above = self.letters_above(row, col)
+            below = self.letters_below(row, col)
+        else:
+            above = self.letters_left(row, col)
+            below = self.letters_right(row, col)
+        if not above and not below:
+            # No cross word: any letter fits
+            return -1
+        # Query the word database for the set of letters that fit
+        # this pattern (this is cached within the dictionary)
+        return dawg.crosscheck_bits(above + "?" + below)
+
+    def crosschecks(self, dawg: PackedDawgDictionary, horizontal: bool) -> List[int]:
+        """ Return the rack-independent cross-check bit patterns of all
+            squares on the board, indexed by row * SIZE + col, for moves in
+            the given direction. Only the squares that have been affected by
+            letters set since the last call are recalculated. """
+        size = Board.SIZE
+        if self._cc_dawg is not dawg:
+            # First use, or a different vocabulary: calculate all squares
+            self._cc_dawg = dawg
+            self._cc_horizontal = [
+                self._crosscheck(dawg, row, col, True)
+                for row in range(size)
+                for col in range(size)
+            ]
+            self._cc_vertical = [
+                self._crosscheck(dawg, row, col, False)
+                for row in range(size)
+                for col in range(size)
+            ]
+            self._cc_dirty = set()
+        elif self._cc_dirty:
+            for ix in self._cc_dirty:
+                row, col = divmod(ix, size)
+                self._cc_horizontal[ix] = self._crosscheck(dawg, row, col, True)
+                self._cc_vertical[ix] = self._crosscheck(dawg, row, col, False)
+            self._cc_dirty = set()
+        return self._cc_horizontal if horizontal else self._cc_vertical
 
     def enum_tiles(self) -> Iterator[Tuple[int, int, str, str]]:
         """ Enumerate the tiles on the board with their coordinates """
@@ -281,60 +484,53 @@ class Board:
                 if t != " ":
                     yield (x, y, t, self.letter_at(x, y))
 
-    @staticmethod
-    def adjacent(
-        row: int, col: int, xd: int, yd: int, getter: Callable[[int, int], str]
-    ) -> str:
-        """ Return the letters or tiles adjacent to the given square, in the direction (xd, yd) """
-        result = ""
-        row += xd
-        col += yd
-        while row in range(Board.SIZE) and col in range(Board.SIZE):
-            ltr = getter(row, col)
-            if ltr == " ":
-                # Empty square: we're done
-                break
-            if xd + yd < 0:
-                # Going up or to the left: add to the beginning
-                result = ltr + result
-            else:
-                # Going down or to the right: add to the end
-                result += ltr
-            row += xd
-            col += yd
-        return result
+    def _above(self, row: int, col: int, rows: List[str]) -> str:
+        """ Return the contents of the covered squares immediately above
+            the given square, taken from the given list of rows """
+        first, _ = Board.run_extent(self._col_bits[col], row)
+        return "".join(rows[r][col] for r in range(first, row))
+
+    def _below(self, row: int, col: int, rows: List[str]) -> str:
+        """ Return the contents of the covered squares immediately below
+            the given square, taken from the given list of rows """
+        _, last = Board.run_extent(self._col_bits[col], row)
+        return "".join(rows[r][col] for r in range(row + 1, last + 1))
 
     def letters_above(self, row: int, col: int) -> str:
         """ Return the letters immediately above the given square, if any """
-        return self.adjacent(row, col, -1, 0, self.letter_at)
+        return self._above(row, col, self._letters)
 
     def letters_below(self, row: int, col: int) -> str:
         """ Return the letters immediately below the given square, if any """
-        return self.adjacent(row, col, 1, 0, self.letter_at)
+        return self._below(row, col, self._letters)
 
     def letters_left(self, row: int, col: int) -> str:
         """ Return the letters immediately to the left of the given square, if any """
-        return self.adjacent(row, col, 0, -1, self.letter_at)
+        first, _ = Board.run_extent(self._row_bits[row], col)
+        return self._letters[row][first:col]
 
     def letters_right(self, row: int, col: int) -> str:
         """ Return the letters immediately to the right of the given square, if any """
-        return self.adjacent(row, col, 0, 1, self.letter_at)
+        _, last = Board.run_extent(self._row_bits[row], col)
+        return self._letters[row][col + 1 : last + 1]
 
     def tiles_above(self, row: int, col: int) -> str:
         """ Return the tiles immediately above the given square, if any """
-        return self.adjacent(row, col, -1, 0, self.tile_at)
+        return self._above(row, col, self._tiles)
 
     def tiles_below(self, row: int, col: int) -> str:
         """ Return the tiles immediately below the given square, if any """
-        return self.adjacent(row, col, 1, 0, self.tile_at)
+        return self._below(row, col, self._tiles)
 
     def tiles_left(self, row: int, col: int) -> str:
         """ Return the tiles immediately to the left of the given square, if any """
-        return self.adjacent(row, col, 0, -1, self.tile_at)
+        first, _ = Board.run_extent(self._row_bits[row], col)
+        return self._tiles[row][first:col]
 
     def tiles_right(self, row: int, col: int) -> str:
         """ Return the tiles immediately to the right of the given square, if any """
-        return self.adjacent(row, col, 0, 1, self.tile_at)
+        _, last = Board.run_extent(self._row_bits[row], col)
+        return self._tiles[row][col + 1 : last + 1]
 
     def __str__(self) -> str:
         """ Simple text dump of the contents of the board """
@@ -1056,6 +1252,21 @@ class Move(MoveBase):
         """ Return the starting row of this move """
         return self._row
 
+    @property
+    def col(self) -> int:
+        """ Return the starting column of this move """
+        return self._col
+
+    @property
+    def horizontal(self) -> bool:
+        """ Return True if this is a horizontal move """
+        return self._horizontal
+
+    def tiles(self) -> str:
+        """ Return the tiles string of this move, where '?' tiles
+            are followed by the letter they represent """
+        return self._tiles or ""
+
     def covers(self) -> List[Cover]:
         """ Return the list of covered squares """
         return self._covers
@@ -1197,11 +1408,9 @@ class Move(MoveBase):
         # If only one cover, use the orientation of the longest word formed
         if len(self._covers) == 1:
             # In the case of a tied length, we use horizontal
-            self._horizontal = (
-                len(board.letters_left(row, col)) + len(board.letters_right(row, col))
-            ) >= (
-                len(board.letters_above(row, col)) + len(board.letters_below(row, col))
-            )
+            first_col, last_col = board.extent(row, col, True)
+            first_row, last_row = board.extent(row, col, False)
+            self._horizontal = last_col - first_col >= last_row - first_row
             horiz = self._horizontal
         # The move is purely horizontal or vertical
         if horiz:
@@ -1211,55 +1420,34 @@ class Move(MoveBase):
             self._covers.sort(key=lambda x: x.row)  # Sort in ascending row order
             self._horizontal = False
         # Check whether eventual missing squares in the move sequence
-        # are already covered
-        row = 0
-        col = 0
-        first = True
+        # are already covered, using the occupancy bit pattern of the
+        # row or column that the move is in
+        first_cover = self._covers[0]
+        line = board.line_bits(first_cover.row if horiz else first_cover.col, horiz)
+        covers = 0
+        prev = -1
         for c in self._covers:
-            if board.is_covered(c.row, c.col):
+            pos = c.col if horiz else c.row
+            if (line >> pos) & 1:
                 # We already have a tile in the square: illegal play
                 return Error.SQUARE_ALREADY_OCCUPIED
-            # If there is a gap between this cover and the last one,
-            # make sure all intermediate squares are covered
-            if first:
-                self._row = c.row
-                self._col = c.col
-                first = False
-            else:
-                if horiz:
-                    # Horizontal: check squares within row
-                    for ix in range(col + 1, c.col):
-                        if not board.is_covered(c.row, ix):
-                            # Found gap: illegal play
-                            return Error.HAS_GAP
-                else:
-                    # Vertical: check squares within column
-                    for ix in range(row + 1, c.row):
-                        if not board.is_covered(ix, c.col):
-                            # Found gap: illegal play
-                            return Error.HAS_GAP
-            row = c.row
-            col = c.col
+            if prev >= 0:
+                # If there is a gap between this cover and the last one,
+                # make sure all intermediate squares are covered
+                between = ((1 << pos) - 1) & ~((1 << (prev + 1)) - 1)
+                if line & between != between:
+                    # Found gap: illegal play
+                    return Error.HAS_GAP
+            covers |= 1 << pos
+            prev = pos
         # Find the start and end of the word that is being formed, including
         # tiles aready on the board
-        if horiz:
-            # Look for the beginning
-            while self._col > 0 and board.is_covered(self._row, self._col - 1):
-                self._col -= 1
-            # Look for the end
-            while col + 1 < Board.SIZE and board.is_covered(self._row, col + 1):
-                col += 1
-            # Now we know the length
-            self._numletters = col - self._col + 1
-        else:
-            # Look for the beginning
-            while self._row > 0 and board.is_covered(self._row - 1, self._col):
-                self._row -= 1
-            # Look for the end
-            while row + 1 < Board.SIZE and board.is_covered(row + 1, self._col):
-                row += 1
-            # Now we know the length
-            self._numletters = row - self._row + 1
+        start, end = Board.run_extent(line | covers, prev)
+        self._row, self._col = (
+            (first_cover.row, start) if horiz else (start, first_cover.col)
+        )
+        # Now we know the length
+        self._numletters = end - start + 1
 
         # Assemble the resulting word
         self._word = ""
@@ -1299,13 +1487,16 @@ class Move(MoveBase):
                     self._word += ltr
                     self._tiles += ltr
 
-        def is_valid_word(word: str) -> bool:
-            """Check whether a word is in the dictionary,
-            unless this is a manual game"""
-            return state.manual_wordcheck or (word in self._dawg)
+        # Validate the main word and all cross words in one batch,
+        # unless this is a manual game
+        cross_words = self._cross_words(board)
+        if state.manual_wordcheck:
+            valid = [True] * (1 + len(cross_words))
+        else:
+            valid = self._dawg.find_many([self._word] + cross_words)
 
         # Check whether the word is in the dictionary
-        if not is_valid_word(self._word):
+        if not valid[0]:
             return (Error.WORD_NOT_IN_DICTIONARY, self._word)
 
         # Check that the play is adjacent to some previously placed tile
@@ -1323,36 +1514,17 @@ class Move(MoveBase):
             if not any([board.has_adjacent(c.row, c.col) for c in self._covers]):
                 return Error.NOT_ADJACENT
             # Check all cross words formed by the new tiles
-            for c in self._covers:
-                if self._horizontal:
-                    cross = (
-                        board.letters_above(c.row, c.col)
-                        + c.letter
-                        + board.letters_below(c.row, c.col)
-                    )
-                else:
-                    cross = (
-                        board.letters_left(c.row, c.col)
-                        + c.letter
-                        + board.letters_right(c.row, c.col)
-                    )
-                if len(cross) > 1 and not is_valid_word(cross):
+            for cross, ok in zip(cross_words, valid[1:]):
+                if not ok:
                     return (Error.CROSS_WORD_NOT_IN_DICTIONARY, cross)
 
         # All checks pass: the play is legal
         return Error.LEGAL
 
-    def check_words(self, board: Board) -> List[str]:
-        """Do simple word validation on this move, returning
-        a list of invalid words formed"""
-
-        invalid: List[str] = []
-
-        # Check whether the main word is in the dictionary
-        if self._word not in self._dawg:
-            invalid.append(self._word)
-
-        # Check all cross words formed by the new tiles
+    def _cross_words(self, board: Board) -> List[str]:
+        """Return a list of the cross words formed by the new tiles,
+        in the order of the covers"""
+        result: List[str] = []
         for c in self._covers:
             if self._horizontal:
                 cross = (
@@ -1366,10 +1538,19 @@ class Move(MoveBase):
                     + c.letter
                     + board.letters_right(c.row, c.col)
                 )
-            if len(cross) > 1 and cross not in self._dawg:
-                invalid.append(cross)
+            if len(cross) > 1:
+                result.append(cross)
+        return result
 
-        return invalid  # Returns an empty list if all words are valid
+    def check_words(self, board: Board) -> List[str]:
+        """Do simple word validation on this move, returning
+        a list of invalid words formed"""
+
+        # Check the main word and all cross words formed by the new tiles
+        words = [self._word] + self._cross_words(board)
+        valid = self._dawg.find_many(words)
+        # Returns an empty list if all words are valid
+        return [w for w, ok in zip(words, valid) if not ok]
 
     def score(self, state: State) -> int:
         """ Calculate the score of this move, which is assumed to be legal """
@@ -1477,6 +1658,10 @@ class ExchangeMove(MoveBase):
         """ Return a readable description of the move """
         return "Exchanged {0}".format(len(self._tiles))
 
+    def tiles(self) -> str:
+        """ Return the tiles being exchanged """
+        return self._tiles
+
     def replenish(self) -> bool:
         """ Return True if the player's rack should be replenished after the move """
         return False
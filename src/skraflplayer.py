@@ -63,6 +63,15 @@
     while steps 4)-7) are found in ExtendRightNavigator. These classes
     correspond to the Appel & Jacobson LeftPart and ExtendRight functions.
 
+    Alternatively, if DAWG_GADDAG is set in config.py and a GADDAG has
+    been built for the vocabulary, moves are generated by the GaddagGenerator
+    class, following S. A. Gordon, "A Faster Scrabble Move Generation
+    Algorithm" (1994). Starting with a tile on each anchor square, it
+    traces words leftwards through the GADDAG and then, after the
+    separator, rightwards, in a single traversal per anchor. This avoids
+    both the precomputation of left parts and the re-location of
+    left parts in the DAWG for each anchor.
+
     Note: SCRABBLE is a registered trademark. This software or its author
     are in no way affiliated with or endorsed by the owners or licensees
     of the SCRABBLE trademark.
@@ -74,10 +83,12 @@ from functools import lru_cache
 
 from typing import (
     Any,
+    Iterator,
     NamedTuple,
     Optional,
     List,
     Protocol,
+    Sequence,
     Tuple,
     Dict,
     TypedDict,
@@ -85,26 +96,60 @@ from typing import (
 )
 
 import random
+import sys
+import threading
+from collections import OrderedDict
 from enum import Enum
-
-from dawgdictionary import Wordbase, PackedDawgDictionary
-from languages import current_alphabet
+from heapq import heappush, heappushpop
+
+from config import DAWG_GADDAG, LEFT_PART_CACHE_KB
+from dawgdictionary import (
+    Wordbase,
+    WordSet,
+    PackedDawgDictionary,
+    PackedGaddag,
+    GraphPosition,
+    ROOT_POSITION,
+)
+from languages import current_alphabet, current_vocabulary
 from skraflmechanics import (
     State,
     Board,
     Cover,
+    Rack,
     MoveBase,
     Move,
     ExchangeMove,
     PassMove,
 )
-from dawgdictionary import Navigator
+from dawgdictionary import Navigator, rack_mask
 
 
 # Type definitions
 
 LeftPart = Tuple[str, str, str, int]
 
+# A left part in a LeftPartTable: (matched, rack leave, prefix, next node,
+# bit mask of the letters that can follow the left part)
+LeftPartEntry = Tuple[str, str, str, int, int]
+
+# A scored placement of a word on an axis, kept during move generation
+# before a Move object is made for it: (score, -tiebreak, -row, -column,
+# horizontal, word, axis, index of first letter within the axis). Tuples
+# compare in the same order as the sort keys in
+# AutoPlayer._score_candidates(), with the best placement being the largest.
+Placement = Tuple[int, int, int, int, bool, str, "Axis", int]
+
+# Approximate size of a LeftPartEntry, in bytes, not counting the
+# characters of its strings
+_LEFT_PART_ENTRY_SIZE = (
+    sys.getsizeof((0,) * 5) + 3 * sys.getsizeof("") + 2 * sys.getsizeof(1 << 30)
+)
+
+# Racks with more blanks than this are not cached, as their left part
+# tables are large (several megabytes) and they seldom recur
+LEFT_PART_CACHE_MAX_BLANKS = 1
+
 
 class MoveTuple(NamedTuple):
     move: MoveBase
@@ -172,14 +217,17 @@ class Square:
         # Is this an anchor square?
         self._anchor = False
 
-    def init(self, autoplayer: AutoPlayer, row: int, col: int, crosscheck: int) -> None:
-        """ Initialize this square from the board """
+    def init(
+        self, autoplayer: AutoPlayer, row: int, col: int, crosscheck: int, anchor: bool
+    ) -> None:
+        """Initialize this square from the board, where anchor is True
+        if the square is empty and has adjacent covered squares"""
         board = autoplayer.board()
         self._tile = board.tile_at(row, col)
         self._letter = board.letter_at(row, col)
         # Cross checks and anchors
         self._cc = crosscheck
-        if self.is_open() and board.has_adjacent(row, col):
+        if anchor and crosscheck:
             # Empty square with adjacent covered squares and nonzero cross-checks:
             # mark as anchor
             self.mark_anchor()
@@ -196,6 +244,11 @@ class Square:
         """ Can this letter be placed here? """
         return bool(self._cc & letter_bit)
 
+    @property
+    def crosscheck(self) -> int:
+        """ Return the bit pattern of letters that can be placed here """
+        return self._cc
+
     @property
     def letter(self) -> str:
         """ Return the letter at this square """
@@ -227,6 +280,12 @@ class Axis:
         # Bit pattern representing empty squares on this axis
         self._empty_bits = 0
         self._dawg = Wordbase.dawg()
+        # Per-square score tables for scoring placements without
+        # making Move objects, calculated on first use (see score())
+        self._letter_mult: List[int] = []
+        self._word_mult: List[int] = []
+        self._board_score: List[int] = []
+        self._cross_score: List[int] = []
 
     def is_horizontal(self) -> bool:
         """ Is this a horizontal (row) axis? """
@@ -260,6 +319,14 @@ class Axis:
         """ Is the square at the index empty? """
         return bool(self._empty_bits & (1 << index))
 
+    def square(self, index: int) -> Square:
+        """ Return the Square at the index """
+        return self._sq[index]
+
+    def crosscheck_at(self, index: int) -> int:
+        """ Return the cross-check bit pattern of the square at the index """
+        return self._sq[index].crosscheck
+
     @property
     def autoplayer(self) -> AutoPlayer:
         """ Return the associated Autoplayer instance """
@@ -271,13 +338,20 @@ class Axis:
         self._sq[index].mark_anchor()
 
     def init_crosschecks(self) -> None:
-        """Calculate and return a list of cross-check
-        bit patterns for the indicated axis"""
+        """Initialize the squares of the axis with their cross-check
+        bit patterns, narrowed down to the letters in the rack"""
 
-        alphabet = current_alphabet()
         # The cross-check set is the set of letters that can appear in a square
-        # and make cross words (above/left and/or below/right of the square) valid
+        # and make cross words (above/left and/or below/right of the square) valid.
+        # The board maintains these sets incrementally, independently of the rack.
         board = self._autoplayer.board()
+        crosschecks = board.crosschecks(self._dawg, self._horizontal)
+        # The anchor squares of the whole board, as a bit pattern per row
+        anchors = board.anchors()
+        # Keep track of empty squares within the axis in a bit pattern for speed
+        self._empty_bits = ~board.line_bits(self._index, self._horizontal) & (
+            Board.FULL_LINE
+        )
         # Prepare to visit all squares on the axis
         x, y = self.coordinate_of(0)
         xd, yd = self.coordinate_step()
@@ -286,47 +360,20 @@ class Axis:
         # contains all letters in the Alphabet. Otherwise, it contains the
         # letters in the rack.
         all_cc = self._autoplayer.rack_bit_pattern()
-        # Go through the open squares and calculate their cross-checks
+        # Go through the squares and narrow their cross-checks down to the rack
         for ix in range(Board.SIZE):
-            cc = all_cc  # Start with the default cross-check set
-            if not board.is_covered(x, y):
-                if self.is_horizontal():
-                    above = board.letters_above(x, y)
-                    below = board.letters_below(x, y)
-                else:
-                    above = board.letters_left(x, y)
-                    below = board.letters_right(x, y)
-                query = above or ""
-                query += "?"
-                if below:
-                    query += below
-                if len(query) > 1:
-                    # Nontrivial cross-check: Query the word database
-                    # for words that fit this pattern
-                    # Don't need a sorted result
-                    matches = self._dawg.find_matches(query, sort=False)
-                    bits = 0
-                    if matches:
-                        cix = len(above) if above else 0
-                        # Note the set of allowed letters here
-                        bits = alphabet.bit_pattern(
-                            "".join(wrd[cix] for wrd in matches)
-                        )
-                    # Reduce the cross-check set by intersecting it with the allowed set.
-                    # If the cross-check set and the rack have nothing in common, this
-                    # will lead to the square being marked as closed, which saves
-                    # calculation later on
-                    cc &= bits
+            # Reduce the cross-check set by intersecting it with the allowed set.
+            # If the cross-check set and the rack have nothing in common, this
+            # will lead to the square being marked as closed, which saves
+            # calculation later on
+            cc = all_cc & crosschecks[x * Board.SIZE + y]
             # Initialize the square
-            self._sq[ix].init(self._autoplayer, x, y, cc)
-            # Keep track of empty squares within the axis in a bit pattern for speed
-            if self._sq[ix].is_empty():
-                self._empty_bits |= 1 << ix
+            self._sq[ix].init(self._autoplayer, x, y, cc, bool((anchors[x] >> y) & 1))
             x += xd
             y += yd
 
     def _gen_moves_from_anchor(
-        self, index: int, maxleft: int, lpn: Optional[LeftPermutationNavigator]
+        self, index: int, maxleft: int, lpn: Optional[LeftPartTable]
     ) -> None:
         """ Find valid moves emanating (on the left and right) from this anchor """
         if maxleft == 0 and index > 0 and not self.is_empty(index - 1):
@@ -357,14 +404,145 @@ class Axis:
         if maxleft > 0 and lpn is not None:
             # Follow this by an effort to permute left prefixes into the open space
             # to the left of the anchor square
+            anchor_cc = self.crosscheck_at(index)
             for left_len in range(1, maxleft + 1):
                 lp_list = lpn.leftparts(left_len)
                 if lp_list is not None:
-                    for leftpart, rack_leave, prefix, next_node in lp_list:
+                    for leftpart, rack_leave, prefix, next_node, follow in lp_list:
+                        if not (follow & anchor_cc):
+                            # No letter that can follow the left part
+                            # passes the cross-check of the anchor square
+                            continue
                         rnav = ExtendRightNavigator(self, index, rack_leave)
                         self._dawg.resume_navigation(rnav, prefix, next_node, leftpart)
 
-    def generate_moves(self, lpn: Optional[LeftPermutationNavigator]) -> None:
+    def add_candidate(self, ix: int, word: str) -> None:
+        """Add a candidate word starting at the given index within
+        the axis to the AutoPlayer, either as a Move object or as a
+        scored placement if the AutoPlayer only keeps the best ones"""
+        autoplayer = self._autoplayer
+        if autoplayer.keeps_best():
+            autoplayer.add_placement(self, ix, word)
+        else:
+            autoplayer.add_candidate(self.make_move(ix, word))
+
+    def _init_score_tables(self) -> None:
+        """ Calculate the per-square tables used by score() """
+        autoplayer = self._autoplayer
+        board = autoplayer.board()
+        scores = autoplayer.tile_scores()
+        x, y = self.coordinate_of(0)
+        xd, yd = self.coordinate_step()
+        for ix in range(Board.SIZE):
+            if self.is_empty(ix):
+                self._letter_mult.append(board.letterscore(x, y))
+                self._word_mult.append(board.wordscore(x, y))
+                self._board_score.append(0)
+                # The tiles of the cross word, if any, through this square
+                if self._horizontal:
+                    cross = board.tiles_above(x, y) + board.tiles_below(x, y)
+                else:
+                    cross = board.tiles_left(x, y) + board.tiles_right(x, y)
+                self._cross_score.append(
+                    sum(scores[tile] for tile in cross) if cross else -1
+                )
+            else:
+                # Multipliers only apply to freshly covered squares
+                self._letter_mult.append(1)
+                self._word_mult.append(1)
+                self._board_score.append(scores[board.tile_at(x, y)])
+                self._cross_score.append(-1)
+            x += xd
+            y += yd
+
+    def score(self, ix: int, word: str) -> Tuple[int, int]:
+        """Return the score of a word starting at the given index within
+        the axis, along with the number of tiles it covers. This gives
+        the same result as Move.score() for the Move object that
+        make_move() would return, but is a lot faster."""
+        if not self._letter_mult:
+            self._init_score_tables()
+        autoplayer = self._autoplayer
+        scores = autoplayer.tile_scores()
+        rack = autoplayer.rack()
+        letter_mult = self._letter_mult
+        word_mult = self._word_mult
+        cross_score = self._cross_score
+        main = 0
+        wsc = 1
+        cross = 0
+        covers = 0
+        for c in word:
+            if self.is_empty(ix):
+                # A tile from the rack: a normal one if we have it,
+                # otherwise a blank, as in make_move()
+                if c in rack:
+                    rack = rack.replace(c, "", 1)
+                    lscore = scores[c] * letter_mult[ix]
+                else:
+                    rack = rack.replace("?", "", 1)
+                    lscore = scores["?"] * letter_mult[ix]
+                main += lscore
+                wsc *= word_mult[ix]
+                if cross_score[ix] >= 0:
+                    # This tile also forms a cross word
+                    cross += (lscore + cross_score[ix]) * word_mult[ix]
+                covers += 1
+            else:
+                main += self._board_score[ix]
+            ix += 1
+        total = main * wsc + cross
+        if covers == Rack.MAX_TILES:
+            total += Move.BINGO_BONUS
+        return total, covers
+
+    def make_move(self, ix: int, word: str) -> Move:
+        """Make a Move object for a word starting at the given index
+        within the axis"""
+        row, col = self.coordinate_of(ix)
+        xd, yd = self.coordinate_step()
+        move = Move(word, row, col, self.is_horizontal())
+        # Fetch the rack as it was at the beginning of move generation
+        autoplayer = self._autoplayer
+        rack = autoplayer.rack()
+        tiles = ""
+        for c in word:
+            if self.is_empty(ix):
+                # Empty square that is being covered by this move
+                # Find out whether it is a blank or normal letter tile
+                if c in rack:
+                    rack = rack.replace(c, "", 1)
+                    tile = c
+                    tiles += c
+                else:
+                    # Must be a wildcard match
+                    rack = rack.replace("?", "", 1)
+                    tile = "?"
+                    tiles += tile + c
+                # assert row in range(Board.SIZE)
+                # assert col in range(Board.SIZE)
+                # Add this cover to the Move object
+                move.add_validated_cover(Cover(row, col, tile, c))
+            else:
+                tiles += c
+            ix += 1
+            row += xd
+            col += yd
+        # Note the tiles played in the move
+        move.set_tiles(tiles)
+        return move
+
+    def generate_moves_gaddag(self, gaddag: PackedGaddag) -> None:
+        """Find all valid moves on this axis by tracing the GADDAG
+        outwards from each anchor square"""
+        if gaddag.buffer() is None:
+            return
+        gen = GaddagGenerator(self, gaddag)
+        for i in range(Board.SIZE):
+            if self._sq[i].is_anchor():
+                gen.generate(i)
+
+    def generate_moves(self, lpn: Optional[LeftPartTable]) -> None:
         """Find all valid moves on this axis by attempting to place tiles
         at and around all anchor squares"""
         last_anchor = -1
@@ -409,11 +587,20 @@ class LeftPermutationNavigator(Navigator):
             None for _ in range(self._maxleft)
         ]
         self._index = 0
+        self._alphabet = current_alphabet()
 
     def leftparts(self, length: int) -> Optional[List[LeftPart]]:
         """ Returns a list of leftparts of the length requested """
         return self._leftparts[length - 1] if 0 < length <= self._maxleft else None
 
+    def all_leftparts(self) -> List[Optional[List[LeftPart]]]:
+        """ Returns the lists of leftparts of all lengths, shortest first """
+        return self._leftparts
+
+    def describe(self) -> str:
+        """ Returns the rack from which left parts are formed """
+        return self._rack
+
     def push_edge(self, firstchar: str) -> bool:
         """ Returns True if the edge should be entered or False if not """
         # Follow all edges that match a letter in the rack
@@ -473,6 +660,160 @@ class LeftPermutationNavigator(Navigator):
         # We need to visit all outgoing edges, so return True
         return True
 
+    def edge_mask(self) -> int:
+        """ Only edges starting with a letter in the rack can be entered """
+        return rack_mask(self._alphabet, self._rack)
+
+
+class LeftPartTable:
+
+    """An immutable table of the left parts that can be formed from
+    a rack, by length, as found by a LeftPermutationNavigator.
+    Each left part carries the state needed to resume the navigation
+    of the graph at its end, to generate right parts. Since the table
+    depends only on the vocabulary and the rack, and not on the board,
+    it can be shared between move generations (see left_part_table()).
+
+    Left parts are placed on squares that have no cross-checks, so a
+    blank tile in a left part takes whichever letter the graph allows,
+    and a rack with blanks yields a great many left parts. The letter
+    placed on the anchor square after a left part, however, is forced
+    by the anchor's cross-check. Each left part therefore carries a bit
+    mask of the letters that can follow it in the graph and are in its
+    rack leave, and Axis._gen_moves_from_anchor() only resumes the
+    navigation if the mask meets the cross-check of the anchor. Left
+    parts that nothing can follow are left out of the table.
+    """
+
+    __slots__ = ("_by_length", "size")
+
+    def __init__(
+        self, lpn: LeftPermutationNavigator, dawg: PackedDawgDictionary
+    ) -> None:
+        alphabet = dawg.alphabet
+        by_length: List[Optional[Tuple[LeftPartEntry, ...]]] = []
+        size = 0
+        for lp in lpn.all_leftparts():
+            entries: List[LeftPartEntry] = []
+            for matched, rack_leave, prefix, next_node in lp or ():
+                # Find the letters that can follow the left part
+                follow = dawg.next_letters(prefix, next_node) & rack_mask(
+                    alphabet, rack_leave
+                )
+                if follow:
+                    entries.append((matched, rack_leave, prefix, next_node, follow))
+                    size += len(matched) + len(rack_leave) + len(prefix)
+            table = tuple(entries) if entries else None
+            by_length.append(table)
+            size += sys.getsizeof(table) + len(entries) * _LEFT_PART_ENTRY_SIZE
+        self._by_length: Tuple[Optional[Tuple[LeftPartEntry, ...]], ...] = tuple(
+            by_length
+        )
+        # The approximate memory footprint of the table, in bytes
+        self.size: int = size + sys.getsizeof(self._by_length)
+
+    def leftparts(self, length: int) -> Optional[Tuple[LeftPartEntry, ...]]:
+        """ Returns a tuple of leftparts of the length requested """
+        return (
+            self._by_length[length - 1]
+            if 0 < length <= len(self._by_length)
+            else None
+        )
+
+    def __len__(self) -> int:
+        """ Returns the total number of left parts in the table """
+        return sum(len(lp) for lp in self._by_length if lp is not None)
+
+
+def _build_left_part_table(vocab: str, rack: str) -> LeftPartTable:
+    """ Navigate the vocabulary's graph to find all left parts
+        that can be formed from the rack """
+    dawg = Wordbase.dawg_for_vocab(vocab)
+    if dawg is None:
+        raise KeyError(vocab)
+    lpn = LeftPermutationNavigator(rack)
+    dawg.navigate(lpn)
+    return LeftPartTable(lpn, dawg)
+
+
+class LeftPartCache:
+
+    """A process-wide LRU cache of left part tables, keyed by vocabulary
+    and sorted rack, whose approximate size in bytes is kept within
+    a budget (see LEFT_PART_CACHE_KB in config.py)"""
+
+    def __init__(self, budget: int) -> None:
+        self.budget = budget
+        self._lock = threading.Lock()
+        self._tables: OrderedDict[Tuple[str, str], LeftPartTable] = OrderedDict()
+        self.size = 0
+        self.reset()
+
+    def reset(self) -> None:
+        """ Zero the hit and miss counters """
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, vocab: str, rack: str) -> LeftPartTable:
+        """ Return the left part table for a sorted rack, building
+            and caching it if it is not in the cache """
+        key = (vocab, rack)
+        with self._lock:
+            table = self._tables.get(key)
+            if table is not None:
+                self._tables.move_to_end(key)
+                self.hits += 1
+                return table
+            self.misses += 1
+        # Build the table outside the lock, so that other threads can use
+        # the cache meanwhile. Two threads may build the same table.
+        table = _build_left_part_table(vocab, rack)
+        if table.size <= self.budget:
+            with self._lock:
+                if key not in self._tables:
+                    self._tables[key] = table
+                    self.size += table.size
+                    while self.size > self.budget:
+                        _, evicted = self._tables.popitem(last=False)
+                        self.size -= evicted.size
+        return table
+
+    def stats(self, reset: bool = False) -> Dict[str, float]:
+        """ Return statistics for the cache, optionally
+            zeroing the counters afterwards """
+        with self._lock:
+            lookups = self.hits + self.misses
+            result: Dict[str, float] = dict(
+                hits=self.hits,
+                misses=self.misses,
+                hit_rate=self.hits / lookups if lookups else 0.0,
+                entries=len(self._tables),
+                bytes=self.size,
+                budget=self.budget,
+            )
+            if reset:
+                self.reset()
+        return result
+
+
+_left_part_cache = LeftPartCache(LEFT_PART_CACHE_KB * 1024)
+
+
+def left_part_table(vocab: str, rack: str) -> LeftPartTable:
+    """ Return the table of left parts that can be formed from the
+        given rack in the given vocabulary, from the cache if possible """
+    # The left parts do not depend on the order of the tiles in the rack
+    rack = "".join(sorted(rack))
+    if LEFT_PART_CACHE_KB <= 0 or rack.count("?") > LEFT_PART_CACHE_MAX_BLANKS:
+        return _build_left_part_table(vocab, rack)
+    return _left_part_cache.get(vocab, rack)
+
+
+def left_part_stats(reset: bool = False) -> Dict[str, float]:
+    """ Return statistics for the left part table cache,
+        optionally zeroing its counters afterwards """
+    return _left_part_cache.stats(reset)
+
 
 class LeftFindNavigator(Navigator):
 
@@ -496,6 +837,10 @@ class LeftFindNavigator(Navigator):
         """ Returns the current state of the navigator """
         return self._state
 
+    def describe(self) -> str:
+        """ Returns the left part being traced """
+        return self._prefix
+
     def push_edge(self, firstchar: str) -> bool:
         """ Returns True if the edge should be entered or False if not """
         # If we are still navigating through the prefix, do a simple compare
@@ -557,7 +902,8 @@ class ExtendRightNavigator(Navigator):
         self._wildcard_in_rack = "?" in rack
         # Cache the initial check we do when pushing into an edge
         self._last_check: Optional[Match] = None
-        self._letter_bit = current_alphabet().letter_bit
+        self._alphabet = current_alphabet()
+        self._letter_bit = self._alphabet.letter_bit
 
     def _check(self, ch: str) -> Match:
         """Check whether the letter ch could be placed at the
@@ -578,6 +924,10 @@ class ExtendRightNavigator(Navigator):
             else Match.NO
         )
 
+    def describe(self) -> str:
+        """ Returns the rack that is available for extending right """
+        return self._rack
+
     def push_edge(self, firstchar: str) -> bool:
         """ Returns True if the edge should be entered or False if not """
         # We are in the right part: check whether we have a potential match
@@ -629,44 +979,9 @@ class ExtendRightNavigator(Navigator):
             and len(matched) > 1
             and (self._index >= Board.SIZE or self._axis.is_empty(self._index))
         ):
-
-            # Solution found - make a Move object for it
-            # and add it to the AutoPlayer's list
-            ix = self._index - len(matched)  # The word's starting index within the axis
-            row, col = self._axis.coordinate_of(ix)
-            xd, yd = self._axis.coordinate_step()
-            move = Move(matched, row, col, self._axis.is_horizontal())
-            # Fetch the rack as it was at the beginning of move generation
-            autoplayer = self._axis.autoplayer
-            rack = autoplayer.rack()
-            tiles = ""
-            for c in matched:
-                if self._axis.is_empty(ix):
-                    # Empty square that is being covered by this move
-                    # Find out whether it is a blank or normal letter tile
-                    if c in rack:
-                        rack = rack.replace(c, "", 1)
-                        tile = c
-                        tiles += c
-                    else:
-                        # Must be a wildcard match
-                        rack = rack.replace("?", "", 1)
-                        tile = "?"
-                        tiles += tile + c
-                    # assert row in range(Board.SIZE)
-                    # assert col in range(Board.SIZE)
-                    # Add this cover to the Move object
-                    move.add_validated_cover(Cover(row, col, tile, c))
-                else:
-                    tiles += c
-                ix += 1
-                row += xd
-                col += yd
-            # Note the tiles played in the move
-            move.set_tiles(tiles)
-            # Check that we've picked off the correct number of tiles
-            # assert len(rack) == len(self._rack)
-            autoplayer.add_candidate(move)
+            # Solution found - the word's starting index within the axis
+            # is the current index minus the length of the word
+            self._axis.add_candidate(self._index - len(matched), matched)
 
     def pop_edge(self):
         """ Called when leaving an edge that has been navigated """
@@ -674,6 +989,129 @@ class ExtendRightNavigator(Navigator):
         # Once past the prefix, we need to visit all outgoing edges, so return True
         return True
 
+    def edge_mask(self) -> int:
+        """Return a bit mask of the letters that can be placed
+        at the current square, given the board, the cross-checks
+        and the rack"""
+        axis = self._axis
+        l_at_sq = axis.letter_at(self._index)
+        if l_at_sq != " ":
+            # There is a tile already in the square: we must match it exactly
+            return self._letter_bit[l_at_sq]
+        return axis.crosscheck_at(self._index) & rack_mask(self._alphabet, self._rack)
+
+
+class GaddagGenerator:
+
+    """Generates moves on an Axis by tracing a GADDAG outwards from
+    anchor squares, as described by Gordon. From the anchor, tiles are
+    placed leftwards, into empty non-anchor squares or matching tiles
+    already on the board, while following the reversed word prefix in
+    the GADDAG. Then, after the separator, tiles are placed to the right
+    of the anchor while following the rest of the word. Since leftward
+    placement stops at other anchors, each move is generated exactly
+    once, from its leftmost anchor, as in the Appel & Jacobson algorithm.
+    """
+
+    def __init__(self, axis: Axis, gaddag: PackedGaddag) -> None:
+        self._axis = axis
+        self._step = gaddag.step
+        self._successors = gaddag.successors
+        self._separator = gaddag.separator
+        self._alphabet = gaddag.alphabet
+        self._order = gaddag.alphabet.order
+        self._encoding = gaddag.encoding
+        # Snapshot the squares of the axis, for speed
+        squares = [axis.square(ix) for ix in range(Board.SIZE)]
+        self._letters = [sq.letter for sq in squares]
+        self._crosschecks = [sq.crosscheck for sq in squares]
+        self._anchors = [sq.is_anchor() for sq in squares]
+        self._anchor = 0
+
+    def generate(self, anchor: int) -> None:
+        """ Generate all moves that cover the given anchor square,
+            and no anchor squares to its left """
+        self._anchor = anchor
+        self._left(anchor, ROOT_POSITION, self._axis.autoplayer.rack(), "")
+
+    def _placements(
+        self, ix: int, pos: GraphPosition, rack: str
+    ) -> List[Tuple[str, GraphPosition, str]]:
+        """Return the possible (letter, position, remaining rack) tuples
+        for the square at index ix, given the board, the cross-checks,
+        the rack and the current position in the GADDAG"""
+        letter = self._letters[ix]
+        if letter != " ":
+            # A tile on the board: it must be followed in the GADDAG
+            npos = self._step(pos, self._encoding[letter])
+            return [] if npos is None else [(letter, npos, rack)]
+        if not rack:
+            return []
+        mask = self._crosschecks[ix] & rack_mask(self._alphabet, rack)
+        if not mask:
+            return []
+        order = self._order
+        # The separator's bit is never set in the mask
+        return [
+            (
+                order[code],
+                npos,
+                # Use a normal tile if the rack has one, otherwise a blank
+                rack.replace(order[code], "", 1)
+                if order[code] in rack
+                else rack.replace("?", "", 1),
+            )
+            for code, npos in self._successors(pos)
+            if (mask >> code) & 1
+        ]
+
+    def _left(self, ix: int, pos: GraphPosition, rack: str, word: str) -> None:
+        """ Place a letter at index ix, moving leftwards from the anchor """
+        letters = self._letters
+        anchor = self._anchor
+        right_free = anchor + 1 >= Board.SIZE or letters[anchor + 1] == " "
+        left_free = ix == 0 or letters[ix - 1] == " "
+        for letter, npos, nrack in self._placements(ix, pos, rack):
+            w = letter + word
+            offset, rem, final = npos
+            if final and left_free and right_free and len(w) > 1:
+                # The letters placed so far form a complete word
+                self._axis.add_candidate(ix, w)
+            if offset < 0 and rem == 0:
+                # Nowhere further to go in the graph
+                continue
+            if not left_free:
+                # A tile on the board to the left: it must be included
+                self._left(ix - 1, npos, nrack, w)
+                continue
+            if ix > 0 and nrack and not self._anchors[ix - 1]:
+                # Continue leftwards into an empty non-anchor square
+                self._left(ix - 1, npos, nrack, w)
+            if anchor + 1 < Board.SIZE:
+                # Switch direction: continue to the right of the anchor
+                spos = self._step(npos, self._separator)
+                if spos is not None:
+                    self._right(anchor + 1, spos, nrack, w, ix)
+
+    def _right(
+        self, ix: int, pos: GraphPosition, rack: str, word: str, start: int
+    ) -> None:
+        """ Place a letter at index ix, moving rightwards from the anchor """
+        nxt = ix + 1
+        next_free = nxt >= Board.SIZE or self._letters[nxt] == " "
+        for letter, npos, nrack in self._placements(ix, pos, rack):
+            w = word + letter
+            offset, rem, final = npos
+            if final and next_free:
+                # Completed a word (which has at least two letters by now)
+                self._axis.add_candidate(start, w)
+            if (
+                nxt < Board.SIZE
+                and (offset >= 0 or rem > 0)
+                and (nrack or not next_free)
+            ):
+                self._right(nxt, npos, nrack, w, start)
+
 
 # By convention, a robot level that always plays the highest-scoring word
 TOP_SCORE = 0
@@ -703,6 +1141,10 @@ class AutoPlayer:
 
     """
 
+    # The number of top-scoring candidates that _find_best_move() needs
+    # to see, or 0 if it needs all of them
+    CANDIDATES_NEEDED = 1
+
     @staticmethod
     @lru_cache(maxsize=None)
     def for_locale(locale: str) -> AutoPlayerList:
@@ -762,6 +1204,10 @@ class AutoPlayer:
             self._rack_bit_pattern = current_alphabet().bit_pattern(self._rack)
         # List of valid, candidate moves
         self._candidates: List[MoveBase] = []
+        # If positive, the number of best candidates to keep during move
+        # generation, as scored placements in a heap (see add_placement())
+        self._keep_best = 0
+        self._placements: List[Placement] = []
 
     def board(self) -> Board:
         """ Return the board """
@@ -783,6 +1229,34 @@ class AutoPlayer:
         """ Add a candidate move to the AutoPlayer's list """
         self._candidates.append(move)
 
+    def tile_scores(self) -> Dict[str, int]:
+        """ Return the scores of the tiles in the game's tile set """
+        tileset = self._state.tileset
+        assert tileset is not None
+        return tileset.scores
+
+    def keeps_best(self) -> bool:
+        """Return True if only the best candidates are being kept,
+        as scored placements, during move generation"""
+        return self._keep_best > 0
+
+    def add_placement(self, axis: Axis, ix: int, word: str) -> None:
+        """Score a candidate word starting at the given index within
+        the axis, and keep it if it is among the best ones so far"""
+        score, covers = axis.score(ix, word)
+        row, col = axis.coordinate_of(ix)
+        # Ties are resolved as in _score_candidates(): by the number of
+        # tiles covered, or by row in the first move, and then by position
+        # and word, so that they do not depend on the move generator
+        tiebreak = row if self._board.is_empty() else covers
+        placement: Placement = (
+            score, -tiebreak, -row, -col, axis.is_horizontal(), word, axis, ix
+        )
+        if len(self._placements) < self._keep_best:
+            heappush(self._placements, placement)
+        else:
+            heappushpop(self._placements, placement)
+
     def _axis_from_row(self, row: int) -> Axis:
         """ Create and initialize an Axis from a board row """
         return Axis(self, row, True)  # Horizontal
@@ -791,14 +1265,30 @@ class AutoPlayer:
         """ Create and initialize an Axis from a board column """
         return Axis(self, col, False)  # Vertical
 
+    def _axes(self, axes: Optional[Sequence[int]]) -> Iterator[Axis]:
+        """Generate the axes with the given numbers, or all axes if None,
+        with their cross-checks initialized. The rows are numbered 0-14
+        and the columns 15-29."""
+        for n in range(2 * Board.SIZE) if axes is None else sorted(axes):
+            if n < Board.SIZE:
+                axis = self._axis_from_row(n)
+            else:
+                axis = self._axis_from_column(n - Board.SIZE)
+            axis.init_crosschecks()
+            yield axis
+
     def generate_move(self) -> MoveBase:
         """ Finds and returns a Move object to be played """
         return self._generate_move(depth=1)
 
-    def generate_best_moves(self, max_number: int = 0) -> MoveList:
+    def generate_best_moves(
+        self, max_number: int = 0, axes: Optional[Sequence[int]] = None
+    ) -> MoveList:
         """Returns a list in descending order of the n best moves,
-        or all moves if n <= 0"""
-        self._generate_candidates()
+        or all moves if n <= 0. If axes is given, only moves along the
+        axes with those numbers are generated (see _axes()), unless the
+        board is empty."""
+        self._generate_candidates(keep_best=max(max_number, 0), axes=axes)
         if not self._candidates:
             # No candidates: no best move
             return []
@@ -809,16 +1299,39 @@ class AutoPlayer:
         # Return the top candidates
         return sorted_candidates[0:max_number]
 
-    def _generate_candidates(self) -> None:
-        """ Generate a fresh candidate list """
+    def _generate_candidates(
+        self, keep_best: int = 0, axes: Optional[Sequence[int]] = None
+    ) -> None:
+        """Generate a fresh candidate list. If keep_best is positive,
+        candidates are scored as they are found, and Move objects are
+        only made for the keep_best highest-scoring ones. If axes is
+        given, only those axes of a non-empty board are visited."""
 
         self._candidates = []
+        self._keep_best = keep_best
+        self._placements = []
+        gaddag = Wordbase.gaddag() if DAWG_GADDAG else None
+        if gaddag is not None:
+            self._generate_candidates_gaddag(gaddag, axes)
+        else:
+            self._generate_candidates_dawg(axes)
+        if keep_best > 0:
+            # Make Move objects for the best placements, in descending order
+            self._candidates = [
+                axis.make_move(ix, word)
+                for *_, word, axis, ix in sorted(self._placements, reverse=True)
+            ]
+            self._placements = []
+
+    def _generate_candidates_dawg(self, axes: Optional[Sequence[int]]) -> None:
+        """ Generate a fresh candidate list using the DAWG """
         # Start by generating all possible permutations of the
-        # rack that form left parts of words, ordering them by length
-        lpn: Optional[LeftPermutationNavigator] = None
+        # rack that form left parts of words, ordering them by length.
+        # The table depends only on the vocabulary and the rack, so it is
+        # usually found in a cache.
+        lpn: Optional[LeftPartTable] = None
         if len(self._rack) > 1:
-            lpn = LeftPermutationNavigator(self._rack)
-            Wordbase.dawg().navigate(lpn)
+            lpn = left_part_table(current_vocabulary(), self._rack)
 
         # Generate moves in one-dimensional space by looking at each axis
         # (row or column) on the board separately
@@ -845,21 +1358,36 @@ class AutoPlayer:
         else:
             # Normal move: go through all 15 (row) + 15 (column) axes and generate
             # valid moves within each of them
-            for r in range(Board.SIZE):
-                axis = self._axis_from_row(r)
-                axis.init_crosschecks()
+            for axis in self._axes(axes):
                 axis.generate_moves(lpn)
-            for c in range(Board.SIZE):
-                axis = self._axis_from_column(c)
+
+    def _generate_candidates_gaddag(
+        self, gaddag: PackedGaddag, axes: Optional[Sequence[int]]
+    ) -> None:
+        """ Generate a fresh candidate list using a GADDAG """
+        if self._board.is_empty():
+            # Special case for first move, as in _generate_candidates_dawg()
+            ssq_row, ssq_col = self.board().start_square
+            if random.choice((False, True)):
+                axis = self._axis_from_column(ssq_col)
                 axis.init_crosschecks()
-                axis.generate_moves(lpn)
+                axis.mark_anchor(ssq_row)
+            else:
+                axis = self._axis_from_row(ssq_row)
+                axis.init_crosschecks()
+                axis.mark_anchor(ssq_col)
+            axis.generate_moves_gaddag(gaddag)
+            return
+        for axis in self._axes(axes):
+            axis.generate_moves_gaddag(gaddag)
 
     def _generate_move(self, depth: int) -> MoveBase:
         """Finds and returns a Move object to be played,
         eventually weighted by countermoves"""
 
-        # Generate a fresh list of candidate moves
-        self._generate_candidates()
+        # Generate a fresh list of candidate moves, keeping only
+        # as many as _pick_candidate() needs to see
+        self._generate_candidates(keep_best=self.CANDIDATES_NEEDED)
 
         # Pick the best move from the candidate list
         move = self._find_best_move(depth)
@@ -880,7 +1408,14 @@ class AutoPlayer:
             MoveTuple(m, self._state.score(m)) for m in self._candidates
         ]
 
-        def keyfunc(x: MoveTuple) -> Tuple[int, int]:
+        def position(m: MoveBase) -> Tuple[int, int, bool]:
+            """Remaining ties are resolved by row, column and direction,
+            horizontal first, so that the order does not depend on the
+            move generator (see AutoPlayer.add_placement())"""
+            assert isinstance(m, Move)
+            return (m.row, m.col, not m.horizontal)
+
+        def keyfunc(x: MoveTuple) -> Tuple[int, int, int, int, bool]:
             """Sort moves first by descending score;
             in case of ties prefer shorter words"""
             # More sophisticated logic can be inserted here,
@@ -888,9 +1423,9 @@ class AutoPlayer:
             # are being opened for the opponent, minimal use
             # of blank tiles, leaving a good vowel/consonant
             # balance on the rack, etc.
-            return (-x.score, x.move.num_covers())
+            return (-x.score, x.move.num_covers()) + position(x.move)
 
-        def keyfunc_firstmove(x: MoveTuple) -> Tuple[int, int]:
+        def keyfunc_firstmove(x: MoveTuple) -> Tuple[int, int, int, int, bool]:
             """Special case for first move:
             Sort moves first by descending score, and in case of ties,
             try to go to the upper half of the board for a more open game
@@ -899,8 +1434,16 @@ class AutoPlayer:
             # not strictly necessary
             m, sc = x
             assert isinstance(m, Move)
-            return (-sc, m.row)
+            return (-sc, m.row) + position(m)
 
+        def word(x: MoveTuple) -> str:
+            """Moves at the same position are ordered by descending word,
+            as in add_placement(). The sorts below are stable."""
+            m = x.move
+            assert isinstance(m, Move)
+            return m.word()
+
+        scored_candidates.sort(key=word, reverse=True)
         # Sort the candidate moves using the appropriate key function
         if self._board.is_empty():
             # First move
@@ -934,6 +1477,9 @@ class AutoPlayer_Custom(AutoPlayer):
     """This subclass of AutoPlayer only plays words
     from a particular vocabulary, if given"""
 
+    # Candidates are filtered by vocabulary, so all of them are needed
+    CANDIDATES_NEEDED = 0
+
     def __init__(self, robot_level: int, state: State, **kwargs: Any) -> None:
         super().__init__(robot_level, state)
         # The number of moves to pick from
@@ -942,10 +1488,10 @@ class AutoPlayer_Custom(AutoPlayer):
         assert self.pick_from > 0
         # The custom vocabulary used by this robot, if any
         custom_vocab = args.get("vocab")
-        self.vocab: Optional[PackedDawgDictionary] = None
+        self.vocab: Optional[WordSet] = None
         if custom_vocab:
             # This robot constrains itself with a custom vocabulary: load it
-            self.vocab = Wordbase.dawg_for_vocab(custom_vocab)
+            self.vocab = Wordbase.robot_vocab(custom_vocab)
         # Flag indicating whether this robot adapts to the score difference in the game
         self.adaptive = args.get("adaptive", False)
         # Ratio of best moves to cut off from the top of the candidate list
@@ -1013,6 +1559,8 @@ class AutoPlayer_MiniMax(AutoPlayer):
     Currently, this is not used in Netskrafl.
     """
 
+    CANDIDATES_NEEDED = 0
+
     def __init__(self, robot_level: int, state: State) -> None:
         super().__init__(robot_level, state)
 
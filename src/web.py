@@ -61,6 +61,7 @@ from skrafluser import User, UserLoginDict
 import firebase
 import billing
 from cache import memcache
+import robotpool
 
 
 # Type definitions
@@ -321,21 +322,56 @@ def main() -> ResponseType:
     return redirect(url_for("web.page"))
 
 
-@web.route("/cache/flush", methods=["GET", "POST"])
-def cache_flush() -> ResponseType:
-    """Flush the Redis cache"""
+def _restricted() -> bool:
+    """Return True if the current request should be refused because it
+    is neither a Google Cloud Scheduler, cron job or Task Queue request,
+    nor made to a local development server"""
     headers: Dict[str, str] = cast(Any, request).headers
-    task_queue_name = headers.get("X-AppEngine-QueueName", "")
-    task_queue = task_queue_name != ""
+    task_queue = headers.get("X-AppEngine-QueueName", "") != ""
     cloud_scheduler = request.environ.get("HTTP_X_CLOUDSCHEDULER", "") == "true"
     cron_job = headers.get("X-Appengine-Cron", "") == "true"
-    if not any((task_queue, cloud_scheduler, cron_job, running_local)):
-        # Only allow bona fide Google Cloud Scheduler or Task Queue requests
+    return not any((task_queue, cloud_scheduler, cron_job, running_local))
+
+
+@web.route("/cache/flush", methods=["GET", "POST"])
+def cache_flush() -> ResponseType:
+    """Flush the Redis cache"""
+    if _restricted():
         return "Restricted URL", 403
     # Flush the cache
     memcache.flush()
     return "<html><body><p>Cache flushed</p></body></html>", 200
 
+
+@web.route("/metrics/dawg", methods=["GET", "POST"])
+def metrics_dawg() -> ResponseType:
+    """Return and log the DAWG navigation metrics of this server process
+    and its robot worker processes, along with the hit rate of their caches
+    of left part tables. Add reset=1 to the query string to zero the
+    counters afterwards."""
+    if _restricted():
+        return "Restricted URL", 403
+    robots = robotpool.metrics(reset=request.args.get("reset", "") == "1")
+    metrics = dict(
+        vocabularies=robots["vocabularies"],
+        left_parts=robots["left_parts"],
+    )
+    logging.info(f"DAWG metrics, pid {os.getpid()}: {metrics}")
+    return jsonify(metrics)
+
+
+@web.route("/metrics/robots", methods=["GET", "POST"])
+def metrics_robots() -> ResponseType:
+    """Return and log the robot move service metrics of this server process,
+    i.e. queue depth, completions, timeouts and generation times, along
+    with the navigation metrics that /metrics/dawg returns"""
+    if _restricted():
+        return "Restricted URL", 403
+    metrics = robotpool.metrics()
+    logging.info(f"Robot metrics, pid {os.getpid()}: {metrics}")
+    return jsonify(metrics)
+
+
 # We only enable the administration routes if running
 # on a local development server, not on the production server
 
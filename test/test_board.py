@@ -0,0 +1,285 @@
+"""
+
+    Tests for Netskrafl
+    Copyright (C) 2023 Miðeind ehf.
+
+    This module tests the incrementally maintained state of the Board
+    in skraflmechanics.py, i.e. its cross-checks, occupancy bit patterns
+    and anchor squares, and the move legality check that builds on them,
+    against straightforward recalculations from the letters on the board.
+
+"""
+
+from typing import List, Optional, Tuple, Union
+
+import sys
+import os
+import pickle
+import random
+
+import pytest
+
+
+# Make sure that we can run this test from the ${workspaceFolder}/test directory
+SRC_PATH = os.path.join(os.path.dirname(__file__), "..", "src")
+sys.path.append(SRC_PATH)
+
+os.environ.setdefault("PROJECT_ID", "explo-dev")
+
+from dawgdictionary import PackedDawgDictionary, Wordbase  # noqa: E402
+from languages import current_alphabet, set_locale, tileset_for_locale  # noqa: E402
+from skraflmechanics import Bag, Board, Cover, Error, Move, State  # noqa: E402
+from skraflplayer import AutoPlayer  # noqa: E402
+
+
+SIZE = Board.SIZE
+
+LegalityResult = Union[int, Tuple[int, str]]
+
+
+@pytest.fixture
+def dawg() -> PackedDawgDictionary:
+    """ The US English vocabulary """
+    set_locale("en_US")
+    try:
+        return Wordbase.dawg_for_vocab("otcwl2014")
+    except KeyError:
+        pytest.skip("The otcwl2014 vocabulary is not available")
+
+
+def covered(board: Board, row: int, col: int) -> bool:
+    """ Is the square within the board and covered? """
+    return 0 <= row < SIZE and 0 <= col < SIZE and board.letter_at(row, col) != " "
+
+
+def letters(board: Board, row: int, col: int, dr: int, dc: int) -> str:
+    """ Return the letters next to a square in the direction (dr, dc),
+        in reading order, by walking the board square by square """
+    result = ""
+    row, col = row + dr, col + dc
+    while covered(board, row, col):
+        ltr = board.letter_at(row, col)
+        result = ltr + result if dr + dc < 0 else result + ltr
+        row, col = row + dr, col + dc
+    return result
+
+
+def ref_crosscheck(
+    board: Board, dawg: PackedDawgDictionary, row: int, col: int, horizontal: bool
+) -> int:
+    """ Calculate the cross-check of a square by trying every letter """
+    if covered(board, row, col):
+        return -1
+    if horizontal:
+        before, after = letters(board, row, col, -1, 0), letters(board, row, col, 1, 0)
+    else:
+        before, after = letters(board, row, col, 0, -1), letters(board, row, col, 0, 1)
+    if not before and not after:
+        return -1
+    alphabet = current_alphabet()
+    bits = 0
+    for ch in alphabet.order:
+        if before + ch + after in dawg:
+            bits |= alphabet.bit_of(ch)
+    return bits
+
+
+def ref_anchors(board: Board) -> List[int]:
+    """ Find the anchor squares by looking at the neighbours of each square """
+    result = [0] * SIZE
+    for row in range(SIZE):
+        for col in range(SIZE):
+            if not covered(board, row, col) and any(
+                covered(board, row + dr, col + dc)
+                for dr, dc in ((-1, 0), (1, 0), (0, -1), (0, 1))
+            ):
+                result[row] |= 1 << col
+    return result
+
+
+def ref_legality(
+    board: Board, dawg: PackedDawgDictionary, covers: List[Cover]
+) -> Tuple[LegalityResult, Optional[Tuple[int, int, bool, str]]]:
+    """ Check the legality of a tile move, square by square, for a player
+        who has the tiles in the rack. Returns the result and, for a legal
+        move, its (row, col, horizontal, word). """
+    if len({c.row for c in covers}) > 1 and len({c.col for c in covers}) > 1:
+        return Error.DISJOINT, None
+    if len(covers) == 1:
+        row, col = covers[0].row, covers[0].col
+        across = letters(board, row, col, 0, -1) + letters(board, row, col, 0, 1)
+        down = letters(board, row, col, -1, 0) + letters(board, row, col, 1, 0)
+        # In the case of a tied length, the move is horizontal
+        horiz = len(across) >= len(down)
+    else:
+        horiz = covers[0].row == covers[1].row
+    dr, dc = (0, 1) if horiz else (1, 0)
+    covers = sorted(covers, key=lambda c: c.col if horiz else c.row)
+    for ix, c in enumerate(covers):
+        if covered(board, c.row, c.col):
+            return Error.SQUARE_ALREADY_OCCUPIED, None
+        if ix > 0:
+            prev = covers[ix - 1]
+            row, col = prev.row + dr, prev.col + dc
+            while (row, col) != (c.row, c.col):
+                if not covered(board, row, col):
+                    return Error.HAS_GAP, None
+                row, col = row + dr, col + dc
+    new = {(c.row, c.col): c.letter for c in covers}
+    row, col = covers[0].row, covers[0].col
+    while covered(board, row - dr, col - dc):
+        row, col = row - dr, col - dc
+    start = (row, col)
+    word = ""
+    while (row, col) in new or covered(board, row, col):
+        word += new.get((row, col)) or board.letter_at(row, col)
+        row, col = row + dr, col + dc
+    if word not in dawg:
+        return (Error.WORD_NOT_IN_DICTIONARY, word), None
+    if board.is_empty():
+        if board.start_square not in new:
+            return Error.FIRST_MOVE_NOT_THROUGH_START, None
+    else:
+        if not any(
+            covered(board, c.row + r, c.col + k)
+            for c in covers
+            for r, k in ((-1, 0), (1, 0), (0, -1), (0, 1))
+        ):
+            return Error.NOT_ADJACENT, None
+        for c in covers:
+            cross = (
+                letters(board, c.row, c.col, -dc, -dr)
+                + c.letter
+                + letters(board, c.row, c.col, dc, dr)
+            )
+            if len(cross) > 1 and cross not in dawg:
+                return (Error.CROSS_WORD_NOT_IN_DICTIONARY, cross), None
+    return Error.LEGAL, (start[0], start[1], horiz, word)
+
+
+def check_board(board: Board, dawg: PackedDawgDictionary) -> None:
+    """ Compare the incrementally maintained state of a board
+        with a recalculation from its letters """
+    for row in range(SIZE):
+        bits = sum(1 << col for col in range(SIZE) if covered(board, row, col))
+        assert board.line_bits(row, True) == bits
+    for col in range(SIZE):
+        bits = sum(1 << row for row in range(SIZE) if covered(board, row, col))
+        assert board.line_bits(col, False) == bits
+    assert board.anchors() == ref_anchors(board)
+    for horizontal in (True, False):
+        cc = board.crosschecks(dawg, horizontal)
+        # A fresh board with the same letters calculates all its cross-checks
+        fresh = Board()
+        for row, col, _, letter in board.enum_tiles():
+            fresh.set_letter(row, col, letter)
+        assert cc == fresh.crosschecks(dawg, horizontal)
+        for row in range(SIZE):
+            for col in range(SIZE):
+                assert cc[row * SIZE + col] == ref_crosscheck(
+                    board, dawg, row, col, horizontal
+                ), (row, col, horizontal)
+
+
+def random_move(rng: random.Random, rack: str, ix: int) -> Move:
+    """ Create a random tile move from the rack, mostly within one line """
+    move = Move("", 0, 0)
+    horiz = rng.random() < 0.5
+    line = rng.randrange(SIZE)
+    n = rng.randint(1, min(4, len(rack)))
+    positions = sorted(rng.sample(range(SIZE), n))
+    for tile, pos in zip(rng.sample(rack, n), positions):
+        row, col = (line, pos) if horiz else (pos, line)
+        if ix % 10 == 0:
+            # Occasionally scatter the tiles
+            row, col = rng.randrange(SIZE), rng.randrange(SIZE)
+        move.add_cover(row, col, tile, "e" if tile == "?" else tile)
+    return move
+
+
+def check_legality(state: State, dawg: PackedDawgDictionary, move: Move) -> None:
+    """ Compare Move.check_legality() with ref_legality() """
+    covers = list(move._covers)  # pylint: disable=protected-access
+    expected, placement = ref_legality(state.board(), dawg, covers)
+    assert move.check_legality(state) == expected, [str(c) for c in covers]
+    if placement is not None:
+        assert (move.row, move.col, move.horizontal, move.word()) == placement
+
+
+def play_game(seed: int, dawg: PackedDawgDictionary) -> None:
+    """ Play a robot game, checking the board and a number of
+        random moves in every position """
+    rng = random.Random(seed)
+    Bag.RNG = random.Random(seed)
+    state = State(tileset=tileset_for_locale("en_US"), locale="en_US")
+    while not state.is_game_over():
+        check_board(state.board(), dawg)
+        rack = state.player_rack().contents()
+        for ix in range(20):
+            check_legality(state, dawg, random_move(rng, rack, ix))
+        move = AutoPlayer.create(state).generate_move()
+        if isinstance(move, Move):
+            # Check the robot's move as well, with its covers in reverse order
+            replay = Move("", 0, 0)
+            for c in reversed(move._covers):  # pylint: disable=protected-access
+                replay.add_cover(c.row, c.col, c.tile, c.letter)
+            check_legality(state, dawg, replay)
+        state.apply_move(move)
+    check_board(state.board(), dawg)
+
+
+@pytest.mark.parametrize("seed", [1, 2])
+def test_robot_games(dawg: PackedDawgDictionary, seed: int) -> None:
+    play_game(seed, dawg)
+
+
+def test_random_letters(dawg: PackedDawgDictionary) -> None:
+    """ Set and clear letters at random, including on squares next to
+        each other, checking the board after every change """
+    rng = random.Random(0)
+    board = Board()
+    board.crosschecks(dawg, True)
+    for _ in range(300):
+        row, col = rng.randrange(SIZE), rng.randrange(SIZE)
+        if covered(board, row, col) and rng.random() < 0.3:
+            board.set_letter(row, col, " ")
+            board.set_tile(row, col, " ")
+        else:
+            letter = rng.choice("aeinrst" if rng.random() < 0.7 else "bcdgklmopuy")
+            board.set_letter(row, col, letter)
+            board.set_tile(row, col, letter)
+        check_board(board, dawg)
+
+
+def test_pickle(dawg: PackedDawgDictionary) -> None:
+    """ A pickled board leaves out its cross-checks, which are
+        recalculated from its letters after unpickling """
+    rng = random.Random(3)
+    Bag.RNG = random.Random(3)
+    state = State(tileset=tileset_for_locale("en_US"), locale="en_US")
+    for _ in range(8):
+        if state.is_game_over():
+            break
+        state.apply_move(AutoPlayer.create(state).generate_move())
+    board = state.board()
+    # Make sure that the board has calculated and cached state to leave out
+    board.crosschecks(dawg, True)
+    board.anchors()
+    row, col = rng.choice([
+        (r, c)
+        for r in range(SIZE)
+        for c in range(SIZE)
+        if not covered(board, r, c) and board.has_adjacent(r, c)
+    ])
+    board.set_letter(row, col, "e")
+    board.set_tile(row, col, "e")
+    assert board.__getstate__()["_cc_dawg"] is None
+    copy = pickle.loads(pickle.dumps(state)).board()
+    assert [copy.letter_at(r, c) for r in range(SIZE) for c in range(SIZE)] == [
+        board.letter_at(r, c) for r in range(SIZE) for c in range(SIZE)
+    ]
+    assert copy.contents_hash() == board.contents_hash()
+    check_board(copy, dawg)
+    for horizontal in (True, False):
+        assert copy.crosschecks(dawg, horizontal) == board.crosschecks(dawg, horizontal)
+    assert copy.anchors() == board.anchors()
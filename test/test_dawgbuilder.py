@@ -0,0 +1,71 @@
+"""
+
+    Tests for Netskrafl
+    Copyright (C) 2023 Miðeind ehf.
+
+    This module tests that the streaming graph builder in
+    utils/dawgbuilder.py produces exactly the same packed output
+    as the original trie-based builder.
+
+"""
+
+from typing import List
+
+import sys
+import os
+
+import pytest
+
+
+# Make sure that we can run this test from the ${workspaceFolder}/test directory
+BASE_PATH = os.path.join(os.path.dirname(__file__), "..")
+sys.path.append(os.path.join(BASE_PATH, "utils"))
+sys.path.append(os.path.join(BASE_PATH, "src"))
+
+os.environ.setdefault("PROJECT_ID", "explo-dev")
+
+from dawgbuilder import DawgBuilder  # noqa: E402
+from languages import current_alphabet, set_locale  # noqa: E402
+
+
+WORD_LIST = os.path.join(BASE_PATH, "resources", "otcwl2014.txt")
+
+
+@pytest.fixture
+def words() -> List[str]:
+    """ A sample of the English word list, still in ascending order """
+    if not os.path.exists(WORD_LIST):
+        pytest.skip("The otcwl2014 word list is not available")
+    set_locale("en_US")
+    with open(WORD_LIST, "r", encoding="utf-8") as f:
+        all_words = [w for w in (line.strip() for line in f) if w]
+    # A dense run of words with long shared prefixes,
+    # and a sparse sample over the rest of the alphabet
+    return sorted(
+        set(all_words[:3000] + all_words[3000::40]),
+        key=current_alphabet().sortkey,
+    )
+
+
+def build(
+    relpath: str, output: str, streaming: bool, gaddag: bool = False
+) -> bytes:
+    """ Build a graph from words.txt in relpath and return the output file """
+    db = DawgBuilder(
+        encoding=current_alphabet().order, gaddag=gaddag, streaming=streaming
+    )
+    db.build(["words.txt"], output, relpath=relpath)
+    fname = output + (".gaddag" if gaddag else "") + ".bin.dawg"
+    with open(os.path.join(relpath, fname), "rb") as f:
+        return f.read()
+
+
+@pytest.mark.parametrize("gaddag", [False, True])
+def test_streaming_builder(tmp_path, words: List[str], gaddag: bool) -> None:
+    relpath = str(tmp_path)
+    with open(os.path.join(relpath, "words.txt"), "w", encoding="utf-8") as f:
+        f.write("\n".join(words) + "\n")
+    trie = build(relpath, "trie", streaming=False, gaddag=gaddag)
+    streamed = build(relpath, "streamed", streaming=True, gaddag=gaddag)
+    assert len(trie) > 0
+    assert streamed == trie
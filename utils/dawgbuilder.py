@@ -102,11 +102,89 @@
             })
         }
 
+    Binary file header:
+
+    The packed binary graph in a .bin.dawg file (see _BinaryDawgPacker)
+    is followed by a header with metadata about the graph, encoded as
+    UTF-8 JSON: the header version, the alphabet coding, whether the graph
+    is a GADDAG, the size and CRC-32 checksum of the packed graph, the
+    numbers of nodes, edges and words, and the two-letter words sorted
+    by first and by second letter. The JSON is followed by its length
+    in bytes (DWORD) and an 8-byte marker, DAWG_HEADER_MAGIC, at the
+    very end of the file. The header is validated when the graph is loaded.
+
+    GADDAG:
+
+    DawgBuilder can alternatively emit a GADDAG (Gordon, 1994) for a
+    vocabulary, using the same packed binary format. For each word
+    w of length n, the GADDAG contains the n strings
+
+        rev(w[:i]) + SEPARATOR + w[i:]  for i in 1..n-1, and
+        rev(w)
+
+    where SEPARATOR is coded as the letter index following the last
+    letter of the alphabet. Starting from any letter of a word, the
+    graph thus allows the word to be traced leftwards to its
+    beginning and then, after the separator, rightwards to its end.
+    The output file is named <vocabulary>.gaddag.bin.dawg.
+
+    Anagram index:
+
+    Optionally, DawgBuilder also writes an anagram index for a vocabulary,
+    named <vocabulary>.anagrams and stored next to the .bin.dawg file.
+    It is a UTF-8 text file. The first line is a header:
+
+        anagrams 1 <number of words> <number of signatures>
+
+    followed by the words of the vocabulary, one per line, in sorted
+    order. A word's ID is its index in this list. Then follows one line
+    per signature, i.e. the letters of a word sorted by code point:
+
+        <signature> <word ID> [<word ID> ...]
+
+    listing the IDs of all words that consist of exactly those letters.
+    The index is read by the AnagramIndex class in dawgdictionary.py.
+
+    Vocabulary subsets:
+
+    A robot vocabulary, whose words are all in a main vocabulary, can
+    be written as a bit set over the main vocabulary's words instead of
+    as a separate graph. A word's index is its position in the sorted
+    main vocabulary, as computed by PackedDawgDictionary.word_index().
+    The output file is named <vocabulary>.bits and contains a header of
+    two little-endian uint32s, the number of words in the main vocabulary
+    and the number of words in the subset, followed by the bit set,
+    least significant bit first. It is read by the VocabularySubset
+    class in dawgdictionary.py.
+
+    Build pipeline:
+
+    Run this module with one or more task names, or 'all', as arguments
+    (see BUILD_TASKS). Independent tasks are run in parallel in a pool of
+    worker processes (-j sets the number of workers), and a task is started
+    as soon as the tasks producing its inputs are complete. A task whose
+    outputs exist is skipped if a hash of its input files and of the code
+    that builds it is unchanged since the last build, as recorded in
+    resources/dawgbuilder.manifest.json; -f forces a rebuild. Timings for
+    each task, and for each stage of every build within it, are printed.
+
 """
 
 from __future__ import annotations
 
-from typing import Any, Callable, Dict, List, Optional, Set, Tuple, TypedDict
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+    TypedDict,
+    Union,
+)
 
 import os
 import sys
@@ -115,7 +193,13 @@ import time
 import binascii
 import struct
 import io
+import json
 import functools
+import contextlib
+import hashlib
+import inspect
+import traceback
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
 
 base_path = os.path.dirname(__file__)  # Assumed to be in the /utils directory
 
@@ -141,6 +225,15 @@ NodeTuple = Tuple[str, Optional["_DawgNode"]]
 MAXLEN = 48  # Longest possible word to be processed
 WORD_MAXLEN = 15  # Longest possible word in a game vocabulary
 COMMON_MAXLEN = 12  # Longest words in common word list used by weakest robot
+# Separator between the reversed prefix and the suffix of GADDAG strings.
+# This is the wildcard character, which is never part of a word and
+# which sorts after all letters in Alphabet.sortkey().
+GADDAG_SEPARATOR = "?"
+# Version of the header that follows the packed graph in .bin.dawg files,
+# and the marker at the very end of the file that identifies the header.
+# These must match the corresponding definitions in src/dawgdictionary.py.
+DAWG_HEADER_VERSION = 1
+DAWG_HEADER_MAGIC = b"DAWGHDR\x00"
 
 class _DawgNode:
 
@@ -465,6 +558,184 @@ class _Dawg:
                 stream.write(node.__str__() + "\n")
 
 
+class _OpenNode:
+
+    """A node of a _StreamingDawg that is on the path of the most
+    recently added word, or a child of such a node, and whose edges
+    may therefore still change"""
+
+    __slots__ = ("final", "edges")
+
+    def __init__(self) -> None:
+        self.final = False
+        # List of (prefix, child) tuples, where the children are _OpenNodes
+        # until this node is finished, and then become next node ids
+        self.edges: List[Tuple[str, Any]] = []
+
+
+# A finished node of a _StreamingDawg, as a string in the format of the
+# lines of the text output file: ['|_'] prefix ':' nextnode ['_' prefix ':' nextnode]*
+# where a nextnode of zero means that there is no next node
+FrozenNode = str
+
+
+class _StreamingDawg:
+
+    """A DAWG that is minimized incrementally as sorted words stream in,
+    in the manner of Daciuk et al. Only the nodes along the path of the
+    most recently added word, and their children, are mutable _OpenNode
+    objects. When a node leaves the path, its children are replaced by the
+    ids of equivalent nodes in a register of unique nodes. Each unique node
+    is stored as a single compact string (see FrozenNode), which also serves
+    as its register key. Memory use is thus bounded by the size of the
+    minimized graph, at a fraction of the cost of _DawgNode objects.
+
+    Nodes with a single outgoing edge are merged into multi-letter prefixes
+    in the same way, and in the same order, as in _Dawg, so the resulting
+    graph and its node numbering are identical to those of _Dawg.
+    """
+
+    def __init__(self) -> None:
+        self._lastword = ""
+        # The path of the most recently added word, starting with the root
+        self._path: List[_OpenNode] = [_OpenNode()]
+        # The edges out of the root, once the graph is finished
+        self._root: List[Tuple[str, int]] = []
+        # The unique nodes, in order of their ids, which start at 2
+        self._nodes: List[FrozenNode] = []
+        self._register: Dict[FrozenNode, int] = dict()
+
+    def _freeze(self, prefix: str, node: _OpenNode) -> Tuple[str, int]:
+        """Return the edge to a finished node, as a (prefix, id) tuple,
+        registering the node if an equivalent one does not exist"""
+        edges = node.edges
+        if not edges:
+            # A final node without outgoing edges: there is no next node
+            return prefix, 0
+        if len(edges) == 1:
+            # Merge the single outgoing edge into the incoming one
+            tail, ident = edges[0]
+            return prefix + ("|" if node.final else "") + tail, ident
+        frozen = ("|_" if node.final else "") + "_".join(
+            p + ":" + str(i) for p, i in edges
+        )
+        ident = self._register.get(frozen)
+        if ident is None:
+            ident = len(self._nodes) + 2
+            self._register[frozen] = ident
+            self._nodes.append(frozen)
+        return prefix, ident
+
+    def _finish(self, node: _OpenNode) -> None:
+        """Freeze the children of a node that is leaving the path"""
+        freeze = self._freeze
+        node.edges = [freeze(prefix, child) for prefix, child in node.edges]
+
+    def add_word(self, wrd: str) -> None:
+        """Add a word to the DAWG. Words are expected to arrive in sorted order."""
+        lenword = len(wrd)
+        if lenword >= MAXLEN:
+            raise ValueError(
+                "Word exceeds maximum length of {0} letters".format(MAXLEN)
+            )
+        # See how many letters we have in common with the last word
+        last = self._lastword
+        common = min(lenword, len(last))
+        i = 0
+        while i < common and wrd[i] == last[i]:
+            i += 1
+        # Finish the nodes that are leaving the path, deepest first
+        path = self._path
+        for j in range(len(path) - 1, i, -1):
+            self._finish(path[j])
+        del path[i + 1 :]
+        if i == lenword:
+            # Nothing to add
+            return
+        # Add the divergent rest of the word
+        node = path[i]
+        while i < lenword:
+            child = _OpenNode()
+            node.edges.append((wrd[i], child))
+            path.append(child)
+            node = child
+            i += 1
+        node.final = True
+        self._lastword = wrd
+
+    def finish(self) -> None:
+        """Complete the minimization of the graph"""
+        path = self._path
+        for j in range(len(path) - 1, -1, -1):
+            self._finish(path[j])
+        self._root = path[0].edges
+        self._path = [_OpenNode()]
+        self._lastword = ""
+        # The register is no longer needed
+        self._register = dict()
+
+    @staticmethod
+    def _sorted(edges: Iterable[Tuple[str, int]]) -> List[Tuple[str, int]]:
+        """Return a list of edges sorted by prefix"""
+        sortkey = current_alphabet().sortkey
+        return sorted(edges, key=lambda x: sortkey(x[0]))
+
+    @staticmethod
+    def _thaw(frozen: FrozenNode) -> Tuple[bool, List[Tuple[str, int]]]:
+        """Return the final flag and the list of edges of a unique node"""
+        final = frozen.startswith("|_")
+        if final:
+            frozen = frozen[2:]
+        edges: List[Tuple[str, int]] = []
+        for edge in frozen.split("_"):
+            prefix, ident = edge.split(":")
+            edges.append((prefix, int(ident)))
+        return final, edges
+
+    def num_unique_nodes(self) -> int:
+        """Count the total number of unique nodes in the graph"""
+        return len(self._nodes)
+
+    def num_edges(self) -> int:
+        """Count the total number of edges between unique nodes in the graph"""
+        return sum(frozen.count(":") for frozen in self._nodes)
+
+    def num_edge_chars(self) -> int:
+        """Count the total number of edge prefix letters in the graph"""
+        return sum(
+            len(prefix) - prefix.count("|")
+            for frozen in self._nodes
+            for prefix, _ in self._thaw(frozen)[1]
+        )
+
+    def write_packed(self, packer: "_BinaryDawgPacker") -> None:
+        """Write the minimized DAWG to a packer"""
+        packer.start(len(self._root))
+        for prefix, ident in self._sorted(self._root):
+            packer.edge(ident, prefix)
+        for ident, frozen in enumerate(self._nodes, start=2):
+            final, edges = self._thaw(frozen)
+            packer.node_start(ident, final, len(edges))
+            for prefix, nextid in self._sorted(edges):
+                packer.edge(nextid, prefix)
+            packer.node_end(ident)
+        packer.finish()
+
+    def write_text(self, stream: io.TextIOWrapper) -> None:
+        """Write the minimized DAWG to a text stream"""
+        print("Output graph has {0} nodes".format(len(self._nodes)))
+
+        def stringify(edges: Iterable[Tuple[str, int]]) -> str:
+            return "_".join(
+                prefix + ":" + str(ident) for prefix, ident in self._sorted(edges)
+            )
+
+        stream.write(stringify(self._root) + "\n")
+        for frozen in self._nodes:
+            final, edges = self._thaw(frozen)
+            stream.write(("|_" if final else "") + stringify(edges) + "\n")
+
+
 class _BinaryDawgPacker:
 
     """_BinaryDawgPacker packs the DAWG data to a byte stream.
@@ -492,6 +763,10 @@ class _BinaryDawgPacker:
                                 coded as an index into AÁBDÐEÉFGHIÍJKLMNOÓPRSTUÚVXYÝÞÆÖ
             DWORD Offset of child node
 
+    The graph is followed by a header (see DawgBuilder._output_binary()),
+    which is placed at the end of the file so that node offsets are
+    unaffected by it and the root node remains at offset 0.
+
     """
 
     BYTE = struct.Struct("<B")
@@ -506,10 +781,14 @@ class _BinaryDawgPacker:
         # located
         self._fixups: Dict[int, List[int]] = dict()
         self._encoding = encoding
+        # The number of nodes (including the root) and edges written
+        self.num_nodes = 0
+        self.num_edges = 0
 
     def start(self, num_root_edges: int) -> None:
         """Write a starting byte with the number of root edges"""
         self._stream.write(self.BYTE.pack(num_root_edges))
+        self.num_nodes += 1
 
     def node_start(self, ident: int, final: bool, num_edges: int) -> None:
         """Start a new node in the binary buffer"""
@@ -525,6 +804,7 @@ class _BinaryDawgPacker:
             del self._fixups[ident]
         # Remember where we put this node
         self._locs[ident] = pos
+        self.num_nodes += 1
         stream.write(self.BYTE.pack((0x80 if final else 0x00) | (num_edges & 0x7F)))
 
     def node_end(self, ident: int) -> None:
@@ -535,6 +815,7 @@ class _BinaryDawgPacker:
         """Write an edge into the binary buffer"""
         b = bytearray()
         stream = self._stream
+        self.num_edges += 1
         for c in prefix:
             if c == "|":
                 b[-1] |= 0x80
@@ -606,10 +887,31 @@ class DawgBuilder:
     processing to appear as one aggregated and sorted word list.
     """
 
-    def __init__(self, encoding: str) -> None:
-        self._dawg: Optional[_Dawg] = None
-        self._encoding = encoding
+    def __init__(
+        self,
+        encoding: str,
+        gaddag: bool = False,
+        anagrams: bool = False,
+        subset_of: Optional[str] = None,
+        streaming: bool = True,
+    ) -> None:
+        self._dawg: Optional[Union[_Dawg, _StreamingDawg]] = None
+        # Build the graph with _StreamingDawg rather than with the _Dawg trie?
+        self._streaming = streaming
+        self._gaddag = gaddag
+        self._anagrams = anagrams
+        # The main vocabulary, if the output is also to be written as a subset of it
+        self._subset_of = subset_of
+        # The accepted words, if needed for a GADDAG, an anagram index or a subset
+        self._words: List[str] = []
+        # The two-letter words and the total number of words, for the file header
+        self._two_letter: List[str] = []
+        self._word_count = 0
         self._alphabet = set(encoding)
+        if gaddag:
+            # The separator is coded as the letter following the alphabet
+            encoding += GADDAG_SEPARATOR
+        self._encoding = encoding
 
     class _InFile:
         """InFile represents a single sorted input file."""
@@ -733,7 +1035,13 @@ class DawgBuilder:
         be merged in sorted order in the load process. Words found
         in the removals file will be removed from the output.
         """
-        self._dawg = _Dawg()
+        self._dawg = _StreamingDawg() if self._streaming else _Dawg()
+        # When building a GADDAG, an anagram index or a subset,
+        # the accepted words are collected here
+        collect = self._gaddag or self._anagrams or self._subset_of is not None
+        words: List[str] = []
+        # The two-letter words, for the header of the output file
+        two_letter: List[str] = []
         # Total number of words read from input files
         incount = 0
         # Total number of words written to output file
@@ -829,8 +1137,14 @@ class DawgBuilder:
                         "not in the expected alphabet".format(word)
                     )
                 else:
-                    # Not a word to be removed: add it to the graph
-                    self._dawg.add_word(word)
+                    # Not a word to be removed: add it to the graph,
+                    # unless this is a GADDAG, which is built at the end
+                    if collect:
+                        words.append(word)
+                    if len(word) == 2:
+                        two_letter.append(word)
+                    if not self._gaddag:
+                        self._dawg.add_word(word)
                     outcount += 1
                 lastword = word
                 lastkey = key
@@ -844,6 +1158,11 @@ class DawgBuilder:
         for f in infiles:
             assert not f.has_word()
             f.close()
+        if self._gaddag:
+            self._add_gaddag_strings(words)
+        self._words = words
+        self._two_letter = two_letter
+        self._word_count = outcount
         # Complete and clean up
         self._dawg.finish()
         print(
@@ -852,6 +1171,44 @@ class DawgBuilder:
             )
         )
 
+    def _add_gaddag_strings(self, words: List[str]) -> None:
+        """Add the GADDAG strings of all the given words to the graph"""
+        assert self._dawg is not None
+        sep = GADDAG_SEPARATOR
+        strings: List[str] = []
+        for w in words:
+            strings.append(w[::-1])
+            for i in range(1, len(w)):
+                strings.append(w[i - 1 :: -1] + sep + w[i:])
+        print("Adding {0} GADDAG strings".format(len(strings)))
+        # The graph only requires that strings sharing a prefix
+        # arrive consecutively, so plain code point order will do
+        strings.sort()
+        add_word = self._dawg.add_word
+        for gs in strings:
+            add_word(gs)
+
+    def _header(self, graph: bytes, packer: _BinaryDawgPacker) -> bytes:
+        """Return the header that follows the packed graph in the output file.
+        It consists of the metadata as UTF-8 encoded JSON, followed by
+        the length of the JSON in bytes (DWORD) and an 8-byte magic marker."""
+        sortkey = current_alphabet().sortkey
+        tw0 = self._two_letter
+        tw1 = sorted(tw0, key=lambda w: sortkey(w[1] + w[0]))
+        meta: Dict[str, Any] = {
+            "version": DAWG_HEADER_VERSION,
+            "alphabet": self._encoding,
+            "gaddag": self._gaddag,
+            "size": len(graph),
+            "crc32": binascii.crc32(graph),
+            "nodes": packer.num_nodes,
+            "edges": packer.num_edges,
+            "words": self._word_count,
+            "two_letter": [tw0, tw1],
+        }
+        js = json.dumps(meta, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        return js + struct.pack("<L", len(js)) + DAWG_HEADER_MAGIC
+
     def _output_binary(self, relpath: str, output: str) -> None:
         """Write the DAWG to a flattened binary output file with extension '.dawg'"""
         assert self._dawg is not None
@@ -860,12 +1217,64 @@ class DawgBuilder:
         p = _BinaryDawgPacker(f, self._encoding)
         # Write the tree using the packer
         self._dawg.write_packed(p)
-        # Write packed DAWG to binary file
+        graph = f.getvalue()
+        f.close()
+        # Write packed DAWG to binary file, followed by its header
+        if self._gaddag:
+            output += ".gaddag"
         with open(
             os.path.abspath(os.path.join(relpath, output + ".bin.dawg")), "wb"
         ) as of:
-            of.write(f.getvalue())
-        f.close()
+            of.write(graph)
+            of.write(self._header(graph, p))
+
+    def _output_anagrams(self, relpath: str, output: str) -> None:
+        """Write an anagram index of the words to a file with extension '.anagrams'"""
+        index: Dict[str, List[int]] = dict()
+        for ix, word in enumerate(self._words):
+            index.setdefault("".join(sorted(word)), []).append(ix)
+        fname = os.path.abspath(os.path.join(relpath, output + ".anagrams"))
+        with open(fname, "w", encoding="utf-8", newline="\n") as fout:
+            fout.write(
+                "anagrams 1 {0} {1}\n".format(len(self._words), len(index))
+            )
+            for word in self._words:
+                fout.write(word + "\n")
+            for signature in sorted(index):
+                fout.write(
+                    signature + " " + " ".join(str(i) for i in index[signature]) + "\n"
+                )
+        print(
+            "Anagram index has {0} signatures for {1} words".format(
+                len(index), len(self._words)
+            )
+        )
+
+    def _output_subset(self, relpath: str, output: str) -> None:
+        """Write the words as a bit set over the words of the main vocabulary,
+        to a file with extension '.bits'"""
+        from dawgdictionary import PackedDawgDictionary
+
+        assert self._subset_of is not None
+        main = PackedDawgDictionary(current_alphabet())
+        main.load(os.path.abspath(os.path.join(relpath, self._subset_of + ".bin.dawg")))
+        total = main.word_count()
+        bits = bytearray((total + 7) // 8)
+        count = 0
+        for word in self._words:
+            ix = main.word_index(word)
+            if ix is None:
+                # Not in the main vocabulary, so a robot could never play it anyway
+                continue
+            bits[ix >> 3] |= 1 << (ix & 7)
+            count += 1
+        fname = os.path.abspath(os.path.join(relpath, output + ".bits"))
+        with open(fname, "wb") as fout:
+            fout.write(struct.pack("<LL", total, count))
+            fout.write(bits)
+        print(
+            "Subset has {0} of {1} words in {2}".format(count, total, self._subset_of)
+        )
 
     def _output_text(self, relpath: str, output: str) -> None:
         """Write the DAWG to a text output file with extension '.text.dawg'"""
@@ -899,12 +1308,25 @@ class DawgBuilder:
             # Nothing to do
             print("No inputs or no output: Nothing to do")
             return
+        t0 = time.time()
         self._load(relpath, inputs, removals, word_filter, input_filter)
+        t1 = time.time()
+        print("Loading took {0:.2f} seconds".format(t1 - t0))
         # print("Dumping...")
         # self._dawg.dump()
         print("Outputting...")
         # self._output_text(relpath, output)
         self._output_binary(relpath, output)
+        t0, t1 = t1, time.time()
+        print("Binary output took {0:.2f} seconds".format(t1 - t0))
+        if self._anagrams:
+            self._output_anagrams(relpath, output)
+            t0, t1 = t1, time.time()
+            print("Anagram index output took {0:.2f} seconds".format(t1 - t0))
+        if self._subset_of is not None:
+            self._output_subset(relpath, output)
+            t0, t1 = t1, time.time()
+            print("Subset output took {0:.2f} seconds".format(t1 - t0))
         print("DawgBuilder done")
 
 
@@ -968,7 +1390,7 @@ def run_otcwl2014() -> None:
     print("Starting DAWG build for otcwl2014.txt")
     # Set the English-United States locale
     set_locale("en_US")
-    db = DawgBuilder(encoding=current_alphabet().order)
+    db = DawgBuilder(encoding=current_alphabet().order, anagrams=True)
     t0 = time.time()
     db.build(
         ["otcwl2014.txt"],  # Input files to be merged
@@ -985,7 +1407,7 @@ def run_sowpods() -> None:
     print("Starting DAWG build for sowpods.txt")
     # Set the English-GB locale
     set_locale("en_GB")
-    db = DawgBuilder(encoding=current_alphabet().order)
+    db = DawgBuilder(encoding=current_alphabet().order, anagrams=True)
     t0 = time.time()
     db.build(
         ["sowpods.txt"],  # Input files to be merged
@@ -1039,6 +1461,38 @@ def run_nsf2023() -> None:
     print("Build took {0:.2f} seconds".format(t1 - t0))
 
 
+def _build_gaddag(locale: str, vocab: str) -> None:
+    """Build a GADDAG for a vocabulary, for use in robot move generation
+    (see DAWG_GADDAG in src/config.py)"""
+    print("Starting GADDAG build for {0}.txt".format(vocab))
+    set_locale(locale)
+    db = DawgBuilder(encoding=current_alphabet().order, gaddag=True)
+    t0 = time.time()
+    db.build(
+        [vocab + ".txt"],  # Input files to be merged
+        vocab,  # Output file - full name will be <vocab>.gaddag.bin.dawg
+    )
+    t1 = time.time()
+    print("Build took {0:.2f} seconds".format(t1 - t0))
+
+
+def run_otcwl2014_gaddag() -> None:
+    """Build a GADDAG for the en_US vocabulary"""
+    _build_gaddag("en_US", "otcwl2014")
+
+
+def run_sowpods_gaddag() -> None:
+    """Build a GADDAG for the en_GB vocabulary"""
+    _build_gaddag("en_GB", "sowpods")
+
+
+def run_english_gaddags() -> None:
+    """Build GADDAGs for the English vocabularies, for use in
+    robot move generation (see DAWG_GADDAG in src/config.py)"""
+    run_otcwl2014_gaddag()
+    run_sowpods_gaddag()
+
+
 def run_norwegian_filter() -> None:
     """Read list of frequent Norwegian words, filter them by the
     vocabulary and add them
@@ -1162,7 +1616,7 @@ def run_skrafl() -> None:
     # Process Miðlungur vocabulary
 
     print("Starting DAWG build for Miðlungur")
-    db = DawgBuilder(encoding=current_alphabet().order)
+    db = DawgBuilder(encoding=current_alphabet().order, subset_of="ordalisti")
     t0 = time.time()
     # "isl"/"is_IS" specifies Icelandic sorting order - modify this for other languages
     db.build(
@@ -1177,7 +1631,7 @@ def run_skrafl() -> None:
     # Process Amlóði vocabulary
 
     print("Starting DAWG build for Amlóði")
-    db = DawgBuilder(encoding=current_alphabet().order)
+    db = DawgBuilder(encoding=current_alphabet().order, subset_of="ordalisti")
     t0 = time.time()
     # "isl"/"is_IS" specifies Icelandic sorting order - modify this for other languages
     db.build(
@@ -1378,7 +1832,7 @@ def run_english_robot_vocabs() -> None:
     set_locale("en_US")
 
     print("Starting DAWG build for Sif/otcwl2014")
-    db = DawgBuilder(encoding=current_alphabet().order)
+    db = DawgBuilder(encoding=current_alphabet().order, subset_of="otcwl2014")
     t0 = time.time()
     db.build(
         ["otcwl2014.aml.sorted.txt"],  # Input files to be merged
@@ -1389,7 +1843,7 @@ def run_english_robot_vocabs() -> None:
     print("Build took {0:.2f} seconds".format(t1 - t0))
 
     print("Starting DAWG build for Frigg/otcwl2014")
-    db = DawgBuilder(encoding=current_alphabet().order)
+    db = DawgBuilder(encoding=current_alphabet().order, subset_of="otcwl2014")
     t0 = time.time()
     db.build(
         ["otcwl2014.mid.sorted.txt"],  # Input files to be merged
@@ -1402,7 +1856,7 @@ def run_english_robot_vocabs() -> None:
     set_locale("en_GB")
 
     print("Starting DAWG build for Sif/sowpods")
-    db = DawgBuilder(encoding=current_alphabet().order)
+    db = DawgBuilder(encoding=current_alphabet().order, subset_of="sowpods")
     t0 = time.time()
     db.build(
         ["sowpods.aml.sorted.txt"],  # Input files to be merged
@@ -1413,7 +1867,7 @@ def run_english_robot_vocabs() -> None:
     print("Build took {0:.2f} seconds".format(t1 - t0))
 
     print("Starting DAWG build for Frigg/sowpods")
-    db = DawgBuilder(encoding=current_alphabet().order)
+    db = DawgBuilder(encoding=current_alphabet().order, subset_of="sowpods")
     t0 = time.time()
     db.build(
         ["sowpods.mid.sorted.txt"],  # Input files to be merged
@@ -1431,7 +1885,7 @@ def run_polish_robot_vocabs() -> None:
     set_locale("pl")
 
     print("Starting DAWG build for Zofia/osps37")
-    db = DawgBuilder(encoding=current_alphabet().order)
+    db = DawgBuilder(encoding=current_alphabet().order, subset_of="osps37")
     t0 = time.time()
     db.build(
         ["polish_top_30000.txt"],  # Input files to be merged
@@ -1442,7 +1896,7 @@ def run_polish_robot_vocabs() -> None:
     print("Build took {0:.2f} seconds".format(t1 - t0))
 
     print("Starting DAWG build for Idek/osps37")
-    db = DawgBuilder(encoding=current_alphabet().order)
+    db = DawgBuilder(encoding=current_alphabet().order, subset_of="osps37")
     t0 = time.time()
     db.build(
         ["polish_top_60000.txt"],  # Input files to be merged
@@ -1460,7 +1914,7 @@ def run_norwegian_robot_vocabs() -> None:
     set_locale("nb_NO")
 
     print("Starting DAWG build for Sif/nsf2023")
-    db = DawgBuilder(encoding=current_alphabet().full_order)
+    db = DawgBuilder(encoding=current_alphabet().full_order, subset_of="nsf2023")
     t0 = time.time()
     db.build(
         ["norwegian_top_20000.txt"],  # Input files to be merged
@@ -1471,7 +1925,7 @@ def run_norwegian_robot_vocabs() -> None:
     print("Build took {0:.2f} seconds".format(t1 - t0))
 
     print("Starting DAWG build for Frigg/nsf2023")
-    db = DawgBuilder(encoding=current_alphabet().full_order)
+    db = DawgBuilder(encoding=current_alphabet().full_order, subset_of="nsf2023")
     t0 = time.time()
     db.build(
         ["norwegian_top_32500.txt"],  # Input files to be merged
@@ -1482,48 +1936,342 @@ def run_norwegian_robot_vocabs() -> None:
     print("Build took {0:.2f} seconds".format(t1 - t0))
 
 
-if __name__ == "__main__":
-
-    print(f"DawgBuilder - project {os.environ['PROJECT_ID']}")
-
-    ALL_TASKS = [
-        run_icelandic_filter,  # Remove rare Icelandic words from robot vocabularies
-        run_skrafl,  # Icelandic
-        run_osps37,  # Polish
-        run_nsf2023,  # Norwegian
-        # run_twl06,
-        run_otcwl2014,  # en_US
-        run_sowpods,  # en_GB
+class BuildTask(NamedTuple):
+
+    """A task in the build pipeline. The inputs and outputs are file
+    names in the resources directory. A task is started only when the
+    tasks listed in 'after' (if selected for the same run) are complete."""
+
+    func: Callable[[], None]
+    inputs: Tuple[str, ...]
+    outputs: Tuple[str, ...]
+    after: Tuple[str, ...] = ()
+
+    @property
+    def name(self) -> str:
+        return self.func.__name__[4:]
+
+
+# All build tasks, in an order where each task comes after its prerequisites
+BUILD_TASKS: List[BuildTask] = [
+    # Remove rare Icelandic words from robot vocabularies
+    BuildTask(
+        run_icelandic_filter,
+        ("ordalisti.aml.sorted.txt",),
+        ("ordalisti.aml.filtered.txt",),
+    ),
+    # Icelandic
+    BuildTask(
+        run_skrafl,
+        (
+            "ordalisti.full.sorted.txt",
+            "ordalisti.mid.sorted.txt",
+            "ordalisti.aml.filtered.txt",
+            "ordalisti.add.txt",
+            "ordalisti.remove.txt",
+        ),
+        (
+            "ordalisti.bin.dawg",
+            "midlungur.bin.dawg",
+            "midlungur.bits",
+            "amlodi.bin.dawg",
+            "amlodi.bits",
+        ),
+        after=("icelandic_filter",),
+    ),
+    # Polish
+    BuildTask(run_osps37, ("osps37.txt",), ("osps37.bin.dawg",)),
+    # Norwegian
+    BuildTask(run_nsf2023, ("nsf2023.txt",), ("nsf2023.bin.dawg",)),
+    # en_US
+    BuildTask(
+        run_otcwl2014, ("otcwl2014.txt",), ("otcwl2014.bin.dawg", "otcwl2014.anagrams")
+    ),
+    # en_GB
+    BuildTask(run_sowpods, ("sowpods.txt",), ("sowpods.bin.dawg", "sowpods.anagrams")),
+    # GADDAGs for en_US and en_GB
+    BuildTask(
+        run_otcwl2014_gaddag, ("otcwl2014.txt",), ("otcwl2014.gaddag.bin.dawg",)
+    ),
+    BuildTask(run_sowpods_gaddag, ("sowpods.txt",), ("sowpods.gaddag.bin.dawg",)),
+    BuildTask(
         run_norwegian_filter,
+        ("nsf2023.bin.dawg", "nob-no_web_2020_300K-words.txt"),
+        ("norwegian_top_20000.txt", "norwegian_top_32500.txt"),
+        after=("nsf2023",),
+    ),
+    BuildTask(
         run_english_filter,
+        ("otcwl2014.bin.dawg", "sowpods.bin.dawg", "english.freq.tsv"),
+        (
+            "otcwl2014.aml.sorted.txt",
+            "otcwl2014.mid.sorted.txt",
+            "sowpods.aml.sorted.txt",
+            "sowpods.mid.sorted.txt",
+        ),
+        after=("otcwl2014", "sowpods"),
+    ),
+    BuildTask(
         run_english_robot_vocabs,
+        (
+            "otcwl2014.bin.dawg",
+            "sowpods.bin.dawg",
+            "otcwl2014.aml.sorted.txt",
+            "otcwl2014.mid.sorted.txt",
+            "sowpods.aml.sorted.txt",
+            "sowpods.mid.sorted.txt",
+        ),
+        (
+            "otcwl2014.aml.bin.dawg",
+            "otcwl2014.aml.bits",
+            "otcwl2014.mid.bin.dawg",
+            "otcwl2014.mid.bits",
+            "sowpods.aml.bin.dawg",
+            "sowpods.aml.bits",
+            "sowpods.mid.bin.dawg",
+            "sowpods.mid.bits",
+        ),
+        after=("english_filter",),
+    ),
+    BuildTask(
         run_polish_robot_vocabs,
+        ("osps37.bin.dawg", "polish_top_30000.txt", "polish_top_60000.txt"),
+        (
+            "osps37.aml.bin.dawg",
+            "osps37.aml.bits",
+            "osps37.mid.bin.dawg",
+            "osps37.mid.bits",
+        ),
+        after=("osps37",),
+    ),
+    BuildTask(
         run_norwegian_robot_vocabs,
-    ]
+        ("nsf2023.bin.dawg", "norwegian_top_20000.txt", "norwegian_top_32500.txt"),
+        (
+            "nsf2023.aml.bin.dawg",
+            "nsf2023.aml.bits",
+            "nsf2023.mid.bin.dawg",
+            "nsf2023.mid.bits",
+        ),
+        after=("norwegian_filter",),
+    ),
+]
+
+BUILD_TASKS_BY_NAME: Dict[str, BuildTask] = {t.name: t for t in BUILD_TASKS}
+
+# Names that can be given on the command line for groups of tasks
+BUILD_TASK_GROUPS: Dict[str, Tuple[str, ...]] = {
+    "all": tuple(BUILD_TASKS_BY_NAME),
+    "english_gaddags": ("otcwl2014_gaddag", "sowpods_gaddag"),
+}
+
+# The code that, besides the task function itself, determines the output
+# of a task. A change to any of it causes all outputs to be rebuilt.
+_BUILDER_CODE = (
+    _DawgNode,
+    _Dawg,
+    _OpenNode,
+    _StreamingDawg,
+    _BinaryDawgPacker,
+    DawgBuilder,
+    nofilter,
+    filter_skrafl,
+    filter_common,
+)
+
+# The manifest records, for each task, the fingerprint of the inputs and
+# code from which its outputs were most recently built
+BUILD_MANIFEST = "dawgbuilder.manifest.json"
+
+
+@functools.lru_cache(maxsize=1)
+def _builder_code_hash() -> bytes:
+    """Return a hash of the builder code and constants shared by all tasks"""
+    h = hashlib.sha256()
+    for obj in _BUILDER_CODE:
+        h.update(inspect.getsource(obj).encode("utf-8"))
+    h.update(
+        repr(
+            (MAXLEN, WORD_MAXLEN, COMMON_MAXLEN, GADDAG_SEPARATOR, DAWG_HEADER_VERSION)
+        ).encode("utf-8")
+    )
+    return h.digest()
+
+
+def task_fingerprint(task: BuildTask) -> Optional[str]:
+    """Return a hash of the contents of a task's input files and of the
+    code that builds its outputs, or None if an input file is missing"""
+    h = hashlib.sha256(_builder_code_hash())
+    h.update(inspect.getsource(task.func).encode("utf-8"))
+    for fname in task.inputs:
+        path = rpath(fname)
+        if not os.path.isfile(path):
+            return None
+        h.update(fname.encode("utf-8") + b"\x00")
+        with open(path, "rb") as f:
+            while chunk := f.read(1 << 20):
+                h.update(chunk)
+    return h.hexdigest()
+
+
+def _load_manifest() -> Dict[str, str]:
+    """Load the build manifest, if it exists"""
+    try:
+        with open(rpath(BUILD_MANIFEST), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return dict()
+
+
+def _save_manifest(manifest: Dict[str, str]) -> None:
+    """Atomically replace the build manifest"""
+    fname = rpath(BUILD_MANIFEST)
+    with open(fname + ".tmp", "w", encoding="utf-8", newline="\n") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(fname + ".tmp", fname)
+
+
+class TaskResult(NamedTuple):
+
+    """The outcome of a build task run in a worker process"""
+
+    name: str
+    seconds: float
+    output: str
+    error: Optional[str]
+
 
-    def name(t: Callable[[], None]) -> str:
-        return t.__name__[4:]
+def _run_task(name: str) -> TaskResult:
+    """Run a build task in a worker process, capturing its printed output"""
+    out = io.StringIO()
+    error: Optional[str] = None
+    t0 = time.time()
+    with contextlib.redirect_stdout(out):
+        try:
+            BUILD_TASKS_BY_NAME[name].func()
+        except Exception:
+            error = traceback.format_exc()
+    return TaskResult(name, time.time() - t0, out.getvalue(), error)
+
+
+def run_pipeline(names: Iterable[str], jobs: int = 0, force: bool = False) -> bool:
+    """Run the named build tasks in a pool of worker processes. A task is
+    started as soon as its prerequisites among the named tasks are complete.
+    Unless force is True, a task is skipped if its outputs exist and its
+    fingerprint (see task_fingerprint()) matches the one in the manifest.
+    Returns True if all tasks succeeded or were up to date."""
+    selected = frozenset(names)
+    pending = [t for t in BUILD_TASKS if t.name in selected]
+    done: Set[str] = set()
+    failed: Set[str] = set()
+    # (task name, status, seconds), in order of completion
+    timings: List[Tuple[str, str, float]] = []
+    manifest = _load_manifest()
+    fingerprints: Dict[str, Optional[str]] = dict()
+    t0 = time.time()
+    with ProcessPoolExecutor(max_workers=jobs or None) as pool:
+        running: Dict[Future[TaskResult], str] = dict()
+        while pending or running:
+            # Start or skip each task whose prerequisites are complete,
+            # in list order so that skips propagate within a single pass
+            waiting: List[BuildTask] = []
+            for task in pending:
+                after = [a for a in task.after if a in selected]
+                if any(a in failed for a in after):
+                    failed.add(task.name)
+                    timings.append((task.name, "not run", 0.0))
+                    continue
+                if not all(a in done for a in after):
+                    waiting.append(task)
+                    continue
+                fp = task_fingerprint(task)
+                if (
+                    not force
+                    and fp is not None
+                    and manifest.get(task.name) == fp
+                    and all(os.path.isfile(rpath(f)) for f in task.outputs)
+                ):
+                    print("Task {0} is up to date".format(task.name))
+                    done.add(task.name)
+                    timings.append((task.name, "up to date", 0.0))
+                    continue
+                print("Starting task {0}".format(task.name))
+                fingerprints[task.name] = fp
+                running[pool.submit(_run_task, task.name)] = task.name
+            pending = waiting
+            if not running:
+                continue
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                del running[future]
+                result = future.result()
+                print(
+                    "--- Task {0} finished in {1:.2f} seconds ---".format(
+                        result.name, result.seconds
+                    )
+                )
+                print(result.output, end="")
+                if result.error is not None:
+                    print(result.error, end="")
+                    failed.add(result.name)
+                    timings.append((result.name, "failed", result.seconds))
+                    continue
+                done.add(result.name)
+                timings.append((result.name, "built", result.seconds))
+                fp = fingerprints[result.name]
+                if fp is not None:
+                    manifest[result.name] = fp
+                    _save_manifest(manifest)
+    print("\nTask                      Status           Seconds")
+    for name, status, seconds in timings:
+        print("{0:<25} {1:<12} {2:>11.2f}".format(name, status, seconds))
+    print(
+        "Total task time {0:.2f} seconds, wall clock time {1:.2f} seconds".format(
+            sum(seconds for _, _, seconds in timings), time.time() - t0
+        )
+    )
+    return not failed
 
-    alltasks = frozenset(name(t) for t in ALL_TASKS)
 
-    def exit_with_help() -> None:
-        print("Please specify a task to perform or 'all'.")
-        print("The tasks are:", ", ".join(alltasks))
-        exit(1)
+if __name__ == "__main__":
+
+    print(f"DawgBuilder - project {os.environ['PROJECT_ID']}")
 
-    if len(sys.argv) < 2:
-        exit_with_help()
+    import argparse
 
-    if len(sys.argv) == 2 and sys.argv[1] == "all":
-        tasks = ALL_TASKS
-    else:
-        args = frozenset(sys.argv[1:])
-        if not (args <= alltasks):
-            exit_with_help()
-        # Keep original task order
-        tasks = [t for t in ALL_TASKS if name(t) in args]
-        if not tasks:
-            exit_with_help()
+    parser = argparse.ArgumentParser(
+        description="Build DAWG vocabularies, running independent tasks in parallel"
+    )
+    parser.add_argument(
+        "tasks",
+        nargs="+",
+        metavar="task",
+        help="one or more of: "
+        + ", ".join(list(BUILD_TASK_GROUPS) + list(BUILD_TASKS_BY_NAME)),
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=0,
+        help="number of worker processes (default: number of CPUs)",
+    )
+    parser.add_argument(
+        "-f",
+        "--force",
+        action="store_true",
+        help="rebuild outputs even if their inputs are unchanged",
+    )
+    args = parser.parse_args()
+
+    tasks: List[str] = []
+    for arg in args.tasks:
+        if arg in BUILD_TASK_GROUPS:
+            tasks.extend(BUILD_TASK_GROUPS[arg])
+        elif arg in BUILD_TASKS_BY_NAME:
+            tasks.append(arg)
+        else:
+            parser.error("unknown task: {0}".format(arg))
 
-    for task in tasks:
-        task()
+    if not run_pipeline(tasks, jobs=args.jobs, force=args.force):
+        sys.exit(1)
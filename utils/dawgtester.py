@@ -11,9 +11,10 @@
 
 from __future__ import annotations
 
-from typing import Optional
+from typing import List, Optional, Tuple
 
 import os
+import re
 import sys
 import time
 
@@ -22,7 +23,7 @@ base_path = os.path.dirname(__file__)  # Assumed to be in the /utils directory
 # Add the ../src directory to the Python path
 sys.path.append(os.path.join(base_path, "../src"))
 
-from dawgdictionary import PackedDawgDictionary
+from dawgdictionary import PackedDawgDictionary, FindNavigator
 from languages import IcelandicAlphabet, PolishAlphabet, set_locale
 
 
@@ -47,6 +48,118 @@ class DawgTester:
             # Tests the __contains__ operator
             print("Error: \"{0}\" was found".format(word))
 
+    def _benchmark_find(self, words: List[str], repeat: int = 20) -> None:
+        """ Compare the direct find() lookup with a lookup
+            via the generic FindNavigator """
+        dawg = self._dawg
+        assert dawg is not None
+
+        def nav_find(word: str) -> bool:
+            nav = FindNavigator(word)
+            dawg.navigate(nav)
+            return nav.is_found()
+
+        for word in words:
+            if dawg.find(word) != nav_find(word):
+                print("Error: find() and FindNavigator disagree on \"{0}\"".format(word))
+        t0 = time.time()
+        for _ in range(repeat):
+            for word in words:
+                nav_find(word)
+        t1 = time.time()
+        for _ in range(repeat):
+            for word in words:
+                dawg.find(word)
+        t2 = time.time()
+        n = len(words) * repeat
+        print(
+            "{0} lookups: FindNavigator {1:.2f} seconds, find() {2:.2f} seconds, "
+            "speed-up {3:.1f}x".format(
+                n, t1 - t0, t2 - t1, (t1 - t0) / max(t2 - t1, 1e-9)
+            )
+        )
+
+    def _benchmark_navigation(
+        self, racks: List[str], patterns: List[str], repeat: int = 5
+    ) -> None:
+        """ Compare the recursive and iterative navigation engines
+            on rack permutations and pattern matches """
+        dawg = self._dawg
+        assert dawg is not None
+
+        def run() -> List[List[str]]:
+            return [dawg.find_permutations(rack) for rack in racks] + [
+                dawg.find_matches(pattern) for pattern in patterns
+            ]
+
+        iterative = dawg.iterative
+        timing = dict()
+        results = dict()
+        try:
+            for engine in (False, True):
+                dawg.iterative = engine
+                results[engine] = run()
+                best = float("inf")
+                for _ in range(repeat):
+                    t0 = time.perf_counter()
+                    run()
+                    best = min(best, time.perf_counter() - t0)
+                timing[engine] = best
+        finally:
+            dawg.iterative = iterative
+        if results[False] != results[True]:
+            print("Error: recursive and iterative navigation disagree")
+        print(
+            "{0} navigations: recursive {1:.3f} seconds, iterative {2:.3f} seconds, "
+            "speed-up {3:.2f}x".format(
+                len(racks) + len(patterns),
+                timing[False],
+                timing[True],
+                timing[False] / max(timing[True], 1e-9),
+            )
+        )
+
+    def _benchmark_patterns(
+        self, queries: List[Tuple[str, int, int, List[str]]], repeat: int = 5
+    ) -> None:
+        """ Compare find_pattern() with the equivalent sequence of
+            find_matches() calls, whose results are then filtered.
+            Each query is (pattern, minlen, maxlen, match patterns). """
+        dawg = self._dawg
+        assert dawg is not None
+
+        def emulate(
+            pattern: str, minlen: int, maxlen: int, matches: List[str]
+        ) -> List[str]:
+            regex = re.compile(pattern.replace("?", "."))
+            return [
+                w
+                for m in matches
+                for w in dawg.find_matches(m)
+                if regex.fullmatch(w) and minlen <= len(w) <= (maxlen or len(w))
+            ]
+
+        for pattern, minlen, maxlen, matches in queries:
+            t0 = time.perf_counter()
+            for _ in range(repeat):
+                result = dawg.find_pattern(pattern, minlen, maxlen, sort=False)
+            t1 = time.perf_counter()
+            for _ in range(repeat):
+                expected = emulate(pattern, minlen, maxlen, matches)
+            t2 = time.perf_counter()
+            if sorted(result) != sorted(expected):
+                print(
+                    "Error: find_pattern(\"{0}\") and find_matches() disagree".format(
+                        pattern
+                    )
+                )
+            print(
+                "\"{0}\" ({1}-{2}): {3} words, find_pattern() {4:.3f} seconds, "
+                "find_matches() {5:.3f} seconds".format(
+                    pattern, minlen, maxlen or "", len(result), t1 - t0, t2 - t1
+                )
+            )
+
 
 class DawgTesterIcelandic(DawgTester):
 
@@ -352,6 +465,32 @@ class DawgTesterIcelandic(DawgTester):
                 print("{0} in match result but not in smallwords".format(word))
         print()
 
+        print("Benchmarking word lookup:")
+        self._benchmark_find(
+            [first + second for first in IcelandicAlphabet.order
+                for second in IcelandicAlphabet.order]
+            + self._dawg.find_matches("e??st??")
+            + self._dawg.find_permutations("einstök")
+        )
+        print()
+
+        print("Benchmarking navigation:")
+        self._benchmark_navigation(
+            ["einstök", "stafur?", "ánægður", "?orðum?", "kærleik"],
+            ["e??st??", "??á??", "s?????r", "???", "h??a?i?n"],
+        )
+        print()
+
+        print("Benchmarking pattern queries:")
+        self._benchmark_patterns(
+            [
+                ("st?*", 4, 7, ["st??", "st???", "st????", "st?????"]),
+                ("??[aáeéiíoóuúyýæö]??", 0, 0, ["?????"]),
+                ("h?*[^a]", 3, 5, ["h??", "h???", "h????"]),
+            ]
+        )
+        print()
+
         print("Test finished")
 
         self._dawg = None
@@ -412,6 +551,27 @@ class DawgTesterPolish(DawgTester):
                 else:
                     self._test_false(word)
 
+        print("Benchmarking word lookup:")
+        self._benchmark_find(
+            [first + second for first in PolishAlphabet.order
+                for second in PolishAlphabet.order]
+            + self._dawg.find_matches("?????")
+        )
+
+        print("Benchmarking navigation:")
+        self._benchmark_navigation(
+            ["żółwiak", "?rzecz?", "ścianka", "dźwięki"],
+            ["??ż??", "prz????", "???"],
+        )
+
+        print("Benchmarking pattern queries:")
+        self._benchmark_patterns(
+            [
+                ("prz?*", 4, 7, ["prz?", "prz??", "prz???", "prz????"]),
+                ("??[ąęó]??", 0, 0, ["?????"]),
+            ]
+        )
+
 
 def test():
     # Test navigation in the DAWG
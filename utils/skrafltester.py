@@ -19,6 +19,7 @@
         [-o minimax|autoplayer (to choose opponent, default minimax)]
         [-s (to run silently, i.e. only with ending summary)]
         [-l locale (is_IS for Icelandic, en_US or en_GB for English, pl_PL for Polish)]
+        [-b (to benchmark move generation for racks with one and two blanks)]
 
 """
 
@@ -28,6 +29,7 @@ from typing import List, Optional, Tuple, Callable, cast
 
 import getopt
 import os
+import random
 import sys
 import time
 
@@ -286,6 +288,46 @@ def test_manual_game():
     )
 
 
+def test_blanks(num_games: int) -> None:
+    """ Benchmark move generation for racks with no, one and two blank
+        tiles, in the positions of a number of games between AutoPlayers """
+
+    tileset = current_tileset()
+    # The tiles of a full bag, except the blanks
+    letters = tileset.full_bag().replace("?", "")
+    timings: List[List[float]] = [[], [], []]
+
+    t0 = time.time()
+
+    for _ in range(num_games):
+        state = State(
+            tileset=tileset, drawtiles=True, board_type=current_board_type()
+        )
+        while not state.is_game_over():
+            for blanks in range(3):
+                # Give the player to move a random rack with this many blanks
+                trial = State(copy=state)
+                rack = "".join(random.sample(letters, 7 - blanks)) + "?" * blanks
+                trial.set_rack(trial.player_to_move(), rack)
+                g0 = time.time()
+                AutoPlayer(0, trial).generate_move()
+                timings[blanks].append(time.time() - g0)
+            state.apply_move(AutoPlayer(0, state).generate_move())
+
+    t1 = time.time()
+
+    print(
+        "Benchmark completed, {0} games played in {1:.2f} seconds".format(
+            num_games, t1 - t0
+        )
+    )
+    for blanks, t in enumerate(timings):
+        print(
+            "Racks with {0} blank(s): {1} positions, {2:.3f} seconds on average, "
+            "{3:.3f} seconds at most".format(blanks, len(t), sum(t) / len(t), max(t))
+        )
+
+
 def test(num_games: int, opponent: str, silent: bool) -> None:
 
     """ Test running a number of games """
@@ -398,8 +440,16 @@ def main(argv: Optional[List[str]] = None) -> int:
         try:
             opts, _ = getopt.getopt(
                 argv[1:],
-                "hl:n:o:sm",
-                ["help", "locale", "numgames", "opponent", "silent", "manual"],
+                "hl:n:o:smb",
+                [
+                    "help",
+                    "locale",
+                    "numgames",
+                    "opponent",
+                    "silent",
+                    "manual",
+                    "blanks",
+                ],
             )
         except getopt.error as msg:
             raise Usage(msg)
@@ -407,6 +457,7 @@ def main(argv: Optional[List[str]] = None) -> int:
         opponent = "autoplayer"
         silent = False
         manual = False
+        blanks = False
         locale = "is_IS"
         # process options
         for o, a in opts:
@@ -423,6 +474,8 @@ def main(argv: Optional[List[str]] = None) -> int:
                 silent = True
             elif o in ("-m", "--manual"):
                 manual = True
+            elif o in ("-b", "--blanks"):
+                blanks = True
 
         print("Welcome to the Skrafl game tester")
 
@@ -431,6 +484,9 @@ def main(argv: Optional[List[str]] = None) -> int:
 
         if manual:
             test_manual_game()
+        elif blanks:
+            print("Benchmarking move generation in {0} games".format(num_games))
+            test_blanks(num_games)
         else:
             print(
                 "Running {0} games against {1}".format(